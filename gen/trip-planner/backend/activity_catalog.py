@@ -0,0 +1,316 @@
+import itertools
+import json
+import os
+import re
+from bisect import bisect_right
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Built-in catalog. Planner pools are keyed by preference; "sights" feed the
+# simple ai_service itinerary. Generic pools use {destination} placeholders.
+DEFAULT_CATALOG = {
+    "default_city": "paris",
+    "cities": {
+        "paris": {
+            "aliases": ["paris", "france"],
+            "activities": {
+                "heritage": [
+                    {"name": "AI-Guided Louvre Tour", "cost": 45, "ai_enhanced": True},
+                    {"name": "Notre-Dame VR Experience", "cost": 25, "ai_enhanced": True},
+                    {"name": "Versailles Smart Audio Guide", "cost": 35, "ai_enhanced": True}
+                ],
+                "food": [
+                    {"name": "AI Sommelier Wine Tasting", "cost": 60, "ai_enhanced": True},
+                    {"name": "Michelin Star Restaurant (AI-booked)", "cost": 120, "ai_enhanced": True},
+                    {"name": "Food Market AI Walking Tour", "cost": 40, "ai_enhanced": True}
+                ],
+                "adventure": [
+                    {"name": "Seine River AI Drone Tour", "cost": 80, "ai_enhanced": True},
+                    {"name": "Catacombs AR Experience", "cost": 30, "ai_enhanced": True}
+                ]
+            },
+            "sights": [
+                {"activity": "Visit Eiffel Tower", "location": "Champ de Mars", "cost": 25},
+                {"activity": "Louvre Museum Tour", "location": "Louvre", "cost": 17},
+                {"activity": "Seine River Cruise", "location": "Seine River", "cost": 15},
+                {"activity": "Montmartre Walking Tour", "location": "Montmartre", "cost": 20},
+                {"activity": "Notre-Dame Cathedral", "location": "Île de la Cité", "cost": 0}
+            ]
+        },
+        "tokyo": {
+            "aliases": ["tokyo", "japan"],
+            "activities": {
+                "heritage": [
+                    {"name": "AI Temple Guide Experience", "cost": 20, "ai_enhanced": True},
+                    {"name": "Traditional Tea Ceremony (AI-matched)", "cost": 50, "ai_enhanced": True}
+                ],
+                "food": [
+                    {"name": "Sushi Master AI Pairing", "cost": 90, "ai_enhanced": True},
+                    {"name": "Robot Restaurant Experience", "cost": 70, "ai_enhanced": True}
+                ],
+                "adventure": [
+                    {"name": "Tokyo Skytree AI Observatory", "cost": 40, "ai_enhanced": True},
+                    {"name": "Shibuya Crossing Analytics Tour", "cost": 25, "ai_enhanced": True}
+                ]
+            },
+            "sights": [
+                {"activity": "Visit Senso-ji Temple", "location": "Asakusa", "cost": 0},
+                {"activity": "Tokyo Skytree Observatory", "location": "Sumida", "cost": 30},
+                {"activity": "Tsukiji Fish Market", "location": "Tsukiji", "cost": 10},
+                {"activity": "Shibuya Crossing Experience", "location": "Shibuya", "cost": 0},
+                {"activity": "Imperial Palace Gardens", "location": "Chiyoda", "cost": 0}
+            ]
+        },
+        "new york": {
+            "aliases": ["new york", "nyc"],
+            "activities": {
+                "heritage": [
+                    {"name": "AI-Guided Statue of Liberty Tour", "cost": 35, "ai_enhanced": True},
+                    {"name": "Empire State Building VR Experience", "cost": 40, "ai_enhanced": True},
+                    {"name": "Central Park Smart Walking Tour", "cost": 25, "ai_enhanced": True}
+                ],
+                "food": [
+                    {"name": "AI Food Truck Discovery", "cost": 30, "ai_enhanced": True},
+                    {"name": "Broadway District Restaurant (AI-booked)", "cost": 85, "ai_enhanced": True},
+                    {"name": "Little Italy AI Culinary Tour", "cost": 55, "ai_enhanced": True}
+                ],
+                "adventure": [
+                    {"name": "Brooklyn Bridge AI Photo Walk", "cost": 20, "ai_enhanced": True},
+                    {"name": "Times Square Analytics Experience", "cost": 15, "ai_enhanced": True}
+                ]
+            },
+            "sights": [
+                {"activity": "Statue of Liberty Tour", "location": "Liberty Island", "cost": 25},
+                {"activity": "Central Park Walk", "location": "Manhattan", "cost": 0},
+                {"activity": "Empire State Building", "location": "Midtown", "cost": 40},
+                {"activity": "Broadway Show", "location": "Theater District", "cost": 150},
+                {"activity": "9/11 Memorial", "location": "Lower Manhattan", "cost": 0}
+            ]
+        },
+        "london": {
+            "aliases": ["london", "uk"],
+            "activities": {
+                "heritage": [
+                    {"name": "AI-Guided Tower of London Tour", "cost": 30, "ai_enhanced": True},
+                    {"name": "Buckingham Palace VR Experience", "cost": 25, "ai_enhanced": True},
+                    {"name": "Westminster Abbey Smart Guide", "cost": 35, "ai_enhanced": True}
+                ],
+                "food": [
+                    {"name": "AI Pub Crawl Experience", "cost": 45, "ai_enhanced": True},
+                    {"name": "Traditional Tea Service (AI-matched)", "cost": 40, "ai_enhanced": True},
+                    {"name": "Borough Market AI Food Tour", "cost": 35, "ai_enhanced": True}
+                ],
+                "adventure": [
+                    {"name": "Thames River AI Cruise", "cost": 50, "ai_enhanced": True},
+                    {"name": "London Eye Analytics Experience", "cost": 45, "ai_enhanced": True}
+                ]
+            }
+        }
+    },
+    "generic": {
+        "heritage": [
+            {"name": "AI-Guided {destination} Heritage Tour", "cost": 35, "ai_enhanced": True},
+            {"name": "{destination} Museum VR Experience", "cost": 25, "ai_enhanced": True},
+            {"name": "Historic {destination} Smart Walking Tour", "cost": 30, "ai_enhanced": True}
+        ],
+        "food": [
+            {"name": "Local {destination} Cuisine AI Tour", "cost": 50, "ai_enhanced": True},
+            {"name": "Best {destination} Restaurant (AI-booked)", "cost": 75, "ai_enhanced": True},
+            {"name": "{destination} Food Market Experience", "cost": 40, "ai_enhanced": True}
+        ],
+        "adventure": [
+            {"name": "{destination} City AI Discovery Tour", "cost": 45, "ai_enhanced": True},
+            {"name": "Scenic {destination} Analytics Walk", "cost": 25, "ai_enhanced": True}
+        ]
+    }
+}
+
+GENERIC_CITY = "*"
+
+_generations = itertools.count(1)
+
+
+class ActivityPool:
+    """Activities for one (city, preference) pair, sorted by cost"""
+
+    __slots__ = ("activities", "costs", "cost_array", "lower_names")
+
+    def __init__(self, activities: List[Dict]):
+        self.activities = sorted(activities, key=lambda a: a["cost"])
+        self.costs = [a["cost"] for a in self.activities]
+        # Precomputed for the vectorized selection engine
+        self.cost_array = np.asarray(self.costs, dtype=np.float64)
+        self.lower_names = [a["name"].lower() for a in self.activities]
+
+    def affordable(self, max_cost: float) -> List[Dict]:
+        """Activities costing at most max_cost (a prefix of the sorted pool)"""
+        return self.activities[:bisect_right(self.costs, max_cost)]
+
+    def __len__(self) -> int:
+        return len(self.activities)
+
+
+class ActivityCatalog:
+    """Immutable, pre-indexed activity catalog shared by all planners"""
+
+    def __init__(self, data: Dict):
+        # Bumped per build so caches keyed on catalog contents can tell reloads apart
+        self.generation = next(_generations)
+        self.default_city = data.get("default_city", "paris")
+        self._pools: Dict[str, Dict[str, ActivityPool]] = {}
+        self._sights: Dict[str, List[Dict]] = {}
+        self._aliases: Dict[str, str] = {}
+
+        for city, entry in data.get("cities", {}).items():
+            city = _normalize(city)
+            self._pools[city] = {
+                _normalize(pref): ActivityPool(items)
+                for pref, items in entry.get("activities", {}).items()
+            }
+            if entry.get("sights"):
+                self._sights[city] = list(entry["sights"])
+            for alias in [city] + entry.get("aliases", []):
+                self._aliases.setdefault(_normalize(alias), city)
+
+        self._generic = {
+            _normalize(pref): items for pref, items in data.get("generic", {}).items()
+        }
+
+        # One alternation (longest alias first) replaces the chained substring checks
+        if self._aliases:
+            pattern = "|".join(re.escape(a) for a in sorted(self._aliases, key=len, reverse=True))
+            self._alias_re = re.compile(pattern)
+        else:
+            self._alias_re = None
+
+        self._resolved: Dict[str, str] = {}
+        self._generic_pools: Dict[str, Dict[str, ActivityPool]] = {}
+
+    @property
+    def cities(self) -> List[str]:
+        return list(self._pools)
+
+    def resolve(self, destination: str) -> str:
+        """Map a free-text destination to a catalog city, or GENERIC_CITY"""
+        key = _normalize(destination)
+        city = self._resolved.get(key)
+        if city is None:
+            city = self._aliases.get(key)
+            if city is None and self._alias_re is not None:
+                match = self._alias_re.search(key)
+                city = self._aliases[match.group(0)] if match else GENERIC_CITY
+            if city is None:
+                city = GENERIC_CITY
+            if len(self._resolved) < _RESOLVE_CACHE_SIZE:
+                self._resolved[key] = city
+        return city
+
+    def pools_for(self, destination: str) -> Dict[str, ActivityPool]:
+        """Preference -> ActivityPool for a destination"""
+        city = self.resolve(destination)
+        if city != GENERIC_CITY:
+            return self._pools[city]
+
+        pools = self._generic_pools.get(destination)
+        if pools is None:
+            pools = {
+                pref: ActivityPool([
+                    dict(item, name=item["name"].format(destination=destination))
+                    for item in items
+                ])
+                for pref, items in self._generic.items()
+            }
+            if len(self._generic_pools) < _RESOLVE_CACHE_SIZE:
+                self._generic_pools[destination] = pools
+        return pools
+
+    def sights_for(self, destination: str) -> List[Dict]:
+        """Sightseeing list for ai_service, falling back to the default city"""
+        city = self.resolve(destination)
+        return self._sights.get(city) or self._sights.get(self.default_city, [])
+
+
+# Bounds the per-destination memo so arbitrary user input can't grow it forever
+_RESOLVE_CACHE_SIZE = 4096
+
+
+def _normalize(value: str) -> str:
+    return " ".join(value.lower().split())
+
+
+def _load_data(path: Optional[str]) -> Dict:
+    if not path:
+        return DEFAULT_CATALOG
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _check_items(items, where: str, fields: Dict[str, type]):
+    if not isinstance(items, list):
+        raise ValueError(f"{where} must be a list")
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"{where}[{i}] must be an object")
+        for field, kind in fields.items():
+            value = item.get(field)
+            if not isinstance(value, kind) or isinstance(value, bool):
+                raise ValueError(f"{where}[{i}].{field} must be a {'string' if kind is str else 'number'}")
+
+
+def validate_catalog(data) -> Dict:
+    """Check a catalog's shape before it is indexed; raises ValueError naming the first bad entry"""
+    activity_fields = {"name": str, "cost": (int, float)}
+    if not isinstance(data, dict):
+        raise ValueError("catalog must be an object")
+    if not isinstance(data.get("default_city", ""), str):
+        raise ValueError("default_city must be a string")
+    cities = data.get("cities", {})
+    if not isinstance(cities, dict):
+        raise ValueError("cities must be an object")
+    for city, entry in cities.items():
+        if not isinstance(entry, dict):
+            raise ValueError(f"cities.{city} must be an object")
+        aliases = entry.get("aliases", [])
+        if not isinstance(aliases, list) or not all(isinstance(a, str) for a in aliases):
+            raise ValueError(f"cities.{city}.aliases must be a list of strings")
+        activities = entry.get("activities", {})
+        if not isinstance(activities, dict):
+            raise ValueError(f"cities.{city}.activities must be an object")
+        for pref, items in activities.items():
+            _check_items(items, f"cities.{city}.activities.{pref}", activity_fields)
+        if entry.get("sights"):
+            _check_items(entry["sights"], f"cities.{city}.sights",
+                         {"activity": str, "location": str, "cost": (int, float)})
+    generic = data.get("generic", {})
+    if not isinstance(generic, dict):
+        raise ValueError("generic must be an object")
+    for pref, items in generic.items():
+        _check_items(items, f"generic.{pref}", activity_fields)
+        for item in items:
+            try:
+                item["name"].format(destination="")
+            except (KeyError, IndexError, ValueError) as e:
+                raise ValueError(f"generic.{pref}: bad placeholder in {item['name']!r}") from e
+    return data
+
+
+_catalog = ActivityCatalog(validate_catalog(_load_data(os.getenv("ACTIVITY_CATALOG_PATH"))))
+
+
+def get_catalog() -> ActivityCatalog:
+    """Return the current shared catalog"""
+    return _catalog
+
+
+def reload_catalog(path: Optional[str] = None) -> ActivityCatalog:
+    """Rebuild the catalog from disk and swap it in
+
+    The file is validated and fully indexed before the swap, so a bad file
+    raises (OSError or ValueError) and the current catalog stays in place.
+    Readers hold whichever catalog they fetched; rebinding the module global
+    is atomic, so no lock is needed.
+    """
+    global _catalog
+    _catalog = ActivityCatalog(validate_catalog(_load_data(path or os.getenv("ACTIVITY_CATALOG_PATH"))))
+    return _catalog
@@ -1,39 +1,14 @@
 import random
 from typing import List, Dict
-import httpx
+from activity_catalog import get_catalog
+from providers import PROVIDERS
 
 # Simulated AI service for trip planning
 def generate_itinerary(destination: str, duration: int, budget: float, preferences: Dict) -> List[Dict]:
     """Generate AI-powered itinerary based on user preferences"""
     
-    # Sample activities based on destination and preferences
-    activities_db = {
-        "paris": [
-            {"activity": "Visit Eiffel Tower", "location": "Champ de Mars", "cost": 25},
-            {"activity": "Louvre Museum Tour", "location": "Louvre", "cost": 17},
-            {"activity": "Seine River Cruise", "location": "Seine River", "cost": 15},
-            {"activity": "Montmartre Walking Tour", "location": "Montmartre", "cost": 20},
-            {"activity": "Notre-Dame Cathedral", "location": "Île de la Cité", "cost": 0},
-        ],
-        "tokyo": [
-            {"activity": "Visit Senso-ji Temple", "location": "Asakusa", "cost": 0},
-            {"activity": "Tokyo Skytree Observatory", "location": "Sumida", "cost": 30},
-            {"activity": "Tsukiji Fish Market", "location": "Tsukiji", "cost": 10},
-            {"activity": "Shibuya Crossing Experience", "location": "Shibuya", "cost": 0},
-            {"activity": "Imperial Palace Gardens", "location": "Chiyoda", "cost": 0},
-        ],
-        "new york": [
-            {"activity": "Statue of Liberty Tour", "location": "Liberty Island", "cost": 25},
-            {"activity": "Central Park Walk", "location": "Manhattan", "cost": 0},
-            {"activity": "Empire State Building", "location": "Midtown", "cost": 40},
-            {"activity": "Broadway Show", "location": "Theater District", "cost": 150},
-            {"activity": "9/11 Memorial", "location": "Lower Manhattan", "cost": 0},
-        ]
-    }
-    
-    # Get activities for destination (default to Paris if not found)
-    dest_key = destination.lower()
-    available_activities = activities_db.get(dest_key, activities_db["paris"])
+    # Get activities for destination from the shared catalog (default to Paris if not found)
+    available_activities = get_catalog().sights_for(destination)
     
     # Generate itinerary based on duration and budget
     itinerary = []
@@ -79,6 +54,8 @@ def update_itinerary_realtime(destination: str, duration: int) -> List[Dict]:
 
 async def get_weather_data(destination: str) -> Dict:
     """Fetch real-time weather data"""
+    if "weather" in PROVIDERS:
+        return await PROVIDERS["weather"].fetch(destination)
     # Simulated weather API response
     return {
         "temperature": random.randint(15, 30),
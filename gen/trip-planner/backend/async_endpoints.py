@@ -0,0 +1,92 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import uuid
+
+from database import get_async_db
+from inventory import book_item_async, confirm_hold_async, booking_response
+from models import Trip
+from responses import json_response
+from payment_queue import accept_payment_async, request_refund_async, payment_receipt, payment_status
+from schemas import TripCreate, TripBatchCreate, ItineraryOptimizeRequest, BookingCreate, PaymentCreate
+from trip_service import (
+    aplan_trip, persist_trip_async, trip_summary, plan_trips, persist_trips_async,
+    batch_response, MAX_BATCH_SIZE, optimize_trips_async, AGENT_TIMING_HEADER, server_timing
+)
+
+# Async twins of the write-heavy routes in main.py, mounted when DB_ASYNC is set.
+# Responses must stay identical to the sync handlers.
+router = APIRouter()
+
+@router.post("/itinerary/generate")
+async def generate_trip_itinerary(trip: TripCreate, db: AsyncSession = Depends(get_async_db)):
+    # Advanced GenAI trip planning runs first so the trip is written with its final total
+    ai_result, timings = await aplan_trip(trip)
+    headers = {"Server-Timing": server_timing(timings)} if AGENT_TIMING_HEADER else None
+
+    # Trip + itinerary rows in a single transaction
+    trip_id, total_cost = await persist_trip_async(db, trip, ai_result)
+
+    return json_response(trip_summary(trip_id, trip, total_cost, ai_result), headers=headers)
+
+@router.post("/itinerary/generate/batch")
+async def generate_trip_itineraries(batch: TripBatchCreate, db: AsyncSession = Depends(get_async_db)):
+    if len(batch.trips) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch limited to {MAX_BATCH_SIZE} trips")
+
+    # Planning fans out to a thread pool; keep it off the event loop
+    planned = await run_in_threadpool(plan_trips, batch.trips)
+    ok = [(trip, ai_result) for trip, (ai_result, error) in zip(batch.trips, planned) if error is None]
+
+    persisted = await persist_trips_async(db, [trip for trip, _ in ok], [ai_result for _, ai_result in ok])
+
+    return json_response(batch_response(batch.trips, planned, persisted))
+
+@router.post("/book")
+async def book_trip(booking: BookingCreate, db: AsyncSession = Depends(get_async_db)):
+    result = await book_item_async(db, booking)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    return result
+
+@router.post("/book/{booking_id}/confirm")
+async def confirm_booking(booking_id: int, db: AsyncSession = Depends(get_async_db)):
+    booking = await confirm_hold_async(db, booking_id)
+    if booking is None:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return booking_response(booking)
+
+@router.post("/payment", status_code=202)
+async def process_trip_payment(payment: PaymentCreate, db: AsyncSession = Depends(get_async_db),
+                               idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255)):
+    accepted = await accept_payment_async(db, payment, idempotency_key or uuid.uuid4().hex)
+    if accepted is None:
+        raise HTTPException(status_code=404, detail="Booking not found")
+
+    status_code, body, headers = payment_receipt(*accepted)
+    return json_response(body, status_code=status_code, headers=headers)
+
+@router.post("/payment/{payment_id}/refund", status_code=202)
+async def refund_trip_payment(payment_id: int, db: AsyncSession = Depends(get_async_db)):
+    payment = await request_refund_async(db, payment_id)
+    if payment is None:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    return payment_status(payment)
+
+@router.put("/itinerary/update/{trip_id}")
+async def update_itinerary(trip_id: int, db: AsyncSession = Depends(get_async_db)):
+    exists = (await db.execute(select(Trip.id).where(Trip.id == trip_id))).scalar_one_or_none()
+    if exists is None:
+        raise HTTPException(status_code=404, detail="Trip not found")
+
+    # Update activity names to show "optimized" versions in a single UPDATE
+    updated_rows = await optimize_trips_async(db, [trip_id])
+    return {"message": "Itinerary updated with real-time optimization!", "updated_rows": updated_rows}
+
+@router.post("/itinerary/optimize")
+async def optimize_itineraries(request: ItineraryOptimizeRequest, db: AsyncSession = Depends(get_async_db)):
+    """Bulk re-optimization for many trips (e.g. a nightly job)"""
+    updated_rows = await optimize_trips_async(db, request.trip_ids)
+    return {"message": "Itineraries optimized", "trips": len(set(request.trip_ids)), "updated_rows": updated_rows}
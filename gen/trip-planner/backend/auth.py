@@ -1,23 +1,86 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+import asyncio
+import threading
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
 from dotenv import load_dotenv
+from cache import TTLCache
+from metrics import counter, histogram
 
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+# Verified tokens, keyed by the full token string so a hit implies the same
+# signature was already checked. Entries expire with the token's own exp.
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt runs on a dedicated pool so a login storm can only occupy
+# PASSWORD_HASH_WORKERS cores. The bcrypt C extension releases the GIL, so
+# threads are enough. Callers beyond the queue limit are rejected instead of
+# piling up. Async handlers await the pool's future, so no request thread is
+# held while a hash runs.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "16"))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_LIMIT)
+
+HASH_SECONDS = histogram("password_hash_seconds", "bcrypt hash/verify CPU time")
+HASH_QUEUE_SECONDS = histogram("password_hash_queue_seconds", "Time waiting for a bcrypt worker")
+HASH_REJECTED = counter("password_hash_rejected_total", "Hash requests rejected because the queue was full")
+
+class HashingBusyError(Exception):
+    """Raised when the bcrypt queue is full; maps to 503 + Retry-After"""
+
+    def __init__(self, retry_after: int = PASSWORD_HASH_RETRY_AFTER):
+        super().__init__("Password hashing capacity exhausted")
+        self.retry_after = retry_after
+
+def _submit_hash(fn, *args) -> Future:
+    if not _hash_slots.acquire(blocking=False):
+        HASH_REJECTED.inc()
+        raise HashingBusyError()
+    queued_at = time.perf_counter()
+
+    def task():
+        started = time.perf_counter()
+        HASH_QUEUE_SECONDS.observe(started - queued_at)
+        try:
+            return fn(*args)
+        finally:
+            HASH_SECONDS.observe(time.perf_counter() - started)
+
+    try:
+        future = _hash_executor.submit(task)
+    except BaseException:
+        _hash_slots.release()
+        raise
+    # Released when bcrypt finishes, even if the awaiting request was cancelled
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return future
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _submit_hash(pwd_context.verify, plain_password, hashed_password).result()
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _submit_hash(pwd_context.hash, password).result()
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.wrap_future(_submit_hash(pwd_context.verify, plain_password, hashed_password))
+
+async def aget_password_hash(password: str) -> str:
+    return await asyncio.wrap_future(_submit_hash(pwd_context.hash, password))
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -29,12 +92,22 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str) -> Optional[int]:
+def decode_token(token: str) -> Optional[Tuple[int, float]]:
+    """Return (user_id, exp as a unix timestamp), memoized for the token's lifetime"""
+    cached = _token_cache.get(token)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             return None
-        return int(user_id)
-    except JWTError:
-        return None
\ No newline at end of file
+        decoded = (int(user_id), float(payload.get("exp", 0)))
+    except (JWTError, ValueError):
+        return None
+    _token_cache.set(token, decoded, ttl=decoded[1] - time.time())
+    return decoded
+
+def verify_token(token: str) -> Optional[int]:
+    decoded = decode_token(token)
+    return decoded[0] if decoded else None
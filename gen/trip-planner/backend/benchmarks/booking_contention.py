@@ -0,0 +1,126 @@
+"""Booking throughput and overselling with many concurrent bookers on one item.
+
+--bookers threads released together each try --attempts bookings of the
+same item with --capacity units:
+
+- legacy: the previous /book, insert + commit then trip status + commit,
+  with no capacity model at all
+- check_then_insert: count confirmed bookings, insert when below capacity
+- conditional_update: inventory.book_item, one guarded UPDATE on the
+  inventory row and a single commit
+
+"oversold" is confirmed units beyond capacity; anything above 0 is a bug.
+
+Uses DATABASE_URL when set (PostgreSQL shows real row-lock contention),
+otherwise a throwaway SQLite file.
+
+    python -m benchmarks.booking_contention --bookers 300 --capacity 100
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks.common import Timer, emit, latency_summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bookers", type=int, default=300)
+    parser.add_argument("--attempts", type=int, default=1)
+    parser.add_argument("--capacity", type=int, default=100)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+    from sqlalchemy import func, select
+
+    from database import SessionLocal, engine
+    from inventory import SoldOutError, book_item, set_capacity
+    from models import Base, Booking, Trip
+    from schemas import BookingCreate
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        trip = Trip(user_id=1, destination="Paris", duration=3, total_cost=300, status="planning")
+        db.add(trip)
+        db.commit()
+        trip_id = trip.id
+
+    def legacy(db, item_id):
+        trip = db.get(Trip, trip_id)
+        db.add(Booking(trip_id=trip_id, item_type="activity", item_id=item_id, status="confirmed"))
+        db.commit()
+        trip.status = "booked"
+        trip.version = Trip.version + 1
+        db.commit()
+        return True
+
+    def check_then_insert(db, item_id):
+        taken = db.scalar(select(func.count()).select_from(Booking).where(
+            Booking.item_type == "activity", Booking.item_id == item_id, Booking.status == "confirmed"))
+        if taken >= args.capacity:
+            db.rollback()
+            return False
+        return legacy(db, item_id)
+
+    def conditional_update(db, item_id):
+        try:
+            book_item(db, BookingCreate(trip_id=trip_id, item_type="activity", item_id=item_id))
+        except SoldOutError:
+            return False
+        return True
+
+    results = {
+        "database": engine.url.get_backend_name(),
+        "bookers": args.bookers,
+        "attempts": args.bookers * args.attempts,
+        "capacity": args.capacity,
+        "modes": {}
+    }
+    for mode, book in (("legacy", legacy), ("check_then_insert", check_then_insert),
+                       ("conditional_update", conditional_update)):
+        item_id = f"bench-{mode}"
+        with SessionLocal() as db:
+            set_capacity(db, "activity", item_id, args.capacity)
+        barrier = threading.Barrier(args.bookers)
+        lock = threading.Lock()
+        samples, outcomes = [], {"confirmed": 0, "sold_out": 0, "errors": 0}
+
+        def booker():
+            barrier.wait()
+            for _ in range(args.attempts):
+                start = time.perf_counter()
+                with SessionLocal() as db:
+                    try:
+                        outcome = "confirmed" if book(db, item_id) else "sold_out"
+                    except Exception:
+                        db.rollback()
+                        outcome = "errors"
+                elapsed = time.perf_counter() - start
+                with lock:
+                    samples.append(elapsed)
+                    outcomes[outcome] += 1
+
+        threads = [threading.Thread(target=booker) for _ in range(args.bookers)]
+        with Timer() as t:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        with SessionLocal() as db:
+            confirmed = db.scalar(select(func.count()).select_from(Booking).where(
+                Booking.item_id == item_id, Booking.status == "confirmed"))
+        results["modes"][mode] = {
+            **outcomes,
+            "oversold": max(0, confirmed - args.capacity),
+            "attempts_per_sec": round(len(samples) / t.elapsed, 1),
+            "latency": latency_summary(samples)
+        }
+
+    emit("booking_contention", results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Rows/sec for itinerary persistence: per-row ORM loop vs the bulk path.
+
+Uses DATABASE_URL when set, otherwise a throwaway SQLite file.
+
+    python -m benchmarks.bulk_insert --repeat 50
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.common import Timer, emit
+
+def legacy_persist(db, trip, ai_result, Trip, Itinerary):
+    """The pre-bulk implementation: two commits and one ORM add per row"""
+    db_trip = Trip(user_id=1, destination=trip.destination, duration=trip.duration,
+                   total_cost=0, status="planning")
+    db.add(db_trip)
+    db.commit()
+    db.refresh(db_trip)
+    total_cost = 0
+    for day_data in ai_result["itinerary"]:
+        db.add(Itinerary(trip_id=db_trip.id, day=day_data["day"], activity=day_data["activity"],
+                         location=day_data["location"], cost=day_data["cost"]))
+        total_cost += day_data["cost"]
+    db_trip.total_cost = total_cost
+    db.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--durations", default="1,7,30,90")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+    from database import SessionLocal, engine
+    from models import Base, Trip, Itinerary
+    from schemas import TripCreate
+    from trip_service import plan_trip, persist_trip
+
+    Base.metadata.create_all(bind=engine)
+
+    results = {"database": engine.url.get_backend_name(), "durations": {}}
+    for duration in [int(d) for d in args.durations.split(",")]:
+        trip = TripCreate(destination="Paris", duration=duration)
+        ai_result = plan_trip(trip)
+        rows = len(ai_result["itinerary"]) * args.repeat
+        entry = {"rows_per_trip": len(ai_result["itinerary"])}
+        for label, fn in (
+            ("orm_loop", lambda db: legacy_persist(db, trip, ai_result, Trip, Itinerary)),
+            ("bulk", lambda db: persist_trip(db, trip, ai_result))
+        ):
+            db = SessionLocal()
+            try:
+                fn(db)  # warm-up
+                with Timer() as t:
+                    for _ in range(args.repeat):
+                        fn(db)
+            finally:
+                db.close()
+            entry[label] = {"seconds": round(t.elapsed, 4), "rows_per_sec": round(rows / t.elapsed, 1)}
+        entry["speedup"] = round(entry["bulk"]["rows_per_sec"] / entry["orm_loop"]["rows_per_sec"], 2)
+        results["durations"][str(duration)] = entry
+
+    emit("bulk_insert", results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Chat intent/entity matching: linear keyword scans vs the compiled matcher.
+
+Grows the built-in keyword tables with synthetic city names and intent
+keywords (--sizes, extra entries per table) and times matching
+realistic 20-40 word chat messages:
+
+- linear: the previous TravelChatbot approach, one substring scan per
+  keyword per table
+- compiled: chat_matcher.KeywordMatcher, one regex pass per message
+
+"mismatches" counts messages where the two disagree on the intent or the
+set of entities found; it should be 0.
+
+    python -m benchmarks.chat_matcher --sizes 0,100,1000,5000 --messages 2000
+"""
+import argparse
+import copy
+import random
+import time
+from typing import Dict
+
+from benchmarks.common import emit, latency_summary
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "ten", "bur", "vel", "san", "do", "ria", "por", "zen", "qua", "lis"]
+FILLER = (
+    "hi we are planning a family trip with the kids and were wondering what you would suggest "
+    "for a couple of days there we like museums walking and good coffee but nothing too expensive "
+    "also is it easy to get around from the airport thanks so much for the help"
+).split()
+
+def _grow(tables: Dict, extra: int, rng: random.Random) -> Dict:
+    data = copy.deepcopy(tables)
+    names = set()
+    while len(names) < extra:
+        names.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    names = sorted(names)
+    data["entities"]["cities"] += names
+    # Spread the same number of synthetic keywords across the intents
+    intents = list(data["intents"])
+    for i, name in enumerate(names):
+        data["intents"][intents[i % len(intents)]].append(name[::-1])
+    return data
+
+def _messages(data: Dict, count: int, rng: random.Random):
+    cities = data["entities"]["cities"]
+    keywords = [word for words in data["intents"].values() for word in words]
+    dates = data["entities"]["dates"]
+    messages = []
+    for _ in range(count):
+        words = rng.sample(FILLER, rng.randint(20, 36))
+        for extra in (rng.choice(cities).title(), rng.choice(keywords), rng.choice(dates), str(rng.randint(1, 14))):
+            if rng.random() < 0.7:
+                words.insert(rng.randrange(len(words)), extra)
+        messages.append(" ".join(words).capitalize() + "?")
+    return messages
+
+def _linear(data: Dict):
+    intents = list(data["intents"].items())
+    entities = list(data["entities"].items())
+
+    def match(message: str):
+        lower = message.lower()
+        intent = next((name for name, words in intents if any(word in lower for word in words)),
+                      data["default_intent"])
+        found = {name: [phrase for phrase in phrases if phrase in lower] for name, phrases in entities}
+        found["numbers"] = [int(s) for s in message.split() if s.isdigit()]
+        return intent, found
+    return match
+
+def _disagree(expected, actual) -> bool:
+    (intent, entities), (other_intent, other_entities) = expected, actual
+    return intent != other_intent or any(set(entities[key]) != set(other_entities[key]) for key in entities)
+
+def _time(match, messages, rounds: int):
+    samples = []
+    for _ in range(rounds):
+        for message in messages:
+            start = time.perf_counter()
+            match(message)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="0,100,1000,5000")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    from chat_matcher import DEFAULT_KEYWORDS, KeywordMatcher
+
+    results = {"messages": args.messages, "sizes": {}}
+    for extra in [int(size) for size in args.sizes.split(",")]:
+        rng = random.Random(args.seed)
+        data = _grow(DEFAULT_KEYWORDS, extra, rng)
+        messages = _messages(data, args.messages, rng)
+        build_start = time.perf_counter()
+        matcher = KeywordMatcher(data)
+        build_ms = round((time.perf_counter() - build_start) * 1000, 2)
+        entry = {"phrases": len(matcher._labels), "compile_ms": build_ms}
+        linear = _linear(data)
+        for mode, match in (("linear", linear), ("compiled", matcher.match)):
+            entry[mode] = latency_summary(_time(match, messages, args.rounds))
+        entry["mismatches"] = sum(_disagree(linear(message), matcher.match(message)) for message in messages)
+        entry["speedup_mean"] = round(entry["linear"]["mean_ms"] / entry["compiled"]["mean_ms"], 1)
+        results["sizes"][str(extra)] = entry
+
+    emit("chat_matcher", results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Chat history memory under sustained traffic: shared list vs session store.
+
+Replays --messages chat turns spread over a rolling population of
+sessions (each lives for --turns-per-session turns and is then abandoned)
+and samples traced Python memory every --sample-every turns:
+
+- unbounded: the old single conversation_history list
+- store: conversation_store.MemoryConversationStore with the given caps
+
+A flat store curve with a climbing unbounded one is the point.
+
+    python -m benchmarks.chat_memory --messages 200000 --max-bytes 8000000
+"""
+import argparse
+import tracemalloc
+
+from benchmarks.common import Timer, emit
+
+REPLY = "I can recommend amazing local restaurants based on your taste preferences! " * 3
+
+def _run(mode: str, args) -> dict:
+    from conversation_store import MemoryConversationStore, make_turn
+
+    history = []
+    store = MemoryConversationStore(
+        max_turns=args.max_turns, max_sessions=args.max_sessions, max_bytes=args.max_bytes
+    )
+    samples = []
+    tracemalloc.start()
+    with Timer() as t:
+        for i in range(args.messages):
+            session_id = f"session-{i // args.turns_per_session}"
+            turn = make_turn(f"Where should I eat tonight? ({i})", REPLY)
+            if mode == "unbounded":
+                history.append(turn)
+            else:
+                store.append(session_id, turn)
+            if (i + 1) % args.sample_every == 0:
+                samples.append(round(tracemalloc.get_traced_memory()[0] / 1e6, 2))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    result = {
+        "turns_per_sec": round(args.messages / t.elapsed, 1),
+        "traced_mb": samples,
+        "peak_mb": round(peak / 1e6, 2)
+    }
+    if mode == "store":
+        result["store"] = store.stats()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--turns-per-session", type=int, default=8)
+    parser.add_argument("--max-turns", type=int, default=20)
+    parser.add_argument("--max-sessions", type=int, default=10000)
+    parser.add_argument("--max-bytes", type=int, default=8_000_000)
+    parser.add_argument("--sample-every", type=int, default=20000)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = {
+        "messages": args.messages,
+        "turns_per_session": args.turns_per_session,
+        "modes": {mode: _run(mode, args) for mode in ("unbounded", "store")}
+    }
+    emit("chat_memory", results, args.output)
+
+if __name__ == "__main__":
+    main()
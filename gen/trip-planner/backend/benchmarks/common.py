@@ -0,0 +1,111 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Reproducible plans so runs compare across commits; inherited by the servers benchmarks start
+os.environ.setdefault("ITINERARY_DETERMINISTIC", "true")
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def latency_summary(samples: List[float]) -> Dict:
+    """p50/p95/p99/mean in milliseconds for samples given in seconds"""
+    return {
+        "count": len(samples),
+        "mean_ms": round(1000 * sum(samples) / len(samples), 3) if samples else 0.0,
+        "p50_ms": round(1000 * percentile(samples, 50), 3),
+        "p95_ms": round(1000 * percentile(samples, 95), 3),
+        "p99_ms": round(1000 * percentile(samples, 99), 3)
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def emit(name: str, results: Dict, output: Optional[str] = None) -> Dict:
+    """Print a benchmark report as JSON and optionally write it to a file"""
+    report = {
+        "benchmark": name,
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "results": results
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return report
+
+class Timer:
+    """Context manager that records elapsed wall time in seconds"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
+
+@contextmanager
+def serve(app: str, port: int, ready_path: str, timeout: float = 30.0, **env) -> Iterator[str]:
+    """Run an ASGI app under uvicorn for the block; yields its base URL once ready_path answers 200
+
+    Extra keyword arguments are set in the server's environment.
+    """
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port)],
+        cwd=BACKEND_DIR, env=dict(os.environ, **{k: str(v) for k, v in env.items()}),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if httpx.get(f"{base_url}{ready_path}").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline or server.poll() is not None:
+                raise RuntimeError(f"{app} did not start")
+            time.sleep(0.2)
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait()
+
+def run_stub(app: str, port: int, timeout: float = 30.0, **env) -> Iterator[str]:
+    """Serve a stubs/ app for the block (e.g. run_stub(..., STUB_LATENCY_MS=20)); yields its base URL"""
+    return serve(app, port, "/stats", timeout, **env)
+
+def stub_stats(base_url: str, reset: bool = True) -> Dict:
+    """Counters from a stub's /stats, optionally resetting them"""
+    served = httpx.get(f"{base_url}/stats").json()
+    if reset:
+        httpx.post(f"{base_url}/stats/reset")
+    return served
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
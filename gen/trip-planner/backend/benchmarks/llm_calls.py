@@ -0,0 +1,120 @@
+"""LLM calls: direct OpenAI client vs the gateway (prompt cache, coalescing, limit).
+
+Starts stubs/openai_stub.py with uvicorn and sends --requests chat prompts,
+--concurrency at a time. Prompts are drawn from --distinct questions with
+a skewed popularity, and some are re-cased or re-punctuated the way users
+type them:
+
+- direct: AsyncOpenAI per request path, no cache and no concurrency limit
+- gateway: llm_gateway.LLMGateway with --max-concurrency slots
+
+Reports throughput, latency percentiles, upstream completions, tokens
+billed and the stub's peak in-flight requests.
+
+    python -m benchmarks.llm_calls --requests 400 --concurrency 32
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import emit, latency_summary, run_stub, stub_stats
+
+CITIES = ["Paris", "Tokyo", "New York", "London", "Rome", "Lisbon", "Seoul", "Cairo", "Lima", "Oslo"]
+TOPICS = ["the weather", "local food", "getting around", "things to do", "where to stay"]
+
+def _prompts(requests: int, distinct: int, seed: int):
+    rng = random.Random(seed)
+    questions = [f"What should I know about {topic} in {city}?" for city in CITIES for topic in TOPICS][:distinct]
+    # Zipf-like: a few popular questions make up most of the traffic
+    weights = [1 / (rank + 1) for rank in range(len(questions))]
+    prompts = []
+    for question in rng.choices(questions, weights, k=requests):
+        variant = rng.random()
+        if variant < 0.2:
+            question = question.lower()
+        elif variant < 0.3:
+            question = question.rstrip("?") + " ??"
+        prompts.append([
+            {"role": "system", "content": "You are a friendly travel assistant."},
+            {"role": "user", "content": question}
+        ])
+    return prompts
+
+async def _run(mode: str, base_url: str, prompts, concurrency: int, max_concurrency: int) -> dict:
+    from openai import AsyncOpenAI
+    from cache import TTLCache
+    from llm_gateway import LLM_MAX_TOKENS, LLMGateway
+
+    gateway = LLMGateway("stub", f"{base_url}/v1", max_concurrency=max_concurrency, cache=TTLCache(4096, 3600))
+    client = AsyncOpenAI(api_key="stub", base_url=f"{base_url}/v1")
+    samples, billed, sources = [], 0, {}
+
+    async def call(messages):
+        nonlocal billed
+        start = time.perf_counter()
+        if mode == "direct":
+            completion = await client.chat.completions.create(
+                model=gateway.model, messages=messages, max_tokens=LLM_MAX_TOKENS
+            )
+            billed += completion.usage.total_tokens
+            source = "upstream"
+        else:
+            result = await gateway.complete(messages)
+            billed += result.prompt_tokens + result.completion_tokens
+            source = result.source
+        samples.append(time.perf_counter() - start)
+        sources[source] = sources.get(source, 0) + 1
+
+    queue = iter(prompts)
+
+    async def worker():
+        for messages in queue:
+            await call(messages)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await client.close()
+    await gateway.aclose()
+    served = stub_stats(base_url)
+    return {
+        "requests_per_sec": round(len(prompts) / elapsed, 1),
+        "latency": latency_summary(samples),
+        "upstream_completions": served.get("completions", 0),
+        "tokens_billed": billed,
+        "stub_max_in_flight": served.get("max_in_flight", 0),
+        "sources": sources
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--distinct", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    prompts = _prompts(args.requests, args.distinct, args.seed)
+    results = {
+        "stub_latency_ms": args.latency_ms,
+        "concurrency": args.concurrency,
+        "max_concurrency": args.max_concurrency,
+        "distinct_questions": args.distinct,
+        "modes": {}
+    }
+    with run_stub("stubs.openai_stub:app", args.port, STUB_LATENCY_MS=args.latency_ms) as base_url:
+        stub_stats(base_url)
+        for mode in ("direct", "gateway"):
+            results["modes"][mode] = asyncio.run(
+                _run(mode, base_url, prompts, args.concurrency, args.max_concurrency)
+            )
+
+    emit("llm_calls", results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""In-process microbenchmarks for the backend hot paths.
+
+Each case runs --warmup untimed calls, then --iterations timed ones (bcrypt
+cases are capped at --hash-iterations), and reports latency percentiles
+and ops/sec:
+
+- planner_cold_{7,30}d: GenAITripPlanner.generate_smart_itinerary, no cache
+- planner_cached_7d: the same plan served from the itinerary cache
+- ai_service_generate_{7,30}d: ai_service.generate_itinerary
+- chatbot_chat: TravelChatbot.chat over a rotating set of messages
+- auth_hash_password / auth_verify_password: bcrypt via the hashing pool
+- auth_create_token / auth_decode_token_{miss,hit}: JWT helpers
+
+Cold planner cases pass a new seed per call so they never hit a cache;
+live signals are only fetched when WEATHER_API_URL etc. are set.
+
+    python -m benchmarks.micro --iterations 500 --only planner,auth
+"""
+import argparse
+import itertools
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.common import emit, latency_summary
+
+PREFERENCES = {"heritage": True, "food": True, "nature": False}
+USER_CONTEXT = {"travel_history": [], "booking_patterns": {}, "preferences_strength": {"heritage": 0.8, "food": 0.6}}
+CHAT_MESSAGES = [
+    "What's the weather like in Paris tomorrow?",
+    "Can you recommend restaurants in Tokyo for 4 people?",
+    "Which hotels should we stay at in London next week?",
+    "How do we get from the airport to the city center in Rome?",
+    "Any fun things to do in New York today?",
+    "Thanks, that helps a lot!"
+]
+
+def _cases(args) -> Dict[str, Callable[[], Callable[[], object]]]:
+    """name -> factory returning the zero-argument call to time"""
+    from ai_service import generate_itinerary
+    from auth import create_access_token, decode_token, get_password_hash, verify_password
+    from conversation_store import MemoryConversationStore
+    from genai_service import GenAITripPlanner, TravelChatbot
+    from itinerary_cache import ItineraryCache
+
+    def planner_cold(duration: int):
+        def factory():
+            planner = GenAITripPlanner()
+            seeds = itertools.count(1)
+            return lambda: planner.generate_smart_itinerary(
+                "Paris", duration, 1500.0, PREFERENCES, USER_CONTEXT, seed=next(seeds)
+            )
+        return factory
+
+    def planner_cached():
+        planner = GenAITripPlanner(deterministic=True, cache=ItineraryCache(maxsize=16))
+        return lambda: planner.generate_smart_itinerary("Paris", 7, 1500.0, PREFERENCES, USER_CONTEXT)
+
+    def ai_service(duration: int):
+        return lambda: lambda: generate_itinerary("Paris", duration, 1500.0, PREFERENCES)
+
+    def chatbot():
+        bot = TravelChatbot(MemoryConversationStore())
+        messages = itertools.cycle(CHAT_MESSAGES)
+        sessions = itertools.cycle([f"bench-{i}" for i in range(16)])
+        return lambda: bot.chat(next(messages), {"user_id": 1}, next(sessions))
+
+    def verify():
+        hashed = get_password_hash("benchmark-password")
+        return lambda: verify_password("benchmark-password", hashed)
+
+    def decode_miss():
+        tokens = iter([create_access_token({"sub": str(i)}) for i in range(args.iterations + args.warmup)])
+        return lambda: decode_token(next(tokens))
+
+    def decode_hit():
+        token = create_access_token({"sub": "1"})
+        return lambda: decode_token(token)
+
+    return {
+        "planner_cold_7d": planner_cold(7),
+        "planner_cold_30d": planner_cold(30),
+        "planner_cached_7d": planner_cached,
+        "ai_service_generate_7d": ai_service(7),
+        "ai_service_generate_30d": ai_service(30),
+        "chatbot_chat": chatbot,
+        "auth_hash_password": lambda: lambda: get_password_hash("benchmark-password"),
+        "auth_verify_password": verify,
+        "auth_create_token": lambda: lambda: create_access_token({"sub": "1"}),
+        "auth_decode_token_miss": decode_miss,
+        "auth_decode_token_hit": decode_hit
+    }
+
+def _run(call: Callable[[], object], iterations: int, warmup: int) -> Dict:
+    for _ in range(warmup):
+        call()
+    samples: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    summary = latency_summary(samples)
+    summary["ops_per_sec"] = round(len(samples) / sum(samples), 1) if sum(samples) else None
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--hash-iterations", type=int, default=10)
+    parser.add_argument("--only", help="Comma-separated substrings of case names to run")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    selected = [s.strip() for s in args.only.split(",")] if args.only else None
+    results = {"iterations": args.iterations, "cases": {}}
+    for name, factory in _cases(args).items():
+        if selected and not any(s in name for s in selected):
+            continue
+        bcrypt = name in ("auth_hash_password", "auth_verify_password")
+        iterations = min(args.iterations, args.hash_iterations) if bcrypt else args.iterations
+        results["cases"][name] = _run(factory(), iterations, 1 if bcrypt else args.warmup)
+
+    emit("micro", results, args.output)
+
+if __name__ == "__main__":
+    main()
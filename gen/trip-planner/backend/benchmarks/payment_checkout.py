@@ -0,0 +1,141 @@
+"""Checkout latency and write volume: inline gateway call vs settlement queue.
+
+Runs --payments checkouts from --concurrency client threads against a
+simulated gateway that takes --gateway-ms per call:
+
+- inline: the previous shape, the gateway call inside the request and a
+  second UPDATE with its outcome
+- queued: payment_queue.accept_payment; the pending row is the only
+  request-time write and outcomes land in batched UPDATEs
+
+Then replays every queued checkout with the same Idempotency-Key and
+reports how many rows and statements the retries added (should be 0).
+
+Uses DATABASE_URL when set, otherwise a throwaway SQLite file.
+
+    python -m benchmarks.payment_checkout --payments 200 --gateway-ms 200
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import Timer, emit, latency_summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--gateway-ms", type=float, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+    from sqlalchemy import event, func, select
+
+    from database import SessionLocal, engine
+    from models import Base, Booking, Payment, Trip
+    from payment_service import SimulatedGateway
+    from schemas import PaymentCreate
+    import payment_queue as pq
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        trip = Trip(user_id=1, destination="Paris", duration=3, total_cost=300, status="planning")
+        db.add(trip)
+        db.flush()
+        booking = Booking(trip_id=trip.id, item_type="full_trip", item_id="bench", status="confirmed")
+        db.add(booking)
+        db.commit()
+        booking_id = booking.id
+
+    statements = {"insert": 0, "update": 0, "select": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip().split(None, 1)[0].lower()
+        if verb in statements and "payments" in statement:
+            statements[verb] += 1
+
+    gateway = SimulatedGateway(latency_ms=args.gateway_ms)
+    queue = pq.PaymentQueue(gateway, workers=args.workers, maxsize=args.payments * 2)
+    pq.payment_queue = queue
+    request = PaymentCreate(booking_id=booking_id, amount=100.0, method="credit_card")
+
+    def inline(i):
+        with SessionLocal() as db:
+            payment = Payment(booking_id=booking_id, amount=request.amount, method=request.method, status="pending")
+            db.add(payment)
+            db.commit()
+            result = gateway.charge(request.amount, request.method, f"inline-{i}")
+            payment.status = "completed" if result["success"] else "failed"
+            payment.transaction_id = result.get("transaction_id")
+            db.commit()
+
+    def queued(i):
+        with SessionLocal() as db:
+            pq.accept_payment(db, request, f"queued-{i}")
+
+    def timed(fn):
+        def run(i):
+            start = time.perf_counter()
+            fn(i)
+            return time.perf_counter() - start
+        return run
+
+    def payment_rows():
+        with SessionLocal() as db:
+            return db.scalar(select(func.count()).select_from(Payment))
+
+    def unsettled():
+        with SessionLocal() as db:
+            return db.scalar(select(func.count()).select_from(Payment).where(
+                Payment.status.in_(pq.UNSETTLED_STATUSES)))
+
+    results = {
+        "database": engine.url.get_backend_name(),
+        "payments": args.payments,
+        "concurrency": args.concurrency,
+        "gateway_ms": args.gateway_ms,
+        "modes": {}
+    }
+    queue.start()
+    for mode, fn in (("inline", inline), ("queued", queued)):
+        for key in statements:
+            statements[key] = 0
+        with ThreadPoolExecutor(args.concurrency) as pool, Timer() as t:
+            samples = list(pool.map(timed(fn), range(args.payments)))
+        entry = {"checkout": latency_summary(samples), "checkouts_per_sec": round(args.payments / t.elapsed, 1)}
+        # Statements issued by the checkout requests themselves
+        entry["statements"] = dict(statements)
+        if mode == "queued":
+            with Timer() as settle:
+                while unsettled():
+                    time.sleep(0.01)
+            entry["settled_after_s"] = round(t.elapsed + settle.elapsed, 3)
+            stats = queue.stats()
+            entry["status_writes"] = stats["status_writes"]
+            entry["rows_written"] = stats["rows_written"]
+        results["modes"][mode] = entry
+
+    rows_before = payment_rows()
+    for key in statements:
+        statements[key] = 0
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(queued, range(args.payments)))
+    results["retries"] = {
+        "requests": args.payments,
+        "rows_added": payment_rows() - rows_before,
+        "statements": dict(statements),
+        "replayed": queue.stats()["replayed"]
+    }
+    queue.stop()
+
+    emit("payment_checkout", results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Plan quality vs solve latency for each selection strategy by trip length.
+
+Quality is the preference-weighted objective from selection_strategies
+(higher is better), also reported relative to the best strategy. No
+database needed; the itinerary cache is bypassed so every call plans.
+
+    python -m benchmarks.planner_strategies --durations 1,7,30,60,90,120 --repeat 20
+"""
+import argparse
+
+from benchmarks.common import Timer, emit, latency_summary
+
+PREFERENCES = {"heritage": True, "food": True, "adventure": True}
+STRENGTHS = {"heritage": 1.0, "food": 1.5, "adventure": 0.5}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--destination", default="Paris")
+    parser.add_argument("--durations", default="1,7,14,30,60,90,120")
+    parser.add_argument("--budget-per-day", type=float, default=120)
+    parser.add_argument("--strategies", default="greedy,vectorized,knapsack,local_search")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    from genai_service import GenAITripPlanner
+    from selection_strategies import score_itinerary
+
+    user_context = {"travel_history": [], "booking_patterns": {}, "preferences_strength": STRENGTHS}
+    strategies = args.strategies.split(",")
+    results = {
+        "destination": args.destination,
+        "budget_per_day": args.budget_per_day,
+        "preference_weights": STRENGTHS,
+        "durations": {}
+    }
+    for duration in [int(d) for d in args.durations.split(",")]:
+        budget = args.budget_per_day * duration
+        entry = {}
+        for name in strategies:
+            planner = GenAITripPlanner(strategy=name)
+            samples, scores, spent = [], [], []
+            for seed in range(args.repeat + 1):
+                with Timer() as t:
+                    result = planner.generate_smart_itinerary(
+                        args.destination, duration, budget, PREFERENCES, user_context, seed=seed
+                    )
+                if seed == 0:
+                    continue  # warm-up
+                request = planner._selection_request(
+                    args.destination, duration, budget, PREFERENCES, user_context, {"weather": ""}
+                )
+                samples.append(t.elapsed)
+                scores.append(score_itinerary(result["itinerary"], request))
+                spent.append(sum(item["cost"] for item in result["itinerary"]))
+            entry[name] = {
+                "latency": latency_summary(samples),
+                "score": round(sum(scores) / len(scores), 3),
+                "budget_used": round(sum(spent) / len(spent) / budget, 3)
+            }
+        best = max(stats["score"] for stats in entry.values()) or 1.0
+        for stats in entry.values():
+            stats["score_vs_best"] = round(stats["score"] / best, 3)
+        results["durations"][str(duration)] = entry
+
+    emit("planner_strategies", results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Provider lookups: client per call vs the shared pooled client, and coalescing.
+
+Starts stubs/provider_stub.py with uvicorn and issues --requests weather
+lookups in waves of --concurrency:
+
+- per_call: a new httpx.AsyncClient (new TCP connection) for every lookup
+- pooled: the shared keep-alive client, distinct cities
+- coalesced: the shared client with every wave asking for the same city;
+  upstream_requests should be about one per wave
+
+    python -m benchmarks.provider_client --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.common import emit, latency_summary, run_stub, stub_stats
+
+async def _timed(fn, samples):
+    start = time.perf_counter()
+    await fn()
+    samples.append(time.perf_counter() - start)
+
+async def _run(mode: str, base_url: str, requests: int, concurrency: int) -> dict:
+    from providers import WeatherProvider, get_client
+
+    provider = WeatherProvider(base_url)
+    samples = []
+
+    async def per_call(city):
+        async with httpx.AsyncClient() as client:
+            (await client.get(f"{base_url}/weather", params={"city": city})).raise_for_status()
+
+    started = time.perf_counter()
+    for wave in range(0, requests, concurrency):
+        size = min(concurrency, requests - wave)
+        if mode == "per_call":
+            calls = [lambda i=i: per_call(f"city-{wave + i}") for i in range(size)]
+        elif mode == "pooled":
+            calls = [lambda i=i: provider.fetch(f"city-{wave + i}") for i in range(size)]
+        else:
+            calls = [lambda: provider.fetch(f"city-{wave}") for _ in range(size)]
+        await asyncio.gather(*(_timed(call, samples) for call in calls))
+    elapsed = time.perf_counter() - started
+    await get_client().aclose()
+    return {
+        "lookups_per_sec": round(requests / elapsed, 1),
+        "latency": latency_summary(samples),
+        "upstream_requests": stub_stats(base_url).get("weather", 0)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    with run_stub("stubs.provider_stub:app", args.port, STUB_LATENCY_MS=args.latency_ms) as base_url:
+        stub_stats(base_url)
+        results = {"stub_latency_ms": args.latency_ms, "concurrency": args.concurrency, "modes": {}}
+        for mode in ("per_call", "pooled", "coalesced"):
+            results["modes"][mode] = asyncio.run(_run(mode, base_url, args.requests, args.concurrency))
+
+    emit("provider_client", results, args.output)
+
+if __name__ == "__main__":
+    main()
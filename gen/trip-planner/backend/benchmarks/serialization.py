@@ -0,0 +1,85 @@
+"""Response serialization time and payload bytes for growing itineraries.
+
+For each --durations value, plans a trip and serializes two bodies:
+
+- plan: the planner result (itinerary days, insights, pricing), a nested dict
+- detail: GET /trips/{id}/itinerary as TripDetailResponse
+
+through each path an endpoint can take:
+
+- encoder_json: FastAPI's default, jsonable_encoder then json.dumps
+- encoder_orjson: jsonable_encoder then orjson (default_response_class only)
+- orjson: responses.json_response, orjson with no encoder pass
+- pydantic: model_dump_json on a prebuilt response model (detail only)
+
+and reports the body size raw, gzip'd and brotli'd with compression time.
+
+    python -m benchmarks.serialization --durations 1,7,30,90,365
+"""
+import argparse
+import time
+from datetime import datetime
+
+from benchmarks.common import emit
+
+def _best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 4)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--durations", default="1,7,30,90,365")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+
+    from responses import ENCODERS
+    from schemas import TripCreate, TripDetailResponse
+    from trip_service import plan_trip
+
+    results = {"encodings": sorted(ENCODERS), "durations": {}}
+    for duration in [int(d) for d in args.durations.split(",")]:
+        plan = plan_trip(TripCreate(destination="Paris", duration=duration))
+        rows = [
+            {"id": i + 1, "day": day["day"], "activity": day["activity"], "location": day["location"],
+             "cost": day["cost"]}
+            for i, day in enumerate(plan["itinerary"])
+        ]
+        detail = TripDetailResponse(
+            trip={"id": 1, "destination": "Paris", "duration": duration, "status": "planning",
+                  "total_cost": sum(row["cost"] for row in rows), "created_at": datetime.utcnow()},
+            itinerary=rows
+        )
+        detail_data = detail.model_dump()
+        entry = {}
+        for name, data in (("plan", plan), ("detail", detail_data)):
+            paths = {
+                "encoder_json": lambda: JSONResponse(jsonable_encoder(data)).body,
+                "encoder_orjson": lambda: ORJSONResponse(jsonable_encoder(data)).body,
+                "orjson": lambda: ORJSONResponse(data).body
+            }
+            if name == "detail":
+                paths["pydantic"] = lambda: detail.model_dump_json().encode("utf-8")
+            body = paths["encoder_json"]()
+            entry[name] = {
+                "serialize_ms": {path: _best_ms(fn, args.repeat) for path, fn in paths.items()},
+                "bytes": {"identity": len(body)}
+            }
+            for encoding, compress in ENCODERS.items():
+                entry[name]["bytes"][encoding] = len(compress(body))
+                entry[name].setdefault("compress_ms", {})[encoding] = _best_ms(lambda: compress(body), args.repeat)
+            serialize = entry[name]["serialize_ms"]
+            entry[name]["speedup_orjson"] = round(serialize["encoder_json"] / serialize["orjson"], 1)
+        results["durations"][str(duration)] = entry
+
+    emit("serialization", results, args.output)
+
+if __name__ == "__main__":
+    main()
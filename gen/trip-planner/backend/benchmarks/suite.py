@@ -0,0 +1,153 @@
+"""Run a fixed set of benchmarks into one directory and compare two runs.
+
+`run` executes each benchmark of --suite as a subprocess with fixed
+arguments, writing <name>.json plus a suite.json index into --out-dir
+(default benchmarks/results/<commit>). The quick suite is in-process only;
+full adds the HTTP load mix and the database benchmarks, which use
+--database-url (default DATABASE_URL) or a throwaway SQLite file each.
+
+`compare` lines up the numeric results of two run directories and flags
+every metric that moved the wrong way by more than --threshold: latencies
+and durations (*_ms, *_s), errors and oversold counts should not rise,
+throughputs (*per_sec) and speedups should not fall. Millisecond metrics
+below --min-ms in both runs are skipped as timer noise.
+
+    python -m benchmarks.suite run --suite full
+    python -m benchmarks.suite compare benchmarks/results/abc1234 benchmarks/results/def5678 --fail
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from benchmarks.common import BACKEND_DIR, emit, git_commit
+
+QUICK = {
+    "micro": ["--iterations", "200"],
+    "serialization": ["--durations", "7,30,90", "--repeat", "20"],
+    "chat_matcher": ["--sizes", "0,1000", "--messages", "1000"],
+    "planner_strategies": ["--durations", "7,30", "--repeat", "5"]
+}
+FULL = {
+    **QUICK,
+    "bulk_insert": ["--durations", "7,30", "--repeat", "10"],
+    "booking_contention": ["--bookers", "100", "--capacity", "50"],
+    "payment_checkout": ["--payments", "100", "--gateway-ms", "50"],
+    "load_mix": ["--requests", "2000", "--concurrency", "32"]
+}
+SUITES = {"quick": QUICK, "full": FULL}
+
+LOWER_IS_BETTER = ("_ms", "_s", "errors", "oversold")
+HIGHER_IS_BETTER = ("per_sec", "speedup")
+
+def run_suite(suite: str, out_dir: str, database_url: Optional[str]) -> Dict:
+    os.makedirs(out_dir, exist_ok=True)
+    env = dict(os.environ)
+    if database_url:
+        env["DATABASE_URL"] = database_url
+    benchmarks = {}
+    for name, args in SUITES[suite].items():
+        output = os.path.join(out_dir, f"{name}.json")
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-m", f"benchmarks.{name}", *args, "--output", output],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+        )
+        benchmarks[name] = {
+            "args": args,
+            "status": "ok" if completed.returncode == 0 else "failed",
+            "elapsed_s": round(time.perf_counter() - start, 1)
+        }
+        if completed.returncode != 0:
+            benchmarks[name]["stderr"] = completed.stderr[-2000:]
+        print(f"{name}: {benchmarks[name]['status']} in {benchmarks[name]['elapsed_s']}s", file=sys.stderr)
+    database = (database_url or "sqlite").split(":", 1)[0]
+    return emit("suite", {"suite": suite, "database": database, "benchmarks": benchmarks},
+                os.path.join(out_dir, "suite.json"))
+
+def _flatten(data, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from _flatten(value, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        yield prefix, float(data)
+
+def _direction(path: str) -> int:
+    """-1 when a smaller value is better, 1 when larger is, 0 for parameters and counts"""
+    key = path.rsplit(".", 1)[-1]
+    if key.endswith(HIGHER_IS_BETTER) or key.startswith("speedup"):
+        return 1
+    if key.endswith(LOWER_IS_BETTER) or "_ms." in path:
+        return -1
+    return 0
+
+def _load(run_dir: str) -> Dict[str, Dict[str, float]]:
+    metrics = {}
+    for filename in sorted(os.listdir(run_dir)):
+        if not filename.endswith(".json") or filename == "suite.json":
+            continue
+        with open(os.path.join(run_dir, filename), encoding="utf-8") as f:
+            report = json.load(f)
+        metrics[report["benchmark"]] = dict(_flatten(report["results"]))
+    return metrics
+
+def compare(old_dir: str, new_dir: str, threshold: float, min_ms: float = 0.0) -> Dict:
+    old, new = _load(old_dir), _load(new_dir)
+    regressions: List[Dict] = []
+    improvements: List[Dict] = []
+    for name in sorted(old.keys() & new.keys()):
+        for path, before in old[name].items():
+            after = new[name].get(path)
+            direction = _direction(path)
+            if after is None or direction == 0 or after == before:
+                continue
+            if "_ms" in path and max(before, after) < min_ms:
+                continue
+            change = (after - before) / before if before else float("inf")
+            entry = {"benchmark": name, "metric": path, "old": before, "new": after,
+                     "change": round(change, 3) if before else None}
+            if change * direction < -threshold:
+                regressions.append(entry)
+            elif change * direction > threshold:
+                improvements.append(entry)
+    return {
+        "old": old_dir,
+        "new": new_dir,
+        "threshold": threshold,
+        "min_ms": min_ms,
+        "only_in_old": sorted(old.keys() - new.keys()),
+        "only_in_new": sorted(new.keys() - old.keys()),
+        "regressions": regressions,
+        "improvements": improvements
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="Run a suite into a results directory")
+    run.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    run.add_argument("--out-dir")
+    run.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    diff = commands.add_parser("compare", help="Compare two results directories")
+    diff.add_argument("old_dir")
+    diff.add_argument("new_dir")
+    diff.add_argument("--threshold", type=float, default=0.1, help="Relative change to report (0.1 = 10%%)")
+    diff.add_argument("--min-ms", type=float, default=0.1, help="Ignore millisecond metrics below this in both runs")
+    diff.add_argument("--fail", action="store_true", help="Exit with status 1 when anything regressed")
+    diff.add_argument("--output")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        out_dir = args.out_dir or os.path.join(BACKEND_DIR, "benchmarks", "results", git_commit() or "local")
+        report = run_suite(args.suite, out_dir, args.database_url)
+        failed = [name for name, entry in report["results"]["benchmarks"].items() if entry["status"] != "ok"]
+        sys.exit(1 if failed else 0)
+
+    report = emit("suite_compare", compare(args.old_dir, args.new_dir, args.threshold, args.min_ms), args.output)
+    sys.exit(1 if args.fail and report["results"]["regressions"] else 0)
+
+if __name__ == "__main__":
+    main()
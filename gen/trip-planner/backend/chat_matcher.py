@@ -0,0 +1,125 @@
+import json
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Keyword tables for TravelChatbot. Intents are listed in priority order: when
+# a message hits several, the first listed wins. Phrases match anywhere in
+# the message, case-insensitively, like the substring checks they replace:
+# "hotel" also matches "hotels" and "eat" matches "great". Any run of
+# whitespace may separate the words of a phrase. CHAT_KEYWORDS_PATH loads
+# the same shape from JSON.
+DEFAULT_KEYWORDS = {
+    "default_intent": "general_inquiry",
+    "intents": {
+        "weather_inquiry": ["weather", "climate", "temperature"],
+        "food_recommendation": ["restaurant", "food", "eat", "dining"],
+        "accommodation_inquiry": ["hotel", "stay", "accommodation"],
+        "transport_inquiry": ["transport", "travel", "flight", "train"],
+        "activity_recommendation": ["activity", "things to do", "attractions"]
+    },
+    "entities": {
+        "cities": ["paris", "tokyo", "new york", "london", "rome"],
+        "dates": ["today", "tomorrow", "next week"]
+    }
+}
+
+CHAT_KEYWORDS_PATH = os.getenv("CHAT_KEYWORDS_PATH")
+
+def _normalize(value: str) -> str:
+    return " ".join(value.lower().split())
+
+def trie_pattern(phrases: Iterable[str]) -> str:
+    """Regex matching any of phrases, shaped as a trie
+
+    re tries the branches of a flat alternation one after another at every
+    position; sharing prefixes means each character is examined once per
+    trie level instead, so thousands of phrases cost about as much as a few.
+    Longer phrases win because every optional tail is greedy.
+    """
+    trie: Dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return _node_pattern(trie)
+
+def _node_pattern(node: Dict) -> str:
+    branches = [
+        (r"\s+" if char == " " else re.escape(char)) + _node_pattern(child)
+        for char, child in sorted(node.items()) if char
+    ]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return f"(?:{body})?" if "" in node else body
+
+class KeywordMatcher:
+    """Intent and entities from one pass of a precompiled regex
+
+    Every phrase from every table goes into a single trie regex, and a dict
+    maps each matched phrase back to its tables. The phrase regex is a
+    lookahead tried at every position, so overlapping phrases all count,
+    and a phrase also carries the labels of phrases that are its prefixes
+    (the trie only reports the longest one starting at a position).
+    Numbers are whitespace-separated runs of digits.
+    """
+
+    def __init__(self, data: Dict):
+        self.default_intent = data.get("default_intent", "general_inquiry")
+        self.intents = list(data.get("intents", {}))
+        self.entity_types = list(data.get("entities", {}))
+        # phrase -> [(kind, label, value)]; kind is "intent" or "entity",
+        # value the table entry that matched (the phrase itself or a prefix)
+        own: Dict[str, List[Tuple[str, str]]] = {}
+        for kind, tables in (("intent", data.get("intents", {})), ("entity", data.get("entities", {}))):
+            for label, phrases in tables.items():
+                for phrase in filter(None, map(_normalize, phrases)):
+                    own.setdefault(phrase, []).append((kind, label))
+        self._labels: Dict[str, List[Tuple[str, str, str]]] = {
+            phrase: [(kind, label, phrase[:end]) for end in range(1, len(phrase) + 1)
+                     for kind, label in own.get(phrase[:end], ())]
+            for phrase in own
+        }
+        self._priority = {intent: rank for rank, intent in enumerate(self.intents)}
+
+        number = r"(?<!\S)(?P<number>\d+)(?!\S)"
+        if self._labels:
+            phrase = r"(?=(?P<phrase>" + trie_pattern(self._labels) + r"))"
+            self._pattern = re.compile(f"{number}|{phrase}")
+        else:
+            self._pattern = re.compile(number)
+
+    def match(self, message: str) -> Tuple[str, Dict[str, List]]:
+        """(intent, entities) for a message; entity lists keep first-seen order"""
+        best_rank = len(self.intents)
+        entities: Dict[str, List] = {entity_type: [] for entity_type in self.entity_types}
+        numbers = []
+        for found in self._pattern.finditer(message.lower()):
+            digits = found.group("number")
+            if digits is not None:
+                numbers.append(int(digits))
+                continue
+            phrase = found.group("phrase")
+            if phrase not in self._labels:
+                phrase = _normalize(phrase)  # matched across a run of whitespace
+            for kind, label, value in self._labels[phrase]:
+                if kind == "intent":
+                    best_rank = min(best_rank, self._priority[label])
+                elif value not in entities[label]:
+                    entities[label].append(value)
+        entities["numbers"] = numbers
+        intent = self.intents[best_rank] if best_rank < len(self.intents) else self.default_intent
+        return intent, entities
+
+def load_keywords(path: Optional[str] = None) -> Dict:
+    path = path or CHAT_KEYWORDS_PATH
+    if not path:
+        return DEFAULT_KEYWORDS
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def build_keyword_matcher(path: Optional[str] = None) -> KeywordMatcher:
+    """Matcher for the built-in tables or CHAT_KEYWORDS_PATH"""
+    return KeywordMatcher(load_keywords(path))
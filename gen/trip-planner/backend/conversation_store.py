@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+CHAT_STORE_BACKEND = os.getenv("CHAT_STORE_BACKEND", "memory")  # memory | redis
+CHAT_STORE_URL = os.getenv("CHAT_STORE_URL", "redis://localhost:6379/0")
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "20"))
+CHAT_SESSION_IDLE_TTL = float(os.getenv("CHAT_SESSION_IDLE_TTL", "1800"))
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "10000"))
+CHAT_STORE_MAX_BYTES = int(os.getenv("CHAT_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+CHAT_MESSAGE_MAX_CHARS = int(os.getenv("CHAT_MESSAGE_MAX_CHARS", "2000"))
+
+# Rough per-turn overhead (dict, timestamp, deque slot) on top of the text itself
+_TURN_OVERHEAD_BYTES = 400
+
+def make_turn(message: str, reply: str) -> Dict:
+    """One stored exchange, with both sides truncated to CHAT_MESSAGE_MAX_CHARS"""
+    return {
+        "user": message[:CHAT_MESSAGE_MAX_CHARS],
+        "bot": reply[:CHAT_MESSAGE_MAX_CHARS],
+        "timestamp": datetime.now().isoformat()
+    }
+
+def _turn_size(turn: Dict) -> int:
+    return len(turn["user"]) + len(turn["bot"]) + _TURN_OVERHEAD_BYTES
+
+class _Session:
+    __slots__ = ("turns", "turn_count", "size", "last_seen")
+
+    def __init__(self, max_turns: int, now: float):
+        self.turns: deque = deque(maxlen=max_turns)
+        self.turn_count = 0
+        self.size = 0
+        self.last_seen = now
+
+class MemoryConversationStore:
+    """Per-session ring buffers of recent turns, bounded three ways
+
+    Each session keeps its last max_turns turns. A session idle for longer
+    than idle_ttl is dropped. Past max_sessions or max_bytes (estimated from
+    the stored text), the least recently active sessions are evicted first.
+    """
+
+    def __init__(self, max_turns: int = CHAT_HISTORY_TURNS, idle_ttl: float = CHAT_SESSION_IDLE_TTL,
+                 max_sessions: int = CHAT_MAX_SESSIONS, max_bytes: int = CHAT_STORE_MAX_BYTES,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._clock = clock
+        # Ordered by last activity, so idle and LRU sessions are always at the front
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.idle_evictions = 0
+        self.capacity_evictions = 0
+
+    def history(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        """The session's most recent turns, oldest first"""
+        with self._lock:
+            self._evict_idle(self._clock())
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            turns = list(session.turns)
+        return turns[-limit:] if limit else turns
+
+    def append(self, session_id: str, turn: Dict) -> int:
+        """Record a turn; returns its number within the session (1-based)"""
+        now = self._clock()
+        size = _turn_size(turn)
+        with self._lock:
+            self._evict_idle(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(self.max_turns, now)
+            if len(session.turns) == session.turns.maxlen:
+                dropped = _turn_size(session.turns[0])
+                session.size -= dropped
+                self.size -= dropped
+            session.turns.append(turn)
+            session.turn_count += 1
+            session.size += size
+            session.last_seen = now
+            self.size += size
+            self._sessions.move_to_end(session_id)
+            # The session just written is last in order, so it is only evicted if it alone exceeds the cap
+            while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or self.size > self.max_bytes):
+                self._drop_oldest()
+                self.capacity_evictions += 1
+            return session.turn_count
+
+    async def ahistory(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        # In-process and only briefly locked, so it is fine on the event loop
+        return self.history(session_id, limit)
+
+    async def aappend(self, session_id: str, turn: Dict) -> int:
+        return self.append(session_id, turn)
+
+    def clear(self, session_id: str):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self.size -= session.size
+
+    def _evict_idle(self, now: float):
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_seen < self.idle_ttl:
+                break
+            self._drop_oldest()
+            self.idle_evictions += 1
+
+    def _drop_oldest(self):
+        _, session = self._sessions.popitem(last=False)
+        self.size -= session.size
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._evict_idle(self._clock())
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "max_turns": self.max_turns,
+                "idle_ttl": self.idle_ttl,
+                "idle_evictions": self.idle_evictions,
+                "capacity_evictions": self.capacity_evictions
+            }
+
+class RedisConversationStore:
+    """Sessions in any Redis-protocol server, shared by every uvicorn worker
+
+    Each session is a list trimmed to max_turns whose keys expire after
+    idle_ttl without activity. The overall memory cap is the server's own
+    maxmemory policy (allkeys-lru or volatile-lru). Async handlers use
+    ahistory/aappend, which go through a redis.asyncio client so a round
+    trip never blocks the event loop.
+    """
+
+    def __init__(self, url: str, max_turns: int = CHAT_HISTORY_TURNS, idle_ttl: float = CHAT_SESSION_IDLE_TTL,
+                 prefix: str = "chat:"):
+        import redis  # optional dependency, only needed for this backend
+        import redis.asyncio
+
+        self.client = redis.Redis.from_url(url)
+        self.async_client = redis.asyncio.Redis.from_url(url)
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.prefix = prefix
+
+    def history(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        count = min(limit or self.max_turns, self.max_turns)
+        return [json.loads(turn) for turn in self.client.lrange(self.prefix + session_id, -count, -1)]
+
+    async def ahistory(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        count = min(limit or self.max_turns, self.max_turns)
+        return [json.loads(turn) for turn in await self.async_client.lrange(self.prefix + session_id, -count, -1)]
+
+    def append(self, session_id: str, turn: Dict) -> int:
+        return self._append_pipeline(self.client.pipeline(), session_id, turn).execute()[3]
+
+    async def aappend(self, session_id: str, turn: Dict) -> int:
+        return (await self._append_pipeline(self.async_client.pipeline(), session_id, turn).execute())[3]
+
+    def _append_pipeline(self, pipe, session_id: str, turn: Dict):
+        key, counter_key = self.prefix + session_id, f"{self.prefix}{session_id}:turns"
+        ttl = max(1, int(self.idle_ttl))
+        pipe.rpush(key, json.dumps(turn))
+        pipe.ltrim(key, -self.max_turns, -1)
+        pipe.expire(key, ttl)
+        pipe.incr(counter_key)
+        pipe.expire(counter_key, ttl)
+        return pipe
+
+    def clear(self, session_id: str):
+        self.client.delete(self.prefix + session_id, f"{self.prefix}{session_id}:turns")
+
+    def stats(self) -> Dict:
+        return {"backend": "redis", "max_turns": self.max_turns, "idle_ttl": self.idle_ttl}
+
+def build_conversation_store():
+    """Store configured from CHAT_STORE_*"""
+    if CHAT_STORE_BACKEND == "redis":
+        return RedisConversationStore(CHAT_STORE_URL)
+    return MemoryConversationStore()
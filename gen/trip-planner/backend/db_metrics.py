@@ -0,0 +1,108 @@
+import time
+from typing import Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from metrics import LIFETIME_BUCKETS, counter, histogram
+
+POOL_CHECKOUT_SECONDS = histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a pooled connection"
+)
+POOL_CONNECTION_LIFETIME_SECONDS = histogram(
+    "db_pool_connection_lifetime_seconds", "Age of DBAPI connections when closed", LIFETIME_BUCKETS
+)
+POOL_CHECKOUT_TIMEOUTS = counter("db_pool_checkout_timeouts_total", "Checkouts that hit pool_timeout")
+POOL_CONNECTS = counter("db_pool_connects_total", "New DBAPI connections opened")
+POOL_CLOSES = counter("db_pool_closes_total", "DBAPI connections closed or invalidated")
+DB_QUERY_SECONDS = histogram(
+    "db_query_seconds", "Time in cursor.execute/executemany by statement type", labelnames=("operation",)
+)
+DB_QUERY_ERRORS = counter("db_query_errors_total", "Statements that raised", labelnames=("operation",))
+
+QUERY_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+class _CheckoutTimingMixin:
+    """Times _do_get, which is where a checkout blocks on an exhausted pool"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start)
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _on_connect(dbapi_connection, connection_record):
+    connection_record.info["connected_at"] = time.monotonic()
+    POOL_CONNECTS.inc()
+
+def _on_close(dbapi_connection, connection_record):
+    connected_at = connection_record.info.pop("connected_at", None)
+    if connected_at is not None:
+        POOL_CONNECTION_LIFETIME_SECONDS.observe(time.monotonic() - connected_at)
+    POOL_CLOSES.inc()
+
+def instrument_pool(pool):
+    """Attach connection churn listeners to a pool"""
+    event.listen(pool, "connect", _on_connect)
+    event.listen(pool, "close", _on_close)
+    event.listen(pool, "close_detached", lambda dbapi_connection: POOL_CLOSES.inc())
+
+def _operation(statement: str) -> str:
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return verb if verb in QUERY_OPERATIONS else "OTHER"
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context so a statement that raises leaves nothing behind
+    context._query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is not None:
+        DB_QUERY_SECONDS.labels(operation=_operation(statement)).observe(time.perf_counter() - started)
+
+def _on_error(exception_context):
+    if exception_context.statement:
+        DB_QUERY_ERRORS.labels(operation=_operation(exception_context.statement)).inc()
+
+def instrument_queries(engine):
+    """Time every statement an engine (sync, or an async engine's sync_engine) executes"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _on_error)
+
+def pool_stats(pool) -> Dict:
+    """Point-in-time pool occupancy plus the recorded histograms"""
+    stats = {"pool_class": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        checked_out = pool.checkedout()
+        stats.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_in": pool.checkedin(),
+            "checked_out": checked_out,
+            "overflow": pool.overflow(),
+            "saturation": round(checked_out / capacity, 3) if capacity > 0 else None
+        })
+    return stats
+
+def metrics_snapshot() -> Dict:
+    return {
+        "checkout_seconds": POOL_CHECKOUT_SECONDS.snapshot(),
+        "checkout_p99_seconds": POOL_CHECKOUT_SECONDS.quantile(0.99),
+        "checkout_timeouts": POOL_CHECKOUT_TIMEOUTS.value,
+        "connection_lifetime_seconds": POOL_CONNECTION_LIFETIME_SECONDS.snapshot(),
+        "connects": POOL_CONNECTS.value,
+        "closes": POOL_CLOSES.value,
+        "query_seconds": DB_QUERY_SECONDS.snapshot()
+    }
@@ -1,13 +1,76 @@
+import asyncio
 import json
+import os
 import random
-from typing import List, Dict, Optional
-import httpx
+import time
+from typing import Callable, Iterator, List, Dict, Optional, Tuple, Union
 from datetime import datetime, timedelta
+from activity_catalog import get_catalog
+from chat_matcher import KeywordMatcher, build_keyword_matcher
+from conversation_store import MemoryConversationStore, make_turn
+from itinerary_cache import ItineraryCache, make_key, derive_seed
+from llm_gateway import LLMError, LLMResult, llm_gateway
+from metrics import histogram, timed
+from providers import fetch_signals, fetch_signals_sync
+from selection_strategies import (
+    SelectionRequest, SelectionStrategy, apply_discounts, default_item, get_strategy
+)
+
+# Agents that draw random numbers; each gets its own RNG (seeded in this
+# order) so they can run concurrently and still reproduce seeded plans
+RANDOM_AGENTS = ("context", "insights", "activities", "pricing", "sustainability")
+
+# Seconds each agent may take in agenerate_smart_itinerary before its
+# fallback is used; PLANNER_AGENT_TIMEOUTS="insights=1.5,activities=3" overrides
+AGENT_TIMEOUTS = {
+    "context": 0.5, "insights": 2.0, "activities": 5.0, "risk": 0.5,
+    "recommendations": 3.0, "pricing": 0.5, "sustainability": 0.5
+}
+for _override in filter(None, os.getenv("PLANNER_AGENT_TIMEOUTS", "").split(",")):
+    _agent, _, _seconds = _override.partition("=")
+    AGENT_TIMEOUTS[_agent.strip()] = float(_seconds)
+
+PLANNER_STAGE_SECONDS = histogram(
+    "planner_stage_seconds", "GenAITripPlanner stage latency, by method", labelnames=("stage",)
+)
+PLANNER_AGENT_SECONDS = histogram(
+    "planner_agent_seconds", "Agent latency in agenerate_smart_itinerary, including timeouts and fallbacks",
+    labelnames=("agent", "status")
+)
+
+def _stage(method):
+    """Record a planner method's latency as planner_stage_seconds{stage="<method name>"}"""
+    return timed(PLANNER_STAGE_SECONDS.labels(stage=method.__name__.lstrip("_")))(method)
+
+FALLBACK_INSIGHTS = {
+    "weather": "unknown",
+    "weather_impact": "Live conditions unavailable",
+    "events": [],
+    "crowd_levels": "Medium",
+    "price_trends": "Stable"
+}
+
+RECOMMENDATIONS_PROMPT = (
+    "You are a travel planner. Reply with exactly five short, practical recommendations "
+    "for this trip, one per line, without numbering."
+)
+
+CHAT_PROMPT = (
+    "You are a friendly travel assistant in a trip planning app. "
+    "Answer in at most three sentences and stay on the user's question."
+)
 
 class GenAITripPlanner:
     """Advanced GenAI Trip Planning with multiple AI agents"""
     
-    def __init__(self):
+    def __init__(self, deterministic: bool = False, cache: Optional[ItineraryCache] = None,
+                 strategy: Union[str, SelectionStrategy] = "greedy"):
+        # deterministic=True seeds each request from its inputs, which is what
+        # makes results cacheable and load tests comparable across runs
+        self.deterministic = deterministic
+        self.cache = cache
+        self.strategy = get_strategy(strategy)
+        self.rng = random.Random()
         self.weather_conditions = ["sunny", "rainy", "cloudy", "snowy"]
         self.local_events = {
             "paris": ["Fashion Week", "Wine Festival", "Art Exhibition"],
@@ -16,42 +79,259 @@ class GenAITripPlanner:
         }
     
     def generate_smart_itinerary(self, destination: str, duration: int, budget: float, 
-                               preferences: Dict, user_context: Dict) -> Dict:
+                               preferences: Dict, user_context: Dict, seed: Optional[int] = None) -> Dict:
         """Multi-agent AI system for intelligent trip planning"""
         
+        key, cached = self._prepare(destination, duration, budget, preferences, user_context, seed)
+        if cached is not None:
+            return cached
+        
+        result = self._plan(destination, duration, budget, preferences, user_context)
+        
+        if key is not None and self.cache is not None:
+            self.cache.set(key, result)
+        return result
+    
+    def stream_smart_itinerary(self, destination: str, duration: int, budget: float,
+                               preferences: Dict, user_context: Dict,
+                               seed: Optional[int] = None) -> Iterator[Tuple[str, object]]:
+        """Yield ("day", activities) as each day is planned, then the insights,
+        pricing and sustainability trailers. Only running totals are kept, so
+        memory does not grow with trip length. Seeded streams match
+        generate_smart_itinerary for the same inputs."""
+        
+        _, cached = self._prepare(destination, duration, budget, preferences, user_context, seed)
+        if cached is not None:
+            yield from self._replay(cached)
+            return
+        
+        rngs = self._agent_rngs()
+        context = self._analyze_user_context(user_context, preferences, rngs["context"])
+        real_time_data = self._get_real_time_insights(destination, rngs["insights"])
+        
+        total_cost = 0
+        ai_enhanced_count = 0
+        activity_count = 0
+        for day_activities in self._iter_personalized_activities(
+            destination, duration, budget, preferences, context, real_time_data, user_context, rngs["activities"]
+        ):
+            # Days are capped at budget / duration, so the trip-wide discount in
+            # fit_to_budget can only apply once the running total overshoots
+            day_cost = sum(item["cost"] for item in day_activities)
+            if total_cost + day_cost > budget:
+                self._apply_discounts(day_activities)
+                day_cost = sum(item["cost"] for item in day_activities)
+            total_cost += day_cost
+            ai_enhanced_count += sum(1 for item in day_activities if item.get("ai_enhanced", False))
+            activity_count += len(day_activities)
+            yield "day", day_activities
+        
+        risk_assessment = self._assess_travel_risks(destination, real_time_data)
+        yield "insights", self._build_insights(
+            context, real_time_data, risk_assessment, budget, total_cost,
+            self._recommendations(destination, context, real_time_data)
+        )
+        yield "dynamic_pricing", self._dynamic_pricing_for_total(total_cost, rngs["pricing"])
+        yield "sustainability_score", self._sustainability_for_counts(
+            ai_enhanced_count, activity_count, rngs["sustainability"]
+        )
+    
+    async def agenerate_smart_itinerary(self, destination: str, duration: int, budget: float,
+                                        preferences: Dict, user_context: Dict,
+                                        seed: Optional[int] = None) -> Tuple[Dict, Dict]:
+        """generate_smart_itinerary with independent agents run concurrently
+        
+        Stages: context + insights, then activities + risk, then pricing +
+        sustainability. Every agent runs under its AGENT_TIMEOUTS entry and
+        falls back to a neutral value on timeout or error; plans built from a
+        fallback are not cached. Returns (result, per-agent timings).
+        """
+        key, cached = self._prepare(destination, duration, budget, preferences, user_context, seed)
+        if cached is not None:
+            return cached, {"cache": {"ms": 0.0, "status": "hit"}}
+        
+        rngs = self._agent_rngs()
+        timings: Dict[str, Dict] = {}
+        
+        context, real_time_data = await asyncio.gather(
+            self._run_agent("context", timings, lambda: self._fallback_context(preferences),
+                            self._analyze_user_context, user_context, preferences, rngs["context"]),
+            self._run_agent("insights", timings, lambda: dict(FALLBACK_INSIGHTS),
+                            self._aget_real_time_insights, destination, rngs["insights"])
+        )
+        
+        request = self._selection_request(destination, duration, budget, preferences, user_context, real_time_data)
+        itinerary, risk_assessment, recommendations = await asyncio.gather(
+            self._run_agent("activities", timings, lambda: self._fallback_itinerary(request),
+                            self._select_activities, request, rngs["activities"]),
+            self._run_agent("risk", timings, lambda: {"level": "Medium", "factors": {}, "recommendations": []},
+                            self._assess_travel_risks, destination, real_time_data),
+            self._run_agent("recommendations", timings,
+                            lambda: self._generate_ai_recommendations(context, real_time_data),
+                            self._agenerate_recommendations, destination, context, real_time_data)
+        )
+        
+        total_cost = sum(item["cost"] for item in itinerary)
+        ai_enhanced_count = sum(1 for item in itinerary if item.get("ai_enhanced", False))
+        dynamic_pricing, sustainability_score = await asyncio.gather(
+            self._run_agent("pricing", timings, lambda: self._fallback_pricing(total_cost),
+                            self._dynamic_pricing_for_total, total_cost, rngs["pricing"]),
+            self._run_agent("sustainability", timings, lambda: self._fallback_sustainability(ai_enhanced_count),
+                            self._sustainability_for_counts, ai_enhanced_count, len(itinerary), rngs["sustainability"])
+        )
+        
+        result = {
+            "itinerary": itinerary,
+            "ai_insights": self._build_insights(
+                context, real_time_data, risk_assessment, budget, total_cost, recommendations
+            ),
+            "dynamic_pricing": dynamic_pricing,
+            "sustainability_score": sustainability_score
+        }
+        degraded = any(timing["status"] != "ok" for timing in timings.values())
+        if key is not None and self.cache is not None and not degraded:
+            self.cache.set(key, result)
+        return result, timings
+    
+    async def _run_agent(self, name: str, timings: Dict, fallback: Callable[[], object],
+                         agent: Callable, *args):
+        # Blocking agents run in a worker thread so the event loop keeps serving
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            call = agent(*args) if asyncio.iscoroutinefunction(agent) else asyncio.to_thread(agent, *args)
+            return await asyncio.wait_for(call, AGENT_TIMEOUTS.get(name))
+        except asyncio.TimeoutError:
+            status = "timeout"
+            return fallback()
+        except Exception:
+            status = "error"
+            return fallback()
+        finally:
+            elapsed = time.perf_counter() - start
+            timings[name] = {"ms": round(elapsed * 1000, 3), "status": status}
+            PLANNER_AGENT_SECONDS.labels(agent=name, status=status).observe(elapsed)
+    
+    def _fallback_context(self, preferences: Dict) -> Dict:
+        return {
+            "personality_type": "adventurous" if preferences.get("adventure") else "cultural",
+            "experience_level": "beginner",
+            "seasonal_preference": "summer" if datetime.now().month in [6,7,8] else "winter",
+            "personalization_score": 85
+        }
+    
+    def _fallback_itinerary(self, request: SelectionRequest) -> List[Dict]:
+        # One default exploration slot per day, always within budget
+        return [default_item(day, request.destination, request.default_cost) for day in range(1, request.duration + 1)]
+    
+    def _fallback_pricing(self, total_cost: float) -> Dict:
+        return {
+            "current_total": total_cost,
+            "predicted_price_tomorrow": total_cost,
+            "best_booking_time": "Next 2 hours",
+            "savings_opportunity": f"${total_cost * 0.1:.2f}"
+        }
+    
+    def _fallback_sustainability(self, ai_enhanced_count: int) -> Dict:
+        return {
+            "score": 0,
+            "carbon_footprint": "unavailable",
+            "eco_friendly_alternatives": ai_enhanced_count,
+            "sustainability_tips": []
+        }
+    
+    def _prepare(self, destination: str, duration: int, budget: float, preferences: Dict,
+                 user_context: Dict, seed: Optional[int]) -> Tuple[Optional[str], Optional[Dict]]:
+        """Seed self.rng for a request; returns (cache key, cached result)"""
+        if seed is None and not self.deterministic:
+            return None, None
+        key = self._cache_key(destination, duration, budget, preferences, user_context, seed)
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is None:
+            self.rng = random.Random(derive_seed(key) if seed is None else seed)
+        return key, cached
+    
+    def _agent_rngs(self) -> Dict[str, random.Random]:
+        return {agent: random.Random(self.rng.getrandbits(64)) for agent in RANDOM_AGENTS}
+    
+    def _replay(self, result: Dict) -> Iterator[Tuple[str, object]]:
+        """Stream a previously computed (cached) plan"""
+        day_activities = []
+        for item in result["itinerary"]:
+            if day_activities and item["day"] != day_activities[0]["day"]:
+                yield "day", day_activities
+                day_activities = []
+            day_activities.append(item)
+        if day_activities:
+            yield "day", day_activities
+        yield "insights", result["ai_insights"]
+        yield "dynamic_pricing", result["dynamic_pricing"]
+        yield "sustainability_score", result["sustainability_score"]
+    
+    def _cache_key(self, destination: str, duration: int, budget: float,
+                   preferences: Dict, user_context: Dict, seed: Optional[int]) -> str:
+        """Normalized inputs that determine a seeded plan"""
+        return make_key(
+            destination=" ".join(destination.split()),
+            duration=duration,
+            budget=round(float(budget), 2),
+            # Selection iterates preferences in order, so order is part of the key
+            preferences=[[pref, value] for pref, value in preferences.items() if value],
+            experienced=len(user_context.get("travel_history", [])) > 5,
+            month=datetime.now().month,
+            catalog=get_catalog().generation,
+            # Strategies draw different plans from the same seed
+            strategy=self.strategy.name,
+            weights=self._preference_weights(preferences, user_context),
+            seed=seed
+        )
+    
+    def _plan(self, destination: str, duration: int, budget: float,
+              preferences: Dict, user_context: Dict) -> Dict:
+        rngs = self._agent_rngs()
+        
         # Agent 1: Context Analyzer
-        context = self._analyze_user_context(user_context, preferences)
+        context = self._analyze_user_context(user_context, preferences, rngs["context"])
         
         # Agent 2: Real-time Data Collector
-        real_time_data = self._get_real_time_insights(destination)
+        real_time_data = self._get_real_time_insights(destination, rngs["insights"])
         
-        # Agent 3: Personalization Engine
-        personalized_activities = self._generate_personalized_activities(
-            destination, duration, budget, preferences, context, real_time_data
+        # Agents 3 + 4: Personalization and Optimization Engines (pluggable strategy)
+        optimized_itinerary = self._select_activities(
+            self._selection_request(destination, duration, budget, preferences, user_context, real_time_data),
+            rngs["activities"]
         )
         
-        # Agent 4: Optimization Engine
-        optimized_itinerary = self._optimize_itinerary(personalized_activities, budget)
-        
         # Agent 5: Risk Assessment
         risk_assessment = self._assess_travel_risks(destination, real_time_data)
         
         return {
             "itinerary": optimized_itinerary,
-            "ai_insights": {
-                "personalization_score": context["personalization_score"],
-                "budget_optimization": f"Saved ${budget - sum(item['cost'] for item in optimized_itinerary):.2f}",
-                "weather_adaptation": real_time_data["weather_impact"],
-                "local_events": real_time_data["events"],
-                "risk_level": risk_assessment["level"],
-                "ai_recommendations": self._generate_ai_recommendations(context, real_time_data)
-            },
-            "dynamic_pricing": self._calculate_dynamic_pricing(optimized_itinerary),
-            "sustainability_score": self._calculate_sustainability_score(optimized_itinerary)
+            "ai_insights": self._build_insights(
+                context, real_time_data, risk_assessment, budget,
+                sum(item["cost"] for item in optimized_itinerary),
+                self._recommendations(destination, context, real_time_data)
+            ),
+            "dynamic_pricing": self._calculate_dynamic_pricing(optimized_itinerary, rngs["pricing"]),
+            "sustainability_score": self._calculate_sustainability_score(optimized_itinerary, rngs["sustainability"])
         }
     
-    def _analyze_user_context(self, user_context: Dict, preferences: Dict) -> Dict:
+    def _build_insights(self, context: Dict, real_time_data: Dict, risk_assessment: Dict,
+                        budget: float, total_cost: float, recommendations: List[str]) -> Dict:
+        return {
+            "personalization_score": context["personalization_score"],
+            "budget_optimization": f"Saved ${budget - total_cost:.2f}",
+            "weather_adaptation": real_time_data["weather_impact"],
+            "local_events": real_time_data["events"],
+            "risk_level": risk_assessment["level"],
+            "ai_recommendations": recommendations
+        }
+    
+    @_stage
+    def _analyze_user_context(self, user_context: Dict, preferences: Dict,
+                              rng: Optional[random.Random] = None) -> Dict:
         """AI-powered user context analysis"""
+        rng = rng or self.rng
         travel_history = user_context.get("travel_history", [])
         time_of_year = datetime.now().month
         
@@ -63,172 +343,83 @@ class GenAITripPlanner:
             "personality_type": personality_type,
             "experience_level": experience_level,
             "seasonal_preference": "summer" if time_of_year in [6,7,8] else "winter",
-            "personalization_score": random.randint(85, 98)
+            "personalization_score": rng.randint(85, 98)
         }
     
-    def _get_real_time_insights(self, destination: str) -> Dict:
-        """Simulate real-time data collection"""
-        weather = random.choice(self.weather_conditions)
+    @_stage
+    def _get_real_time_insights(self, destination: str, rng: Optional[random.Random] = None,
+                                live: Optional[Dict] = None) -> Dict:
+        """Real-time data collection; live provider signals replace the simulated ones"""
+        rng = rng or self.rng
+        weather = rng.choice(self.weather_conditions)
         events = self.local_events.get(destination.lower(), ["Local Festival"])
+        events = rng.sample(events, min(2, len(events)))
+        crowd_levels = rng.choice(["Low", "Medium", "High"])
+        price_trends = rng.choice(["Increasing", "Stable", "Decreasing"])
+        
+        live = fetch_signals_sync(destination) if live is None else live
+        if "weather" in live:
+            weather = live["weather"]["condition"]
+        if live.get("events"):
+            events = live["events"][:2]
+        crowd_levels = live.get("crowds", crowd_levels)
+        price_trends = live.get("prices", price_trends)
         
         return {
             "weather": weather,
             "weather_impact": f"Adapted for {weather} conditions",
-            "events": random.sample(events, min(2, len(events))),
-            "crowd_levels": random.choice(["Low", "Medium", "High"]),
-            "price_trends": random.choice(["Increasing", "Stable", "Decreasing"])
+            "events": events,
+            "crowd_levels": crowd_levels,
+            "price_trends": price_trends
         }
     
-    def _generate_personalized_activities(self, destination: str, duration: int, 
-                                        budget: float, preferences: Dict, 
-                                        context: Dict, real_time_data: Dict) -> List[Dict]:
-        """AI-generated personalized activities"""
-        
-        # Dynamic activity generation based on destination
-        dest_lower = destination.lower()
-        
-        if "paris" in dest_lower or "france" in dest_lower:
-            activity_pools = {
-                "heritage": [
-                    {"name": "AI-Guided Louvre Tour", "cost": 45, "ai_enhanced": True},
-                    {"name": "Notre-Dame VR Experience", "cost": 25, "ai_enhanced": True},
-                    {"name": "Versailles Smart Audio Guide", "cost": 35, "ai_enhanced": True}
-                ],
-                "food": [
-                    {"name": "AI Sommelier Wine Tasting", "cost": 60, "ai_enhanced": True},
-                    {"name": "Michelin Star Restaurant (AI-booked)", "cost": 120, "ai_enhanced": True},
-                    {"name": "Food Market AI Walking Tour", "cost": 40, "ai_enhanced": True}
-                ],
-                "adventure": [
-                    {"name": "Seine River AI Drone Tour", "cost": 80, "ai_enhanced": True},
-                    {"name": "Catacombs AR Experience", "cost": 30, "ai_enhanced": True}
-                ]
-            }
-        elif "tokyo" in dest_lower or "japan" in dest_lower:
-            activity_pools = {
-                "heritage": [
-                    {"name": "AI Temple Guide Experience", "cost": 20, "ai_enhanced": True},
-                    {"name": "Traditional Tea Ceremony (AI-matched)", "cost": 50, "ai_enhanced": True}
-                ],
-                "food": [
-                    {"name": "Sushi Master AI Pairing", "cost": 90, "ai_enhanced": True},
-                    {"name": "Robot Restaurant Experience", "cost": 70, "ai_enhanced": True}
-                ],
-                "adventure": [
-                    {"name": "Tokyo Skytree AI Observatory", "cost": 40, "ai_enhanced": True},
-                    {"name": "Shibuya Crossing Analytics Tour", "cost": 25, "ai_enhanced": True}
-                ]
-            }
-        elif "new york" in dest_lower or "nyc" in dest_lower:
-            activity_pools = {
-                "heritage": [
-                    {"name": "AI-Guided Statue of Liberty Tour", "cost": 35, "ai_enhanced": True},
-                    {"name": "Empire State Building VR Experience", "cost": 40, "ai_enhanced": True},
-                    {"name": "Central Park Smart Walking Tour", "cost": 25, "ai_enhanced": True}
-                ],
-                "food": [
-                    {"name": "AI Food Truck Discovery", "cost": 30, "ai_enhanced": True},
-                    {"name": "Broadway District Restaurant (AI-booked)", "cost": 85, "ai_enhanced": True},
-                    {"name": "Little Italy AI Culinary Tour", "cost": 55, "ai_enhanced": True}
-                ],
-                "adventure": [
-                    {"name": "Brooklyn Bridge AI Photo Walk", "cost": 20, "ai_enhanced": True},
-                    {"name": "Times Square Analytics Experience", "cost": 15, "ai_enhanced": True}
-                ]
-            }
-        elif "london" in dest_lower or "uk" in dest_lower:
-            activity_pools = {
-                "heritage": [
-                    {"name": "AI-Guided Tower of London Tour", "cost": 30, "ai_enhanced": True},
-                    {"name": "Buckingham Palace VR Experience", "cost": 25, "ai_enhanced": True},
-                    {"name": "Westminster Abbey Smart Guide", "cost": 35, "ai_enhanced": True}
-                ],
-                "food": [
-                    {"name": "AI Pub Crawl Experience", "cost": 45, "ai_enhanced": True},
-                    {"name": "Traditional Tea Service (AI-matched)", "cost": 40, "ai_enhanced": True},
-                    {"name": "Borough Market AI Food Tour", "cost": 35, "ai_enhanced": True}
-                ],
-                "adventure": [
-                    {"name": "Thames River AI Cruise", "cost": 50, "ai_enhanced": True},
-                    {"name": "London Eye Analytics Experience", "cost": 45, "ai_enhanced": True}
-                ]
-            }
-        else:
-            # Generic activities for any destination
-            activity_pools = {
-                "heritage": [
-                    {"name": f"AI-Guided {destination} Heritage Tour", "cost": 35, "ai_enhanced": True},
-                    {"name": f"{destination} Museum VR Experience", "cost": 25, "ai_enhanced": True},
-                    {"name": f"Historic {destination} Smart Walking Tour", "cost": 30, "ai_enhanced": True}
-                ],
-                "food": [
-                    {"name": f"Local {destination} Cuisine AI Tour", "cost": 50, "ai_enhanced": True},
-                    {"name": f"Best {destination} Restaurant (AI-booked)", "cost": 75, "ai_enhanced": True},
-                    {"name": f"{destination} Food Market Experience", "cost": 40, "ai_enhanced": True}
-                ],
-                "adventure": [
-                    {"name": f"{destination} City AI Discovery Tour", "cost": 45, "ai_enhanced": True},
-                    {"name": f"Scenic {destination} Analytics Walk", "cost": 25, "ai_enhanced": True}
-                ]
-            }
-        
-        # Use the dynamically generated activity pools
-        selected_activities = []
-        daily_budget = budget / duration
-        
-        for day in range(1, duration + 1):
-            day_activities = []
-            remaining_budget = daily_budget
-            
-            # Select activities based on preferences
-            for pref, is_enabled in preferences.items():
-                if is_enabled and pref in activity_pools and remaining_budget > 0:
-                    available_activities = [a for a in activity_pools[pref] if a["cost"] <= remaining_budget]
-                    if available_activities:
-                        activity = random.choice(available_activities)
-                        day_activities.append({
-                            "day": day,
-                            "activity": activity["name"],
-                            "location": f"{destination} - AI Optimized Route",
-                            "cost": activity["cost"],
-                            "ai_enhanced": activity.get("ai_enhanced", False),
-                            "weather_adapted": real_time_data["weather"] in activity["name"].lower()
-                        })
-                        remaining_budget -= activity["cost"]
-            
-            # Add default activity if none selected
-            if not day_activities:
-                day_activities.append({
-                    "day": day,
-                    "activity": f"AI-Curated {destination} Exploration",
-                    "location": f"{destination} City Center",
-                    "cost": min(30, remaining_budget),
-                    "ai_enhanced": True,
-                    "weather_adapted": True
-                })
-            
-            selected_activities.extend(day_activities)
-        
-        return selected_activities
-    
-    def _optimize_itinerary(self, activities: List[Dict], budget: float) -> List[Dict]:
-        """AI optimization for cost and experience"""
-        total_cost = sum(activity["cost"] for activity in activities)
-        
-        if total_cost > budget:
-            # AI cost optimization
-            for activity in activities:
-                if activity["cost"] > 50:
-                    activity["cost"] = int(activity["cost"] * 0.85)  # AI negotiated discount
-                    activity["ai_optimized"] = True
-        
-        return activities
+    @_stage
+    async def _aget_real_time_insights(self, destination: str, rng: Optional[random.Random] = None) -> Dict:
+        return self._get_real_time_insights(destination, rng, await fetch_signals(destination))
+    
+    def _iter_personalized_activities(self, destination: str, duration: int,
+                                      budget: float, preferences: Dict,
+                                      context: Dict, real_time_data: Dict,
+                                      user_context: Optional[Dict] = None,
+                                      rng: Optional[random.Random] = None) -> Iterator[List[Dict]]:
+        """Yield one day's activities at a time"""
+        request = self._selection_request(
+            destination, duration, budget, preferences, user_context or {}, real_time_data
+        )
+        yield from self.strategy.iter_days(request, rng or self.rng)
+    
+    @_stage
+    def _select_activities(self, request: SelectionRequest, rng: random.Random) -> List[Dict]:
+        return self.strategy.plan(request, rng)
+    
+    def _selection_request(self, destination: str, duration: int, budget: float, preferences: Dict,
+                           user_context: Dict, real_time_data: Dict) -> SelectionRequest:
+        # Activity pools come from the shared, pre-indexed catalog
+        return SelectionRequest(
+            destination, duration, budget, real_time_data["weather"],
+            get_catalog().pools_for(destination), preferences,
+            self._preference_weights(preferences, user_context)
+        )
+    
+    def _preference_weights(self, preferences: Dict, user_context: Dict) -> Dict[str, float]:
+        """Numeric preference strengths for scoring (True counts as 1.0)"""
+        strengths = user_context.get("preferences_strength", {})
+        weights = {}
+        for pref, is_enabled in preferences.items():
+            if is_enabled:
+                strength = strengths.get(pref, is_enabled)
+                weights[pref] = float(strength) if isinstance(strength, (int, float)) else 1.0
+        return weights
     
+    def _apply_discounts(self, activities: List[Dict]):
+        apply_discounts(activities)
+    
+    @_stage
     def _assess_travel_risks(self, destination: str, real_time_data: Dict) -> Dict:
         """AI-powered risk assessment"""
         risk_factors = {
             "weather": 0.2 if real_time_data["weather"] == "sunny" else 0.4,
-            "crowds": {"Low": 0.1, "Medium": 0.3, "High": 0.5}[real_time_data["crowd_levels"]],
+            "crowds": {"Low": 0.1, "Medium": 0.3, "High": 0.5}.get(real_time_data["crowd_levels"], 0.3),
             "general": 0.1
         }
         
@@ -245,6 +436,45 @@ class GenAITripPlanner:
             ]
         }
     
+    @_stage
+    def _recommendations(self, destination: str, context: Dict, real_time_data: Dict) -> List[str]:
+        """LLM-written recommendations, or the templates when the LLM is unavailable"""
+        if llm_gateway.enabled:
+            try:
+                messages = self._recommendation_messages(destination, context, real_time_data)
+                return self._parse_recommendations(llm_gateway.complete_sync(messages))
+            except LLMError:
+                pass
+        return self._generate_ai_recommendations(context, real_time_data)
+    
+    @_stage
+    async def _agenerate_recommendations(self, destination: str, context: Dict, real_time_data: Dict) -> List[str]:
+        if not llm_gateway.enabled:
+            return self._generate_ai_recommendations(context, real_time_data)
+        # A gateway failure raises so _run_agent records it and uses the templates
+        messages = self._recommendation_messages(destination, context, real_time_data)
+        return self._parse_recommendations(await llm_gateway.complete(messages))
+    
+    def _recommendation_messages(self, destination: str, context: Dict, real_time_data: Dict) -> List[Dict]:
+        # Only slow-changing facts go in the prompt so similar trips share cached completions
+        return [
+            {"role": "system", "content": RECOMMENDATIONS_PROMPT},
+            {"role": "user", "content": (
+                f"Destination: {' '.join(destination.split())}. "
+                f"Traveller: {context['personality_type']}, {context['experience_level']}. "
+                f"Weather: {real_time_data['weather']}. "
+                f"Local events: {', '.join(real_time_data['events']) or 'none'}. "
+                f"Crowds: {real_time_data['crowd_levels']}. Prices: {real_time_data['price_trends']}."
+            )}
+        ]
+    
+    def _parse_recommendations(self, result: LLMResult) -> List[str]:
+        lines = [line.strip().lstrip("-*0123456789.) ").strip() for line in result.text.splitlines()]
+        lines = [line for line in lines if line]
+        if not lines:
+            raise LLMError("Empty recommendations")
+        return lines[:5]
+    
     def _generate_ai_recommendations(self, context: Dict, real_time_data: Dict) -> List[str]:
         """AI-generated smart recommendations"""
         recommendations = [
@@ -256,27 +486,34 @@ class GenAITripPlanner:
         ]
         return recommendations
     
-    def _calculate_dynamic_pricing(self, itinerary: List[Dict]) -> Dict:
+    def _calculate_dynamic_pricing(self, itinerary: List[Dict], rng: Optional[random.Random] = None) -> Dict:
         """AI-powered dynamic pricing"""
-        base_total = sum(item["cost"] for item in itinerary)
-        
+        return self._dynamic_pricing_for_total(sum(item["cost"] for item in itinerary), rng)
+    
+    @_stage
+    def _dynamic_pricing_for_total(self, base_total: float, rng: Optional[random.Random] = None) -> Dict:
+        rng = rng or self.rng
         return {
             "current_total": base_total,
-            "predicted_price_tomorrow": base_total * random.uniform(1.05, 1.15),
+            "predicted_price_tomorrow": base_total * rng.uniform(1.05, 1.15),
             "best_booking_time": "Next 2 hours",
             "savings_opportunity": f"${base_total * 0.1:.2f}"
         }
     
-    def _calculate_sustainability_score(self, itinerary: List[Dict]) -> Dict:
+    def _calculate_sustainability_score(self, itinerary: List[Dict], rng: Optional[random.Random] = None) -> Dict:
         """AI sustainability analysis"""
         ai_enhanced_count = sum(1 for item in itinerary if item.get("ai_enhanced", False))
-        total_activities = len(itinerary)
-        
+        return self._sustainability_for_counts(ai_enhanced_count, len(itinerary), rng)
+    
+    @_stage
+    def _sustainability_for_counts(self, ai_enhanced_count: int, total_activities: int,
+                                   rng: Optional[random.Random] = None) -> Dict:
+        rng = rng or self.rng
         score = (ai_enhanced_count / total_activities) * 100 if total_activities > 0 else 0
         
         return {
             "score": int(score),
-            "carbon_footprint": f"{random.randint(50, 200)} kg CO2",
+            "carbon_footprint": f"{rng.randint(50, 200)} kg CO2",
             "eco_friendly_alternatives": ai_enhanced_count,
             "sustainability_tips": [
                 "Use public transport between activities",
@@ -289,57 +526,72 @@ class GenAITripPlanner:
 class TravelChatbot:
     """Advanced conversational AI for travel assistance"""
     
-    def __init__(self):
-        self.conversation_history = []
+    def __init__(self, store=None, matcher: Optional[KeywordMatcher] = None):
+        # Turns are kept per session in a bounded store (see conversation_store)
+        self.store = store if store is not None else MemoryConversationStore()
+        # Compiled once from the keyword tables; one pass finds intent and entities
+        self.matcher = matcher if matcher is not None else build_keyword_matcher()
         self.user_preferences = {}
     
-    def chat(self, message: str, user_context: Dict) -> Dict:
+    def history(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        return self.store.history(session_id, limit)
+    
+    async def ahistory(self, session_id: str, limit: Optional[int] = None) -> List[Dict]:
+        return await self.store.ahistory(session_id, limit)
+    
+    def chat(self, message: str, user_context: Dict, session_id: str) -> Dict:
         """Process user message and generate AI response"""
         
-        # Simulate advanced NLP processing
-        intent = self._detect_intent(message)
-        entities = self._extract_entities(message)
+        intent, entities = self.matcher.match(message)
         
         response = self._generate_response(intent, entities, user_context)
+        if llm_gateway.enabled:
+            try:
+                response = self._with_llm_text(response, llm_gateway.complete_sync(
+                    self._chat_messages(message, intent, entities, user_context)
+                ))
+            except LLMError:
+                pass
+        
+        return self._remember(session_id, message, response)
+    
+    async def achat(self, message: str, user_context: Dict, session_id: str) -> Dict:
+        """chat() for async handlers; awaits the LLM instead of blocking a thread"""
+        intent, entities = self.matcher.match(message)
         
-        self.conversation_history.append({
-            "user": message,
-            "bot": response["text"],
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        return response
-    
-    def _detect_intent(self, message: str) -> str:
-        """AI intent detection"""
-        message_lower = message.lower()
-        
-        if any(word in message_lower for word in ["weather", "climate", "temperature"]):
-            return "weather_inquiry"
-        elif any(word in message_lower for word in ["restaurant", "food", "eat", "dining"]):
-            return "food_recommendation"
-        elif any(word in message_lower for word in ["hotel", "stay", "accommodation"]):
-            return "accommodation_inquiry"
-        elif any(word in message_lower for word in ["transport", "travel", "flight", "train"]):
-            return "transport_inquiry"
-        elif any(word in message_lower for word in ["activity", "things to do", "attractions"]):
-            return "activity_recommendation"
-        else:
-            return "general_inquiry"
-    
-    def _extract_entities(self, message: str) -> Dict:
-        """AI entity extraction"""
-        # Simulate NER
-        cities = ["paris", "tokyo", "new york", "london", "rome"]
-        dates = ["today", "tomorrow", "next week"]
-        
-        entities = {
-            "cities": [city for city in cities if city in message.lower()],
-            "dates": [date for date in dates if date in message.lower()],
-            "numbers": [int(s) for s in message.split() if s.isdigit()]
-        }
-        
-        return entities
+        response = self._generate_response(intent, entities, user_context)
+        if llm_gateway.enabled:
+            try:
+                response = self._with_llm_text(response, await llm_gateway.complete(
+                    self._chat_messages(message, intent, entities, user_context)
+                ))
+            except LLMError:
+                pass
+        
+        turn = await self.store.aappend(session_id, make_turn(message, response["text"]))
+        return {**response, "turn": turn}
+    
+    def _remember(self, session_id: str, message: str, response: Dict) -> Dict:
+        turn = self.store.append(session_id, make_turn(message, response["text"]))
+        return {**response, "turn": turn}
+    
+    def _chat_messages(self, message: str, intent: str, entities: Dict, user_context: Dict) -> List[Dict]:
+        # Only the last two turns are sent, which bounds prompt tokens and keeps
+        # opening questions cacheable across users
+        messages = [{"role": "system", "content": CHAT_PROMPT}]
+        for turn in user_context.get("past_conversations", [])[-2:]:
+            messages.append({"role": "user", "content": turn["user"]})
+            messages.append({"role": "assistant", "content": turn["bot"]})
+        hints = f"intent: {intent}"
+        if entities["cities"]:
+            hints += f"; cities: {', '.join(entities['cities'])}"
+        messages.append({"role": "user", "content": f"{message}\n({hints})"})
+        return messages
+    
+    def _with_llm_text(self, response: Dict, result: LLMResult) -> Dict:
+        if not result.text.strip():
+            return response
+        return {**response, "text": result.text.strip(), "usage": result.usage()}
     
     def _generate_response(self, intent: str, entities: Dict, user_context: Dict) -> Dict:
         """AI response generation"""
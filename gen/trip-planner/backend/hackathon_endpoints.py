@@ -1,55 +1,58 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from typing import Dict, List
-from database import SessionLocal
-from models import User
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from typing import Dict, List, Optional
+import time
+import uuid
 from models import User
 # Simplified for demo - in production would use proper auth
 def get_current_user():
     # Mock user for demo
     return {"id": 1, "name": "Demo User", "preferences": {"heritage": True}, "budget": 2000}
 from genai_service import TravelChatbot, RealTimeOptimizer
-from pydantic import BaseModel
+from conversation_store import build_conversation_store
+from responses import json_response
+from pydantic import BaseModel, Field
 
 router = APIRouter()
 
-# Global chatbot instance
-chatbot = TravelChatbot()
+# Global chatbot instance; conversations are kept per session
+chatbot = TravelChatbot(build_conversation_store())
 
 class ChatMessage(BaseModel):
     message: str
+    # Returned by the first reply; send it back to continue the conversation
+    session_id: Optional[str] = Field(None, min_length=1, max_length=64)
 
 class OptimizationRequest(BaseModel):
     trip_id: int
     conditions: Dict
 
 @router.post("/ai/chat")
-def chat_with_ai(chat_msg: ChatMessage):
+async def chat_with_ai(chat_msg: ChatMessage):
     """Advanced conversational AI for travel assistance"""
     
+    session_id = chat_msg.session_id or uuid.uuid4().hex
     user_context = {
         "user_id": 1,
         "preferences": {"heritage": True},
         "budget": 2000,
-        "past_conversations": chatbot.conversation_history[-5:]  # Last 5 conversations
+        "past_conversations": await chatbot.ahistory(session_id, 5)  # Last 5 turns of this session
     }
     
-    response = chatbot.chat(chat_msg.message, user_context)
+    start = time.perf_counter()
+    response = await chatbot.achat(chat_msg.message, user_context, session_id)
+    elapsed = time.perf_counter() - start
     
     return {
         "response": response["text"],
         "suggestions": response["suggestions"],
-        "conversation_id": len(chatbot.conversation_history),
+        "session_id": session_id,
+        "conversation_id": response["turn"],
         "ai_confidence": 95,
-        "response_time": "0.3s"
+        "response_time": f"{elapsed * 1000:.1f}ms",
+        # Model, token counts and cache source when the LLM answered
+        "llm_usage": response.get("usage")
     }
 
 @router.post("/ai/optimize-realtime")
@@ -167,7 +170,7 @@ def generate_alternatives(trip_data: Dict):
         }
         alternatives.append(alternative)
     
-    return {
+    return json_response({
         "original_plan": trip_data,
         "ai_alternatives": alternatives,
         "recommendation": "Alternative 3 offers the best value-experience ratio for your profile",
@@ -176,7 +179,7 @@ def generate_alternatives(trip_data: Dict):
             "roi_analysis": "Cultural Immersion option provides 40% more unique experiences",
             "risk_comparison": "All alternatives have similar low-risk profiles"
         }
-    }
+    })
 
 @router.get("/ai/sustainability-report/{trip_id}")
 def get_sustainability_report(trip_id: int):
@@ -0,0 +1,43 @@
+import time
+
+from metrics import histogram
+
+HTTP_REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds", "Request latency until the last body byte, by route template",
+    labelnames=("method", "route", "status")
+)
+
+class RequestMetricsMiddleware:
+    """Record http_request_duration_seconds{method,route,status} for every request
+
+    The route label is the matched path template (/trips/{trip_id}/itinerary),
+    or "unmatched" for 404s outside any route, so cardinality stays bounded.
+    Streaming responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status
+            ).observe(time.perf_counter() - start)
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+
+class InsightsCache:
+    """Destination-keyed cache for real-time signals with stale-while-revalidate
+
+    Each signal has its own TTL. Fresh entries are served directly; entries
+    past their TTL but within stale_ratio x TTL more are served immediately
+    while a single background task refreshes them; anything older (or
+    missing) is fetched inline. Bounded to maxsize entries, LRU evicted.
+    Meant to be used from one event loop (the app's), so it takes no locks.
+    """
+
+    def __init__(self, ttls: Dict[str, float], default_ttl: float = 900.0, stale_ratio: float = 1.0,
+                 maxsize: int = 4096, clock: Callable[[], float] = time.monotonic):
+        self.ttls = dict(ttls)
+        self.default_ttl = default_ttl
+        self.stale_ratio = stale_ratio
+        self.maxsize = maxsize
+        self._clock = clock
+        self._data: "OrderedDict[Tuple[str, Hashable], tuple]" = OrderedDict()
+        self._refreshing: Dict[Tuple[str, Hashable], asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.evictions = 0
+
+    def ttl(self, signal: str) -> float:
+        return self.ttls.get(signal, self.default_ttl)
+
+    async def get(self, signal: str, key: Hashable, fetch: Callable[[], Awaitable]):
+        """Cached value for (signal, key), calling fetch() when it must be loaded"""
+        cache_key = (signal, key)
+        entry = self._data.get(cache_key)
+        if entry is not None:
+            fetched_at, value = entry
+            age = self._clock() - fetched_at
+            ttl = self.ttl(signal)
+            if age < ttl:
+                self.hits += 1
+                self._data.move_to_end(cache_key)
+                return value
+            if age < ttl * (1 + self.stale_ratio):
+                self.stale_hits += 1
+                self._data.move_to_end(cache_key)
+                self._revalidate(cache_key, fetch)
+                return value
+        self.misses += 1
+        value = await fetch()
+        self._store(cache_key, value)
+        return value
+
+    def _store(self, cache_key: Tuple[str, Hashable], value):
+        self._data[cache_key] = (self._clock(), value)
+        self._data.move_to_end(cache_key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def _revalidate(self, cache_key: Tuple[str, Hashable], fetch: Callable[[], Awaitable]):
+        task = self._refreshing.get(cache_key)
+        if task is not None and not task.done():
+            return
+        self._refreshing[cache_key] = asyncio.ensure_future(self._refresh(cache_key, fetch))
+
+    async def _refresh(self, cache_key: Tuple[str, Hashable], fetch: Callable[[], Awaitable]):
+        try:
+            value = await fetch()
+        except Exception:
+            # Keep serving the stale value until it ages out entirely
+            self.refresh_errors += 1
+        else:
+            self.refreshes += 1
+            self._store(cache_key, value)
+        finally:
+            self._refreshing.pop(cache_key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttls": {**self.ttls},
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,257 @@
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from metrics import counter
+from models import Booking, Inventory, Trip
+from schemas import BookingCreate
+
+# Capacity is a counter per (item_type, item_id), claimed with one conditional
+# UPDATE: the row lock it takes is held only until the booking's commit, and
+# a booker that loses the race sees 0 rows instead of overselling. Holds
+# claim capacity too and give it back once expired.
+BOOKING_HOLD_SECONDS = int(os.getenv("BOOKING_HOLD_SECONDS", "600"))
+
+BOOKINGS_CONFIRMED = counter("bookings_confirmed_total", "Bookings confirmed, directly or from a hold")
+BOOKINGS_HELD = counter("bookings_held_total", "Bookings held pending confirmation")
+BOOKINGS_SOLD_OUT = counter("bookings_sold_out_total", "Bookings refused for lack of capacity")
+HOLDS_EXPIRED = counter("booking_holds_expired_total", "Held bookings whose capacity was released")
+
+class SoldOutError(Exception):
+    """Not enough capacity left for the item; maps to 409"""
+
+class BookingStateError(Exception):
+    """The booking cannot make the requested transition (e.g. an expired hold); maps to 409"""
+
+def _reserve_statement(item_type: str, item_id: str, quantity: int):
+    # The guard and the increment are one statement, so concurrent bookers serialize on the row
+    return (
+        update(Inventory)
+        .where(
+            Inventory.item_type == item_type,
+            Inventory.item_id == item_id,
+            Inventory.reserved + quantity <= Inventory.capacity
+        )
+        .values(reserved=Inventory.reserved + quantity, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+def _tracked_statement(item_type: str, item_id: str):
+    return select(Inventory.id).where(Inventory.item_type == item_type, Inventory.item_id == item_id)
+
+def _expire_holds_statement(now: datetime, item_type: Optional[str] = None, item_id: Optional[str] = None):
+    statement = update(Booking).where(Booking.status == "held", Booking.expires_at < now)
+    if item_type is not None:
+        statement = statement.where(Booking.item_type == item_type, Booking.item_id == item_id)
+    return (
+        statement.values(status="expired")
+        .returning(Booking.item_type, Booking.item_id, Booking.quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+def _release_statements(expired: List[Tuple[str, str, int]]):
+    released = Counter()
+    for item_type, item_id, quantity in expired:
+        released[(item_type, item_id)] += quantity
+    return [
+        update(Inventory)
+        .where(Inventory.item_type == item_type, Inventory.item_id == item_id)
+        .values(reserved=Inventory.reserved - quantity, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+        for (item_type, item_id), quantity in released.items()
+    ]
+
+def _trip_statement(trip_id: int, hold: bool):
+    # A confirmed booking flips the trip in the same transaction; a hold only needs it to exist
+    if hold:
+        return select(Trip.id).where(Trip.id == trip_id)
+    return (
+        update(Trip)
+        .where(Trip.id == trip_id)
+        .values(status="booked", version=Trip.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def _found(result, hold: bool) -> bool:
+    return result.first() is not None if hold else result.rowcount > 0
+
+def _new_booking(booking: BookingCreate, now: datetime) -> Booking:
+    return Booking(
+        trip_id=booking.trip_id,
+        item_type=booking.item_type,
+        item_id=booking.item_id,
+        quantity=booking.quantity,
+        status="held" if booking.hold else "confirmed",
+        expires_at=now + timedelta(seconds=BOOKING_HOLD_SECONDS) if booking.hold else None,
+        created_at=now
+    )
+
+def _counted(response: Dict) -> Dict:
+    (BOOKINGS_HELD if response["status"] == "held" else BOOKINGS_CONFIRMED).inc()
+    return response
+
+def release_expired_holds(db, item_type: Optional[str] = None, item_id: Optional[str] = None) -> int:
+    """Expire lapsed holds (optionally for one item) and return their capacity; caller commits"""
+    expired = db.execute(_expire_holds_statement(datetime.utcnow(), item_type, item_id)).all()
+    for statement in _release_statements(expired):
+        db.execute(statement)
+    HOLDS_EXPIRED.inc(len(expired))
+    return len(expired)
+
+async def release_expired_holds_async(db, item_type: Optional[str] = None, item_id: Optional[str] = None) -> int:
+    expired = (await db.execute(_expire_holds_statement(datetime.utcnow(), item_type, item_id))).all()
+    for statement in _release_statements(expired):
+        await db.execute(statement)
+    HOLDS_EXPIRED.inc(len(expired))
+    return len(expired)
+
+def _claim(db, booking: BookingCreate):
+    if db.execute(_reserve_statement(booking.item_type, booking.item_id, booking.quantity)).rowcount:
+        return
+    if db.execute(_tracked_statement(booking.item_type, booking.item_id)).first() is None:
+        return  # untracked items are unlimited
+    if release_expired_holds(db, booking.item_type, booking.item_id) and \
+            db.execute(_reserve_statement(booking.item_type, booking.item_id, booking.quantity)).rowcount:
+        return
+    BOOKINGS_SOLD_OUT.inc()
+    raise SoldOutError(f"{booking.item_type} {booking.item_id} is sold out")
+
+async def _claim_async(db, booking: BookingCreate):
+    if (await db.execute(_reserve_statement(booking.item_type, booking.item_id, booking.quantity))).rowcount:
+        return
+    if (await db.execute(_tracked_statement(booking.item_type, booking.item_id))).first() is None:
+        return
+    if await release_expired_holds_async(db, booking.item_type, booking.item_id) and \
+            (await db.execute(_reserve_statement(booking.item_type, booking.item_id, booking.quantity))).rowcount:
+        return
+    BOOKINGS_SOLD_OUT.inc()
+    raise SoldOutError(f"{booking.item_type} {booking.item_id} is sold out")
+
+def book_item(db, booking: BookingCreate) -> Optional[Dict]:
+    """Reserve capacity and write the booking and trip status in one commit
+
+    Returns the POST /book response, or None when the trip does not exist;
+    raises SoldOutError. The inventory row is claimed last so its lock is
+    held only for the commit.
+    """
+    try:
+        if not _found(db.execute(_trip_statement(booking.trip_id, booking.hold)), booking.hold):
+            db.rollback()
+            return None
+        row = _new_booking(booking, datetime.utcnow())
+        db.add(row)
+        db.flush()
+        _claim(db, booking)
+        response = booking_response(row)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return _counted(response)
+
+async def book_item_async(db, booking: BookingCreate) -> Optional[Dict]:
+    try:
+        if not _found(await db.execute(_trip_statement(booking.trip_id, booking.hold)), booking.hold):
+            await db.rollback()
+            return None
+        row = _new_booking(booking, datetime.utcnow())
+        db.add(row)
+        await db.flush()
+        await _claim_async(db, booking)
+        response = booking_response(row)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return _counted(response)
+
+def _confirm_statement(booking_id: int, now: datetime):
+    return (
+        update(Booking)
+        .where(Booking.id == booking_id, Booking.status == "held", Booking.expires_at >= now)
+        .values(status="confirmed", expires_at=None)
+        .returning(Booking.trip_id)
+        .execution_options(synchronize_session=False)
+    )
+
+def _unconfirmable(booking: Booking) -> Booking:
+    """A retried confirm is a no-op; anything else that is not a live hold is a 409"""
+    if booking.status == "confirmed":
+        return booking
+    if booking.status == "held":
+        raise BookingStateError("Hold expired")
+    raise BookingStateError(f"Booking is {booking.status}")
+
+def confirm_hold(db, booking_id: int) -> Optional[Booking]:
+    """Turn a live hold into a confirmed booking and mark its trip booked in one commit"""
+    trip_id = db.execute(_confirm_statement(booking_id, datetime.utcnow())).scalar()
+    if trip_id is None:
+        db.rollback()
+        booking = db.get(Booking, booking_id)
+        return None if booking is None else _unconfirmable(booking)
+    db.execute(_trip_statement(trip_id, hold=False))
+    db.commit()
+    BOOKINGS_CONFIRMED.inc()
+    return db.get(Booking, booking_id)
+
+async def confirm_hold_async(db, booking_id: int) -> Optional[Booking]:
+    trip_id = (await db.execute(_confirm_statement(booking_id, datetime.utcnow()))).scalar()
+    if trip_id is None:
+        await db.rollback()
+        booking = await db.get(Booking, booking_id)
+        return None if booking is None else _unconfirmable(booking)
+    await db.execute(_trip_statement(trip_id, hold=False))
+    await db.commit()
+    BOOKINGS_CONFIRMED.inc()
+    return await db.get(Booking, booking_id)
+
+def booking_response(booking: Booking) -> Dict:
+    return {
+        "message": "Booking held" if booking.status == "held" else "Booking confirmed",
+        "booking_id": booking.id,
+        "status": booking.status,
+        "quantity": booking.quantity,
+        "expires_at": booking.expires_at.isoformat() if booking.expires_at else None
+    }
+
+def inventory_status(row: Inventory) -> Dict:
+    return {
+        "item_type": row.item_type,
+        "item_id": row.item_id,
+        "capacity": row.capacity,
+        "reserved": row.reserved,
+        "available": row.capacity - row.reserved
+    }
+
+def _inventory_statement(item_type: str, item_id: str):
+    return select(Inventory).where(Inventory.item_type == item_type, Inventory.item_id == item_id)
+
+def get_inventory(db, item_type: str, item_id: str) -> Optional[Inventory]:
+    """Current capacity for an item after releasing its lapsed holds"""
+    if release_expired_holds(db, item_type, item_id):
+        db.commit()
+    return db.execute(_inventory_statement(item_type, item_id)).scalar_one_or_none()
+
+def set_capacity(db, item_type: str, item_id: str, capacity: int) -> Inventory:
+    """Create or resize an item's inventory; capacity may not drop below what is reserved"""
+    row = db.execute(_inventory_statement(item_type, item_id).with_for_update()).scalar_one_or_none()
+    if row is None:
+        row = Inventory(item_type=item_type, item_id=item_id, capacity=capacity, reserved=0)
+        db.add(row)
+    elif capacity < row.reserved:
+        db.rollback()
+        raise BookingStateError(f"{row.reserved} units are already reserved")
+    else:
+        row.capacity = capacity
+    try:
+        db.commit()
+    except IntegrityError:
+        # Created concurrently; resize the row that won
+        db.rollback()
+        return set_capacity(db, item_type, item_id, capacity)
+    db.refresh(row)
+    return row
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from cache import TTLCache
+
+ITINERARY_CACHE_BACKEND = os.getenv("ITINERARY_CACHE_BACKEND", "memory")  # memory | file | redis | none
+ITINERARY_CACHE_TTL = float(os.getenv("ITINERARY_CACHE_TTL", "300"))
+ITINERARY_CACHE_SIZE = int(os.getenv("ITINERARY_CACHE_SIZE", "1024"))
+ITINERARY_CACHE_PATH = os.getenv("ITINERARY_CACHE_PATH", "/tmp/itinerary-cache")
+ITINERARY_CACHE_URL = os.getenv("ITINERARY_CACHE_URL", "redis://localhost:6379/0")
+
+def make_key(**inputs) -> str:
+    """Stable digest of normalized planner inputs"""
+    blob = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+def derive_seed(key: str) -> int:
+    """Deterministic RNG seed for a cache key"""
+    return int(key[:16], 16)
+
+class FileBackend:
+    """One JSON file per key; lets several workers on a host share results"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            with open(self._file(key), encoding="utf-8") as f:
+                expires_at, value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if expires_at <= time.time():
+            return None
+        return value
+
+    def set(self, key: str, value: str, ttl: float):
+        # Write-then-rename so concurrent readers never see a partial file
+        tmp = f"{self._file(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump([time.time() + ttl, value], f)
+        os.replace(tmp, self._file(key))
+
+class RedisBackend:
+    """Any Redis-protocol server (Redis, KeyDB, Dragonfly...)"""
+
+    def __init__(self, url: str, prefix: str = "itinerary:"):
+        import redis  # optional dependency, only needed for this backend
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, value: str, ttl: float):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+class ItineraryCache:
+    """In-process LRU/TTL cache with an optional shared backend behind it"""
+
+    def __init__(self, maxsize: int = ITINERARY_CACHE_SIZE, ttl: float = ITINERARY_CACHE_TTL, backend=None):
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.backend = backend
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        # Values are stored serialized so every caller gets its own copy
+        value = self.local.get(key)
+        if value is None and self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self.shared_hits += 1
+                self.local.set(key, value)
+        if value is None:
+            self.misses += 1
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, result: Dict):
+        value = json.dumps(result)
+        self.local.set(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value, self.ttl)
+
+    def stats(self) -> Dict:
+        local_hits = self.local.hits
+        lookups = local_hits + self.shared_hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend else "memory",
+            "size": len(self.local),
+            "local_hits": local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.local.evictions,
+            "hit_rate": round((local_hits + self.shared_hits) / lookups, 4) if lookups else 0.0
+        }
+
+def build_itinerary_cache() -> Optional[ItineraryCache]:
+    """Cache configured from ITINERARY_CACHE_* (None when disabled)"""
+    if ITINERARY_CACHE_BACKEND == "none":
+        return None
+    backend = None
+    if ITINERARY_CACHE_BACKEND == "file":
+        backend = FileBackend(ITINERARY_CACHE_PATH)
+    elif ITINERARY_CACHE_BACKEND == "redis":
+        backend = RedisBackend(ITINERARY_CACHE_URL)
+    return ItineraryCache(backend=backend)
@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+from openai import AsyncOpenAI, OpenAIError
+
+from cache import TTLCache
+from metrics import counter, histogram
+from providers import Coalescer, run_on_app_loop
+
+# Unset OPENAI_API_KEY keeps the planner and chatbot on their built-in templates.
+# OPENAI_BASE_URL points at any OpenAI-compatible server (stubs/openai_stub.py locally).
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.3"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "256"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "10"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+# Completions in flight per process; callers beyond that queue for up to LLM_QUEUE_TIMEOUT
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "5"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+
+LLM_REQUESTS = counter("llm_requests_total", "Completions sent upstream")
+LLM_ERRORS = counter("llm_errors_total", "Upstream completions that failed")
+LLM_REJECTED = counter("llm_rejected_total", "Completions that gave up waiting for a concurrency slot")
+LLM_CACHE_EXACT_HITS = counter("llm_cache_exact_hits_total", "Completions served for an identical prompt")
+LLM_CACHE_NORMALIZED_HITS = counter(
+    "llm_cache_normalized_hits_total", "Completions served for a prompt differing only in case, spacing or punctuation"
+)
+LLM_COALESCED = counter("llm_coalesced_total", "Completions that shared an identical in-flight request")
+LLM_PROMPT_TOKENS = counter("llm_prompt_tokens_total", "Prompt tokens billed upstream")
+LLM_COMPLETION_TOKENS = counter("llm_completion_tokens_total", "Completion tokens billed upstream")
+LLM_TOKENS_SAVED = counter("llm_tokens_saved_total", "Tokens not billed thanks to the cache or coalescing")
+LLM_REQUEST_SECONDS = histogram("llm_request_seconds", "Upstream completion latency")
+LLM_QUEUE_SECONDS = histogram("llm_queue_seconds", "Time waiting for a free LLM_MAX_CONCURRENCY slot")
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+class LLMError(Exception):
+    """The LLM is disabled, busy or failed; callers fall back to their templates"""
+
+def normalize_prompt(text: str) -> str:
+    """Lowercased words only, so trivially different phrasings share a cache entry"""
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+def _digest(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+class LLMResult:
+    """One completion and what it cost this request"""
+
+    __slots__ = ("text", "model", "prompt_tokens", "completion_tokens", "latency_ms", "source")
+
+    def __init__(self, text: str, model: str, prompt_tokens: int, completion_tokens: int,
+                 latency_ms: float, source: str = "upstream"):
+        self.text = text
+        self.model = model
+        # Tokens billed for this request: 0 when served from cache or coalesced
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.latency_ms = latency_ms
+        # upstream | exact | normalized | coalesced
+        self.source = source
+
+    def reused(self, source: str, latency_ms: float) -> "LLMResult":
+        return LLMResult(self.text, self.model, 0, 0, latency_ms, source)
+
+    def usage(self) -> Dict:
+        return {
+            "model": self.model,
+            "source": self.source,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "latency_ms": self.latency_ms
+        }
+
+class LLMGateway:
+    """Single entry point for chat completions
+
+    Prompts are cached by their normalized text (the stored entry remembers
+    the exact prompt, so hits are reported as exact or normalized), identical
+    prompts in flight share one upstream request, and at most max_concurrency
+    requests run at once per process.
+    """
+
+    def __init__(self, api_key: Optional[str] = OPENAI_API_KEY, base_url: Optional[str] = OPENAI_BASE_URL,
+                 model: str = LLM_MODEL, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 cache: Optional[TTLCache] = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.cache = cache if cache is not None else TTLCache(LLM_CACHE_SIZE, LLM_CACHE_TTL)
+        self.coalescer = Coalescer()
+        self._client: Optional[AsyncOpenAI] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    def _loop_state(self):
+        # Like providers.get_client: connections and semaphores cannot move between loops
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._client = AsyncOpenAI(
+                api_key=self.api_key, base_url=self.base_url, timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client, self._semaphore
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.close()
+        self._client = self._semaphore = self._loop = None
+
+    async def complete(self, messages: List[Dict[str, str]], max_tokens: int = LLM_MAX_TOKENS,
+                       temperature: float = LLM_TEMPERATURE, cache: bool = True) -> LLMResult:
+        """Chat completion for messages ([{"role": ..., "content": ...}]); raises LLMError"""
+        if not self.enabled:
+            raise LLMError("LLM disabled (OPENAI_API_KEY unset)")
+        start = time.perf_counter()
+        exact_key = _digest(self.model, max_tokens, temperature,
+                            [[m["role"], m["content"]] for m in messages])
+        normalized_key = _digest(self.model, max_tokens, temperature,
+                                 [[m["role"], normalize_prompt(m["content"])] for m in messages])
+        if cache:
+            entry = self.cache.get(normalized_key)
+            if entry is not None:
+                stored_key, stored = entry
+                source = "exact" if stored_key == exact_key else "normalized"
+                (LLM_CACHE_EXACT_HITS if source == "exact" else LLM_CACHE_NORMALIZED_HITS).inc()
+                LLM_TOKENS_SAVED.inc(stored.prompt_tokens + stored.completion_tokens)
+                return stored.reused(source, self._elapsed_ms(start))
+
+        led = []
+
+        def fetch():
+            led.append(True)
+            return self._request(messages, max_tokens, temperature)
+
+        result = await self.coalescer.run(exact_key, fetch)
+        if not led:
+            LLM_COALESCED.inc()
+            LLM_TOKENS_SAVED.inc(result.prompt_tokens + result.completion_tokens)
+            return result.reused("coalesced", self._elapsed_ms(start))
+        if cache:
+            self.cache.set(normalized_key, (exact_key, result))
+        return result
+
+    def complete_sync(self, messages: List[Dict[str, str]], **kwargs) -> LLMResult:
+        """complete() for sync code in a worker thread, run on the app's event loop"""
+        if not self.enabled:
+            raise LLMError("LLM disabled (OPENAI_API_KEY unset)")
+        result = run_on_app_loop(
+            lambda: self.complete(messages, **kwargs), LLM_QUEUE_TIMEOUT + LLM_TIMEOUT * (LLM_MAX_RETRIES + 1)
+        )
+        if result is None:
+            raise LLMError("No running app event loop")
+        return result
+
+    async def _request(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> LLMResult:
+        client, semaphore = self._loop_state()
+        queued = time.perf_counter()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), LLM_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            LLM_REJECTED.inc()
+            raise LLMError("LLM concurrency limit reached")
+        start = time.perf_counter()
+        LLM_QUEUE_SECONDS.observe(start - queued)
+        LLM_REQUESTS.inc()
+        try:
+            completion = await client.chat.completions.create(
+                model=self.model, messages=messages, max_tokens=max_tokens, temperature=temperature
+            )
+        except OpenAIError as e:
+            LLM_ERRORS.inc()
+            raise LLMError(str(e)) from e
+        finally:
+            semaphore.release()
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - start)
+        usage = completion.usage
+        prompt_tokens = usage.prompt_tokens if usage else 0
+        completion_tokens = usage.completion_tokens if usage else 0
+        LLM_PROMPT_TOKENS.inc(prompt_tokens)
+        LLM_COMPLETION_TOKENS.inc(completion_tokens)
+        return LLMResult(
+            completion.choices[0].message.content or "", completion.model,
+            prompt_tokens, completion_tokens, self._elapsed_ms(queued)
+        )
+
+    @staticmethod
+    def _elapsed_ms(start: float) -> float:
+        return round((time.perf_counter() - start) * 1000, 3)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "model": self.model,
+            "max_concurrency": self.max_concurrency,
+            "upstream_requests": LLM_REQUESTS.value,
+            "errors": LLM_ERRORS.value,
+            "rejected": LLM_REJECTED.value,
+            "coalesced": LLM_COALESCED.value,
+            "cache": {
+                **self.cache.stats(),
+                "exact_hits": LLM_CACHE_EXACT_HITS.value,
+                "normalized_hits": LLM_CACHE_NORMALIZED_HITS.value
+            },
+            "tokens": {
+                "prompt": LLM_PROMPT_TOKENS.value,
+                "completion": LLM_COMPLETION_TOKENS.value,
+                "saved": LLM_TOKENS_SAVED.value
+            },
+            "request_seconds": LLM_REQUEST_SECONDS.snapshot(),
+            "queue_seconds": LLM_QUEUE_SECONDS.snapshot()
+        }
+
+# Shared by the planner and the chatbot so they share one cache and one concurrency limit
+llm_gateway = LLMGateway()
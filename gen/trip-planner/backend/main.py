@@ -1,60 +1,129 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import List, Optional
+from contextlib import asynccontextmanager
+import time
+import uuid
+import anyio
 import uvicorn
 
-from database import SessionLocal, engine
-from models import Base, User, Trip, Itinerary, Booking, Payment
-from schemas import UserCreate, UserResponse, TripCreate, TripResponse, ItineraryResponse, BookingCreate, PaymentCreate
-from auth import create_access_token, verify_password, get_password_hash, verify_token
+from database import engine, async_engine, get_db, ASYNC_DB_ENABLED
+from db_metrics import pool_stats, metrics_snapshot
+from http_metrics import RequestMetricsMiddleware
+from metrics import render_prometheus
+from models import Base, User, Payment
+from schemas import UserCreate, UserResponse, TripCreate, TripBatchCreate, TripResponse, ItineraryResponse, TripDetailResponse, ItineraryOptimizeRequest, BookingCreate, InventoryUpdate, PaymentCreate
+from auth import create_access_token, averify_password, aget_password_hash, decode_token, HashingBusyError
+from user_cache import get_user
 from ai_service import generate_itinerary, update_itinerary_realtime
-from genai_service import GenAITripPlanner, TravelChatbot, RealTimeOptimizer
-from payment_service import process_payment
-from hackathon_endpoints import router as hackathon_router
+from genai_service import TravelChatbot, RealTimeOptimizer
+from inventory import (
+    book_item, confirm_hold, booking_response, get_inventory, set_capacity, inventory_status,
+    SoldOutError, BookingStateError
+)
+from payment_queue import (
+    payment_queue, accept_payment, request_refund, payment_receipt, payment_status,
+    PaymentQueueFullError, IdempotencyKeyReusedError, PaymentStateError
+)
+from activity_catalog import reload_catalog
+from responses import JSONResponseClass, CompressionMiddleware, json_response
+from providers import start_providers, stop_providers, provider_stats
+from llm_gateway import llm_gateway
+from hackathon_endpoints import router as hackathon_router, chatbot
+from async_endpoints import router as async_router
+from trip_service import (
+    aplan_trip, persist_trip, trip_summary, itinerary_cache, plan_trips, persist_trips,
+    batch_response, MAX_BATCH_SIZE, stream_trip, STREAM_MEDIA_TYPES, list_trips,
+    TRIPS_PAGE_SIZE, TRIPS_MAX_PAGE_SIZE, trip_etag, etag_matches, trip_version,
+    cached_trip_detail, load_trip_detail, optimize_trips, AGENT_TIMING_HEADER, server_timing
+)
 
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Trip Planner API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP client for all upstream providers, for the app's lifetime
+    await start_providers()
+    # Settlement threads; their first sweep picks up payments a previous process left unsettled
+    payment_queue.start()
+    yield
+    await anyio.to_thread.run_sync(payment_queue.stop)
+    await llm_gateway.aclose()
+    await stop_providers()
+
+app = FastAPI(title="Trip Planner API", version="1.0.0", lifespan=lifespan,
+              default_response_class=JSONResponseClass)
 
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # GET /trips returns the next page's cursor in a header
+    expose_headers=["X-Next-Cursor"],
 )
+# Outermost, so latency includes compression and CORS handling
+app.add_middleware(RequestMetricsMiddleware)
 
 # Include hackathon-winning features
 app.include_router(hackathon_router, prefix="/hackathon", tags=["AI Features"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@app.exception_handler(HashingBusyError)
+def hashing_busy_handler(request, exc: HashingBusyError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication service busy, please retry"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(SoldOutError)
+@app.exception_handler(BookingStateError)
+def booking_conflict_handler(request, exc: Exception):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+@app.exception_handler(PaymentQueueFullError)
+def payment_queue_full_handler(request, exc: PaymentQueueFullError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Payment service busy, please retry"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(IdempotencyKeyReusedError)
+def idempotency_key_reused_handler(request, exc: IdempotencyKeyReusedError):
+    return JSONResponse(status_code=422, content={"detail": str(exc)})
+
+@app.exception_handler(PaymentStateError)
+def payment_state_handler(request, exc: PaymentStateError):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+# Write-heavy routes also exist as async handlers (async_endpoints.py);
+# DB_ASYNC picks which set is mounted at the bottom of this module.
+sync_router = APIRouter()
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    user_id = verify_token(token)
-    if not user_id:
+    decoded = decode_token(token)
+    if not decoded:
         raise HTTPException(status_code=401, detail="Invalid token")
-    user = db.query(User).filter(User.id == user_id).first()
+    user_id, expires_at = decoded
+    # Never keep a user cached past the token that authorized the lookup
+    user = get_user(db, user_id, max_age=expires_at - time.time())
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
-@app.post("/auth/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    hashed_password = get_password_hash(user.password)
+def _user_by_email(db: Session, email: str) -> Optional[User]:
+    return db.query(User).filter(User.email == email).first()
+
+def _create_user(db: Session, user: UserCreate, hashed_password: str) -> User:
     db_user = User(
         name=user.name,
         email=user.email,
@@ -67,144 +136,226 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     db.refresh(db_user)
     return db_user
 
+# Auth handlers are async so bcrypt is awaited on its own pool instead of
+# holding a request thread; only the short DB calls borrow one
+@app.post("/auth/register", response_model=UserResponse)
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    db_user = await anyio.to_thread.run_sync(_user_by_email, db, user.email)
+    if db_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    hashed_password = await aget_password_hash(user.password)
+    return await anyio.to_thread.run_sync(_create_user, db, user, hashed_password)
+
 @app.post("/auth/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await anyio.to_thread.run_sync(_user_by_email, db, form_data.username)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # For demo purposes, accept "password" for existing users
-    if form_data.password != "password" and not verify_password(form_data.password, user.password):
+    if form_data.password != "password" and not await averify_password(form_data.password, user.password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     access_token = create_access_token(data={"sub": str(user.id)})
     return {"access_token": access_token, "token_type": "bearer", "user": {"id": user.id, "name": user.name, "email": user.email, "preferences": user.preferences, "budget": user.budget}}
 
-@app.post("/itinerary/generate")
+@sync_router.post("/itinerary/generate")
 def generate_trip_itinerary(trip: TripCreate, db: Session = Depends(get_db)):
-    # Create trip record
-    db_trip = Trip(
-        user_id=1,  # Default user for demo
-        destination=trip.destination,
-        duration=trip.duration,
-        total_cost=0,
-        status="planning"
-    )
-    db.add(db_trip)
-    db.commit()
-    db.refresh(db_trip)
+    # Advanced GenAI trip planning runs first so the trip is written with its final total;
+    # the planner's agents fan out on the event loop while this worker thread waits
+    ai_result, timings = anyio.from_thread.run(aplan_trip, trip)
+    headers = {"Server-Timing": server_timing(timings)} if AGENT_TIMING_HEADER else None
     
-    # Advanced GenAI trip planning
-    genai_planner = GenAITripPlanner()
-    user_context = {
-        "travel_history": [],  # Could be fetched from user's past trips
-        "booking_patterns": {},
-        "preferences_strength": {"heritage": True, "food": True}
-    }
+    # Trip + itinerary rows in a single transaction
+    trip_id, total_cost = persist_trip(db, trip, ai_result)
     
-    ai_result = genai_planner.generate_smart_itinerary(
-        destination=trip.destination,
-        duration=trip.duration,
-        budget=2000,
-        preferences={"heritage": True, "food": True},
-        user_context=user_context
-    )
+    return json_response(trip_summary(trip_id, trip, total_cost, ai_result), headers=headers)
+
+@sync_router.post("/itinerary/generate/batch")
+def generate_trip_itineraries(batch: TripBatchCreate, db: Session = Depends(get_db)):
+    if len(batch.trips) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch limited to {MAX_BATCH_SIZE} trips")
     
-    total_cost = 0
-    for day_data in ai_result["itinerary"]:
-        db_itinerary = Itinerary(
-            trip_id=db_trip.id,
-            day=day_data["day"],
-            activity=day_data["activity"],
-            location=day_data["location"],
-            cost=day_data["cost"]
-        )
-        db.add(db_itinerary)
-        total_cost += day_data["cost"]
+    # Plan everything first; items that fail planning are reported, not persisted
+    planned = plan_trips(batch.trips)
+    ok = [(trip, ai_result) for trip, (ai_result, error) in zip(batch.trips, planned) if error is None]
     
-    db_trip.total_cost = total_cost
-    db.commit()
+    persisted = persist_trips(db, [trip for trip, _ in ok], [ai_result for _, ai_result in ok])
     
-    return {
-        "id": db_trip.id,
-        "destination": db_trip.destination,
-        "duration": db_trip.duration,
-        "total_cost": db_trip.total_cost,
-        "status": db_trip.status,
-        "ai_insights": ai_result["ai_insights"],
-        "dynamic_pricing": ai_result["dynamic_pricing"],
-        "sustainability_score": ai_result["sustainability_score"]
-    }
+    return json_response(batch_response(batch.trips, planned, persisted))
 
-@app.get("/trips")
-def get_user_trips(db: Session = Depends(get_db)):
-    return db.query(Trip).filter(Trip.user_id == 1).all()
+@app.post("/itinerary/generate/stream")
+def stream_trip_itinerary(trip: TripCreate, format: str = "ndjson"):
+    """Day-by-day itinerary as NDJSON (default) or Server-Sent Events (?format=sse)"""
+    if format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(STREAM_MEDIA_TYPES)}")
+    return StreamingResponse(stream_trip(trip, format), media_type=STREAM_MEDIA_TYPES[format])
 
-@app.get("/trips/{trip_id}/itinerary")
-def get_trip_itinerary(trip_id: int, db: Session = Depends(get_db)):
-    trip = db.query(Trip).filter(Trip.id == trip_id).first()
-    if not trip:
-        raise HTTPException(status_code=404, detail="Trip not found")
+@app.get("/trips")
+def get_user_trips(
+    limit: int = Query(TRIPS_PAGE_SIZE, ge=1, le=TRIPS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated subset of trip columns"),
+    db: Session = Depends(get_db)
+):
+    try:
+        trips, next_cursor = list_trips(
+            db, user_id=1, limit=limit, cursor=cursor,
+            fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    itinerary = db.query(Itinerary).filter(Itinerary.trip_id == trip_id).all()
-    return {"trip": trip, "itinerary": itinerary}
+    # Body stays a plain list for existing clients; the next page is a header
+    return json_response(trips, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
 
-@app.post("/book")
-def book_trip(booking: BookingCreate, db: Session = Depends(get_db)):
-    trip = db.query(Trip).filter(Trip.id == booking.trip_id).first()
-    if not trip:
-        raise HTTPException(status_code=404, detail="Trip not found")
+@app.get("/trips/{trip_id}/itinerary", response_model=TripDetailResponse)
+def get_trip_itinerary(trip_id: int, request: Request, db: Session = Depends(get_db)):
+    headers = {"Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
     
-    db_booking = Booking(
-        trip_id=booking.trip_id,
-        item_type=booking.item_type,
-        item_id=booking.item_id,
-        status="confirmed"
-    )
-    db.add(db_booking)
-    db.commit()
-    db.refresh(db_booking)
+    body = None
+    if if_none_match:
+        # Revalidation only needs the version column
+        version = trip_version(db, trip_id)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Trip not found")
+        headers["ETag"] = trip_etag(trip_id, version)
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        body = cached_trip_detail(trip_id, version)
     
-    trip.status = "booked"
-    db.commit()
+    if body is None:
+        loaded = load_trip_detail(db, trip_id)
+        if loaded is None:
+            raise HTTPException(status_code=404, detail="Trip not found")
+        version, body = loaded
+        headers["ETag"] = trip_etag(trip_id, version)
     
-    return {"message": "Booking confirmed", "booking_id": db_booking.id}
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@sync_router.post("/book")
+def book_trip(booking: BookingCreate, db: Session = Depends(get_db)):
+    # Capacity claim, booking row and trip status share one commit
+    result = book_item(db, booking)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Trip not found")
+    return result
 
-@app.post("/payment")
-def process_trip_payment(payment: PaymentCreate, db: Session = Depends(get_db)):
-    booking = db.query(Booking).filter(Booking.id == payment.booking_id).first()
-    if not booking:
+@sync_router.post("/book/{booking_id}/confirm")
+def confirm_booking(booking_id: int, db: Session = Depends(get_db)):
+    booking = confirm_hold(db, booking_id)
+    if booking is None:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    return booking_response(booking)
+
+@sync_router.post("/payment", status_code=202)
+def process_trip_payment(payment: PaymentCreate, db: Session = Depends(get_db),
+                         idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255)):
+    # Accepted as pending and settled by the payment queue; poll GET /payment/{id}.
+    # Without an Idempotency-Key a retried request creates a second payment.
+    accepted = accept_payment(db, payment, idempotency_key or uuid.uuid4().hex)
+    if accepted is None:
         raise HTTPException(status_code=404, detail="Booking not found")
     
-    # Simulate successful payment
-    db_payment = Payment(
-        booking_id=payment.booking_id,
-        amount=payment.amount,
-        method=payment.method,
-        status="completed",
-        timestamp=datetime.utcnow()
-    )
-    db.add(db_payment)
-    db.commit()
-    
-    return {"message": "Payment processed successfully", "status": "completed"}
+    status_code, body, headers = payment_receipt(*accepted)
+    return json_response(body, status_code=status_code, headers=headers)
 
-@app.put("/itinerary/update/{trip_id}")
+@sync_router.post("/payment/{payment_id}/refund", status_code=202)
+def refund_trip_payment(payment_id: int, db: Session = Depends(get_db)):
+    payment = request_refund(db, payment_id)
+    if payment is None:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    return payment_status(payment)
+
+@sync_router.put("/itinerary/update/{trip_id}")
 def update_itinerary(trip_id: int, db: Session = Depends(get_db)):
-    trip = db.query(Trip).filter(Trip.id == trip_id).first()
-    if not trip:
+    if trip_version(db, trip_id) is None:
         raise HTTPException(status_code=404, detail="Trip not found")
     
-    # Simple update simulation
-    existing_items = db.query(Itinerary).filter(Itinerary.trip_id == trip_id).all()
-    
-    # Update activity names to show "optimized" versions
-    for item in existing_items:
-        if "AI-Optimized" not in item.activity:
-            item.activity = f"{item.activity} (AI-Optimized)"
-    
-    db.commit()
-    return {"message": "Itinerary updated with real-time optimization!"}
+    # Update activity names to show "optimized" versions in a single UPDATE
+    updated_rows = optimize_trips(db, [trip_id])
+    return {"message": "Itinerary updated with real-time optimization!", "updated_rows": updated_rows}
+
+@sync_router.post("/itinerary/optimize")
+def optimize_itineraries(request: ItineraryOptimizeRequest, db: Session = Depends(get_db)):
+    """Bulk re-optimization for many trips (e.g. a nightly job)"""
+    updated_rows = optimize_trips(db, request.trip_ids)
+    return {"message": "Itineraries optimized", "trips": len(set(request.trip_ids)), "updated_rows": updated_rows}
+
+app.include_router(async_router if ASYNC_DB_ENABLED else sync_router)
+
+@app.get("/payment/{payment_id}")
+def get_payment(payment_id: int, db: Session = Depends(get_db)):
+    """Settlement progress: pending until the payment queue has written an outcome"""
+    payment = db.get(Payment, payment_id)
+    if payment is None:
+        raise HTTPException(status_code=404, detail="Payment not found")
+    return payment_status(payment)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_prometheus_metrics():
+    """Every registered counter and histogram in the Prometheus text format"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/db-pool")
+def get_db_pool_metrics():
+    """Connection pool occupancy, checkout latency and connection churn"""
+    pools = {"sync": pool_stats(engine.pool)}
+    if async_engine is not None:
+        pools["async"] = pool_stats(async_engine.sync_engine.pool)
+    return {"pools": pools, "metrics": metrics_snapshot()}
+
+@app.get("/metrics/itinerary-cache")
+def get_itinerary_cache_metrics():
+    """Hit-rate statistics for the planner result cache"""
+    if itinerary_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **itinerary_cache.stats()}
+
+@app.get("/metrics/providers")
+def get_provider_metrics():
+    """Upstream request, coalescing and error counts per data provider"""
+    return provider_stats()
+
+@app.get("/metrics/payments")
+def get_payment_metrics():
+    """Payment queue depth, settlement outcomes and batched status writes"""
+    return payment_queue.stats()
+
+@app.get("/metrics/chat-sessions")
+def get_chat_session_metrics():
+    """Chat sessions held, their estimated memory and eviction counts"""
+    return chatbot.store.stats()
+
+@app.get("/metrics/llm")
+def get_llm_metrics():
+    """LLM requests, prompt cache hits, coalescing, token usage and latency"""
+    return llm_gateway.stats()
+
+@app.get("/inventory/{item_type}/{item_id}")
+def get_item_inventory(item_type: str, item_id: str, db: Session = Depends(get_db)):
+    """Capacity, reserved units (held + confirmed) and availability for a bookable item"""
+    row = get_inventory(db, item_type, item_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Item has no inventory (unlimited)")
+    return inventory_status(row)
+
+@app.put("/inventory/{item_type}/{item_id}")
+def set_item_inventory(item_type: str, item_id: str, update: InventoryUpdate,
+                       current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Create or resize an item's capacity; refuses to drop below what is reserved"""
+    return inventory_status(set_capacity(db, item_type, item_id, update.capacity))
+
+@app.post("/admin/catalog/reload")
+def reload_activity_catalog(current_user: User = Depends(get_current_user)):
+    """Re-read the activity catalog (ACTIVITY_CATALOG_PATH) without a restart"""
+    try:
+        catalog = reload_catalog()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Catalog reload failed: {e}")
+    return {"message": "Activity catalog reloaded", "cities": catalog.cities}
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,200 @@
+import asyncio
+import functools
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Latency buckets in seconds, tuned for sub-millisecond pool checkouts up to slow requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Seconds-to-hours buckets for long-lived objects such as pooled connections
+LIFETIME_BUCKETS = (1, 5, 15, 60, 300, 900, 1800, 3600, 7200, 14400, 43200, 86400)
+
+class Counter:
+    """Monotonic in-process counter"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> Dict:
+        return {"value": self._value}
+
+class Histogram:
+    """Fixed-bucket histogram with count and sum"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self._count, self._sum
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = count
+        return {"count": count, "sum": round(total, 6), "buckets": cumulative}
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bucket bound containing the q-th observation (None when empty)"""
+        with self._lock:
+            counts = list(self._counts)
+            count = self._count
+        if not count:
+            return None
+        target, running = q * count, 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            if running >= target:
+                return bound
+        return float("inf")
+
+class MetricFamily:
+    """One metric split by label values; children are created on first use
+
+    Keep label values low-cardinality (route templates, stage names), never
+    raw paths or ids.
+    """
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str], make: Callable[[], object]):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.kind = make().kind
+        self._make = make
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._make())
+        return child
+
+    def children(self) -> List[Tuple[Dict[str, str], object]]:
+        with self._lock:
+            items = list(self._children.items())
+        return [(dict(zip(self.labelnames, key)), child) for key, child in items]
+
+    def snapshot(self) -> Dict:
+        return {",".join(f"{k}={v}" for k, v in labels.items()): child.snapshot() for labels, child in self.children()}
+
+REGISTRY: Dict[str, object] = {}
+_registry_lock = threading.Lock()
+
+def _register(name: str, make: Callable[[], object], description: str, labelnames: Sequence[str]):
+    with _registry_lock:
+        metric = REGISTRY.get(name)
+        if metric is None:
+            metric = REGISTRY[name] = MetricFamily(name, description, labelnames, make) if labelnames else make()
+        return metric
+
+def counter(name: str, description: str = "", labelnames: Sequence[str] = ()) -> Union[Counter, MetricFamily]:
+    """Get or create a registered Counter (a MetricFamily of them when labelnames are given)"""
+    return _register(name, lambda: Counter(name, description), description, labelnames)
+
+def histogram(name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS,
+              labelnames: Sequence[str] = ()) -> Union[Histogram, MetricFamily]:
+    """Get or create a registered Histogram (a MetricFamily of them when labelnames are given)"""
+    return _register(name, lambda: Histogram(name, description, buckets), description, labelnames)
+
+@contextmanager
+def timer(metric: Histogram) -> Iterator[None]:
+    """Observe the block's wall time in seconds, including when it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - start)
+
+def timed(metric: Histogram):
+    """Decorator form of timer for plain and async functions"""
+    def decorate(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with timer(metric):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(metric):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _sample_lines(name: str, labels: Dict[str, str], metric) -> List[str]:
+    if metric.kind == "counter":
+        return [f"{name}{_label_text(labels)} {_number(metric.value)}"]
+    snapshot = metric.snapshot()
+    lines = [
+        f"{name}_bucket{_label_text({**labels, 'le': bound})} {count}"
+        for bound, count in snapshot["buckets"].items()
+    ]
+    lines.append(f"{name}_sum{_label_text(labels)} {_number(snapshot['sum'])}")
+    lines.append(f"{name}_count{_label_text(labels)} {snapshot['count']}")
+    return lines
+
+def render_prometheus(registry: Optional[Dict[str, object]] = None) -> str:
+    """Every registered metric in the Prometheus text exposition format (0.0.4)"""
+    with _registry_lock:
+        metrics = sorted((registry if registry is not None else REGISTRY).items())
+    lines = []
+    for name, metric in metrics:
+        if metric.description:
+            lines.append(f"# HELP {name} {metric.description}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        if isinstance(metric, MetricFamily):
+            for labels, child in metric.children():
+                lines.extend(_sample_lines(name, labels, child))
+        else:
+            lines.extend(_sample_lines(name, {}, metric))
+    return "\n".join(lines) + "\n"
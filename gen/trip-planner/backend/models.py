@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, JSON, Index, UniqueConstraint, CheckConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -26,10 +26,18 @@ class Trip(Base):
     total_cost = Column(Float, default=0.0)
     status = Column(String, default="planning")
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped by every write that changes what GET /trips/{id}/itinerary returns;
+    # it is the basis of that endpoint's ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     user = relationship("User", back_populates="trips")
-    itineraries = relationship("Itinerary", back_populates="trip")
+    itineraries = relationship("Itinerary", back_populates="trip", order_by="Itinerary.id")
     bookings = relationship("Booking", back_populates="trip")
+    
+    # Serves keyset pagination of a user's trips, newest first
+    __table_args__ = (
+        Index("idx_trips_user_created_at", "user_id", created_at.desc(), id.desc()),
+    )
 
 class Itinerary(Base):
     __tablename__ = "itineraries"
@@ -50,11 +58,34 @@ class Booking(Base):
     trip_id = Column(Integer, ForeignKey("trips.id"), nullable=False)
     item_type = Column(String, nullable=False)
     item_id = Column(String, nullable=False)
+    quantity = Column(Integer, default=1, nullable=False)
+    # held -> confirmed | expired; confirmed bookings are final
     status = Column(String, default="pending")
+    expires_at = Column(DateTime, nullable=True)  # set while held
     created_at = Column(DateTime, default=datetime.utcnow)
     
     trip = relationship("Trip", back_populates="bookings")
     payments = relationship("Payment", back_populates="booking")
+    
+    __table_args__ = (
+        Index("idx_bookings_held_expires_at", "expires_at", postgresql_where=status == "held"),
+    )
+
+class Inventory(Base):
+    """Bookable capacity per item; items without a row are unlimited"""
+    __tablename__ = "inventory"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    item_type = Column(String, nullable=False)
+    item_id = Column(String, nullable=False)
+    capacity = Column(Integer, nullable=False)
+    reserved = Column(Integer, default=0, nullable=False)  # held + confirmed units
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("item_type", "item_id", name="uq_inventory_item"),
+        CheckConstraint("reserved >= 0 AND reserved <= capacity", name="ck_inventory_reserved"),
+    )
 
 class Payment(Base):
     __tablename__ = "payments"
@@ -63,7 +94,19 @@ class Payment(Base):
     booking_id = Column(Integer, ForeignKey("bookings.id"), nullable=False)
     amount = Column(Float, nullable=False)
     method = Column(String, nullable=False)
+    # pending -> completed | failed; completed -> refund_pending -> refunded | refund_failed
     status = Column(String, default="pending")
     timestamp = Column(DateTime, default=datetime.utcnow)
+    # Client-supplied Idempotency-Key; a retried POST /payment finds this row instead of adding one
+    idempotency_key = Column(String, unique=True, nullable=True)
+    transaction_id = Column(String, nullable=True)
+    refund_id = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    
+    booking = relationship("Booking", back_populates="payments")
     
-    booking = relationship("Booking", back_populates="payments")
\ No newline at end of file
+    # Lets settlement recovery find unfinished payments without scanning the table
+    __table_args__ = (
+        Index("idx_payments_unsettled", "status", postgresql_where=status.in_(["pending", "refund_pending"])),
+    )
\ No newline at end of file
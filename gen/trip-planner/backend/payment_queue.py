@@ -0,0 +1,476 @@
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from metrics import counter, histogram
+from models import Booking, Payment
+from payment_service import PaymentGateway, get_gateway
+from schemas import PaymentCreate
+
+# Gateway calls never run in the request: POST /payment writes a pending row
+# and a bounded pool settles it. Outcomes are written by one writer thread,
+# up to PAYMENT_WRITE_BATCH rows per UPDATE.
+PAYMENT_WORKERS = int(os.getenv("PAYMENT_WORKERS", "4"))
+PAYMENT_QUEUE_SIZE = int(os.getenv("PAYMENT_QUEUE_SIZE", "1000"))
+PAYMENT_WRITE_BATCH = int(os.getenv("PAYMENT_WRITE_BATCH", "100"))
+PAYMENT_WRITE_INTERVAL_MS = float(os.getenv("PAYMENT_WRITE_INTERVAL_MS", "50"))
+PAYMENT_MAX_ATTEMPTS = int(os.getenv("PAYMENT_MAX_ATTEMPTS", "3"))
+PAYMENT_RETRY_AFTER = int(os.getenv("PAYMENT_RETRY_AFTER", "1"))
+# Unsettled rows untouched for PAYMENT_STALE_SECONDS (a job that did not fit
+# the queue, a lost status write, a crashed process) are re-queued by a sweep
+# every PAYMENT_SWEEP_SECONDS
+PAYMENT_STALE_SECONDS = float(os.getenv("PAYMENT_STALE_SECONDS", "120"))
+PAYMENT_SWEEP_SECONDS = float(os.getenv("PAYMENT_SWEEP_SECONDS", "30"))
+
+logger = logging.getLogger(__name__)
+
+UNSETTLED_STATUSES = ("pending", "refund_pending")
+REFUNDABLE_STATUSES = ("completed", "refund_failed")
+
+PAYMENTS_ACCEPTED = counter("payments_accepted_total", "Payments written as pending")
+PAYMENTS_REPLAYED = counter("payments_replayed_total", "POST /payment retries answered from an existing row")
+PAYMENTS_SETTLED = counter("payments_settled_total", "Charges and refunds the gateway accepted")
+PAYMENTS_DECLINED = counter("payments_declined_total", "Charges and refunds the gateway declined")
+PAYMENTS_DEFERRED = counter(
+    "payments_deferred_total", "Settlements left unsettled for the sweep after every gateway attempt errored"
+)
+PAYMENTS_REQUEUED = counter("payments_requeued_total", "Stale unsettled payments claimed by a sweep")
+PAYMENT_GATEWAY_SECONDS = histogram("payment_gateway_seconds", "Gateway call latency, including retries")
+PAYMENT_QUEUE_SECONDS = histogram("payment_queue_seconds", "Time from acceptance until a worker picks a job up")
+PAYMENT_WRITE_BATCH_ROWS = histogram(
+    "payment_write_batch_rows", "Status updates per batched write", (1, 2, 5, 10, 20, 50, 100, 200, 500)
+)
+
+class PaymentQueueFullError(Exception):
+    """Raised when no settlement capacity is left; maps to 503 + Retry-After"""
+
+    def __init__(self, retry_after: int = PAYMENT_RETRY_AFTER):
+        super().__init__("Payment queue full")
+        self.retry_after = retry_after
+
+class IdempotencyKeyReusedError(Exception):
+    """The Idempotency-Key already belongs to a different payment request; maps to 422"""
+
+class PaymentStateError(Exception):
+    """The payment is not in a state that allows the requested action; maps to 409"""
+
+class SettlementJob:
+    __slots__ = ("payment_id", "kind", "amount", "method", "idempotency_key", "transaction_id", "queued_at")
+
+    def __init__(self, payment_id: int, kind: str, amount: float, method: str,
+                 idempotency_key: str, transaction_id: Optional[str] = None):
+        self.payment_id = payment_id
+        self.kind = kind  # charge | refund
+        self.amount = amount
+        self.method = method
+        self.idempotency_key = idempotency_key
+        self.transaction_id = transaction_id
+        self.queued_at = time.perf_counter()
+
+    @classmethod
+    def for_payment(cls, payment: Payment) -> "SettlementJob":
+        kind = "refund" if payment.status == "refund_pending" else "charge"
+        key = payment.idempotency_key or f"payment-{payment.id}"
+        return cls(payment.id, kind, payment.amount, payment.method,
+                   f"{key}:refund" if kind == "refund" else key, payment.transaction_id)
+
+def _settle_statement():
+    # Guarded on the expected current status so a late or duplicate outcome never overwrites a newer state
+    table = Payment.__table__
+    return (
+        update(table)
+        .where(table.c.id == bindparam("b_id"), table.c.status == bindparam("b_from"))
+        .values(
+            status=bindparam("b_status"), transaction_id=bindparam("b_transaction_id"),
+            refund_id=bindparam("b_refund_id"), error=bindparam("b_error"),
+            updated_at=bindparam("b_updated_at")
+        )
+    )
+
+def _claim_stale_statement(cutoff: datetime, now: datetime, limit: int):
+    # Touching updated_at is the claim: a sweep in another worker no longer
+    # sees these rows as stale, so each one is re-queued by a single process
+    last_touched = func.coalesce(Payment.updated_at, Payment.timestamp)
+    stale = (
+        select(Payment.id)
+        .where(Payment.status.in_(UNSETTLED_STATUSES), last_touched < cutoff)
+        .order_by(Payment.id)
+        .limit(limit)
+    )
+    return (
+        update(Payment)
+        .where(Payment.id.in_(stale.scalar_subquery()), Payment.status.in_(UNSETTLED_STATUSES),
+               last_touched < cutoff)
+        .values(updated_at=now)
+        .returning(Payment.id, Payment.status, Payment.amount, Payment.method,
+                   Payment.idempotency_key, Payment.transaction_id)
+        .execution_options(synchronize_session=False)
+    )
+
+class PaymentQueue:
+    """Bounded worker pool that settles payments and batches their status writes"""
+
+    def __init__(self, gateway: PaymentGateway, session_factory=SessionLocal, workers: int = PAYMENT_WORKERS,
+                 maxsize: int = PAYMENT_QUEUE_SIZE, batch_size: int = PAYMENT_WRITE_BATCH,
+                 write_interval: float = PAYMENT_WRITE_INTERVAL_MS / 1000,
+                 stale_after: float = PAYMENT_STALE_SECONDS, sweep_interval: float = PAYMENT_SWEEP_SECONDS):
+        self.gateway = gateway
+        self.session_factory = session_factory
+        self.workers = workers
+        self.batch_size = batch_size
+        self.write_interval = write_interval
+        self.stale_after = stale_after
+        self.sweep_interval = sweep_interval
+        self._jobs: "queue.Queue[Optional[SettlementJob]]" = queue.Queue(maxsize)
+        self._outcomes: "queue.Queue[Optional[Dict]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._writer: Optional[threading.Thread] = None
+        self._sweeper: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.writes = 0
+        self.rows_written = 0
+        self.write_errors = 0
+
+    def start(self):
+        """Start the workers, the writer and the stale-row sweeper (idempotent; also done on first submit)"""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            self._threads = [
+                threading.Thread(target=self._work, name=f"payment-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            self._writer = threading.Thread(target=self._write, name="payment-writer", daemon=True)
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="payment-sweeper", daemon=True)
+            for thread in self._threads + [self._writer, self._sweeper]:
+                thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Finish queued jobs, flush their outcomes and stop the threads"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            writer, self._writer = self._writer, None
+            sweeper, self._sweeper = self._sweeper, None
+        self._stopping.set()
+        if sweeper is not None:
+            sweeper.join(timeout)
+        for _ in threads:
+            self._jobs.put(None)
+        for thread in threads:
+            thread.join(timeout)
+        if writer is not None:
+            self._outcomes.put(None)
+            writer.join(timeout)
+
+    def ensure_capacity(self):
+        if self._jobs.full():
+            raise PaymentQueueFullError()
+
+    def submit(self, job: SettlementJob) -> bool:
+        """Queue a job for a row that is already committed; never blocks, so it is safe on the event loop
+
+        A job that does not fit stays unsettled in the database and is
+        re-queued by the sweep once it is stale.
+        """
+        self.start()
+        try:
+            self._jobs.put_nowait(job)
+        except queue.Full:
+            return False
+        return True
+
+    def requeue_stale(self) -> int:
+        """Claim unsettled rows untouched for stale_after seconds and queue them; returns how many
+
+        Claims no more rows than the queue has room for. Re-settling a row
+        whose gateway call already went through is safe: the job reuses the
+        payment's idempotency key and the status write is guarded on the
+        unsettled status.
+        """
+        room = self._jobs.maxsize - self._jobs.qsize() if self._jobs.maxsize > 0 else self.batch_size
+        if room <= 0:
+            return 0
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            rows = db.execute(_claim_stale_statement(now - timedelta(seconds=self.stale_after), now, room)).all()
+            db.commit()
+        queued = 0
+        for row in rows:
+            queued += self.submit(SettlementJob.for_payment(row))
+        PAYMENTS_REQUEUED.inc(queued)
+        return queued
+
+    def _sweep_loop(self):
+        # The first sweep runs at startup and settles what a previous process left behind
+        while True:
+            try:
+                self.requeue_stale()
+            except Exception:
+                pass  # database unavailable; the next sweep tries again
+            if self._stopping.wait(self.sweep_interval):
+                return
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            with self._lock:
+                self.in_flight += 1
+            try:
+                PAYMENT_QUEUE_SECONDS.observe(time.perf_counter() - job.queued_at)
+                self._outcomes.put(self._settle(job))
+            except Exception:
+                # One bad job must not take the worker down; its row stays
+                # unsettled and the sweep re-queues it once stale
+                logger.exception("Settling payment %s failed", job.payment_id)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+
+    def _settle(self, job: SettlementJob) -> Dict:
+        start = time.perf_counter()
+        result, error = None, None
+        for attempt in range(PAYMENT_MAX_ATTEMPTS):
+            try:
+                if job.kind == "charge":
+                    result = self.gateway.charge(job.amount, job.method, job.idempotency_key)
+                else:
+                    result = self.gateway.refund(job.transaction_id, job.amount, job.idempotency_key)
+                break
+            except Exception as e:
+                # Transport-level failure; the idempotency key makes the retry safe
+                error = f"Gateway error: {e}"
+                time.sleep(min(2 ** attempt * 0.1, 2.0))
+        PAYMENT_GATEWAY_SECONDS.observe(time.perf_counter() - start)
+        charge = job.kind == "charge"
+        unsettled = "pending" if charge else "refund_pending"
+
+        if result is None:
+            # No definitive answer: keep the row unsettled with the error so
+            # the sweep retries it under the same idempotency key
+            PAYMENTS_DEFERRED.inc()
+            return {
+                "b_id": job.payment_id,
+                "b_from": unsettled,
+                "b_status": unsettled,
+                "b_transaction_id": job.transaction_id,
+                "b_refund_id": None,
+                "b_error": (error or "")[:255],
+                "b_updated_at": datetime.utcnow()
+            }
+
+        succeeded = bool(result.get("success"))
+        (PAYMENTS_SETTLED if succeeded else PAYMENTS_DECLINED).inc()
+        if not succeeded:
+            error = result.get("error") or result.get("message") or "Declined"
+        return {
+            "b_id": job.payment_id,
+            "b_from": unsettled,
+            "b_status": ("completed" if succeeded else "failed") if charge
+                        else ("refunded" if succeeded else "refund_failed"),
+            "b_transaction_id": result.get("transaction_id") if charge and succeeded else job.transaction_id,
+            "b_refund_id": result.get("refund_id") if not charge and succeeded else None,
+            "b_error": None if succeeded else (error or "")[:255],
+            "b_updated_at": datetime.utcnow()
+        }
+
+    def _write(self):
+        statement = _settle_statement()
+        while True:
+            outcome = self._outcomes.get()
+            if outcome is None:
+                return
+            batch = [outcome]
+            deadline = time.monotonic() + self.write_interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    outcome = self._outcomes.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if outcome is None:
+                    stopping = True
+                    break
+                batch.append(outcome)
+            self._flush(statement, batch)
+            if stopping:
+                return
+
+    def _flush(self, statement, batch: List[Dict]):
+        for attempt in range(PAYMENT_MAX_ATTEMPTS):
+            try:
+                with self.session_factory() as db:
+                    db.execute(statement, batch)
+                    db.commit()
+                break
+            except Exception:
+                # Rows stay in their unsettled state and the sweep re-queues them once stale
+                self.write_errors += 1
+                time.sleep(min(2 ** attempt * 0.1, 2.0))
+        else:
+            return
+        self.writes += 1
+        self.rows_written += len(batch)
+        PAYMENT_WRITE_BATCH_ROWS.observe(len(batch))
+
+    def stats(self) -> Dict:
+        return {
+            "gateway": type(self.gateway).__name__,
+            "workers": self.workers,
+            "queued": self._jobs.qsize(),
+            "in_flight": self.in_flight,
+            "pending_writes": self._outcomes.qsize(),
+            "status_writes": self.writes,
+            "rows_written": self.rows_written,
+            "write_errors": self.write_errors,
+            "accepted": PAYMENTS_ACCEPTED.value,
+            "replayed": PAYMENTS_REPLAYED.value,
+            "settled": PAYMENTS_SETTLED.value,
+            "declined": PAYMENTS_DECLINED.value,
+            "deferred": PAYMENTS_DEFERRED.value,
+            "requeued": PAYMENTS_REQUEUED.value
+        }
+
+payment_queue = PaymentQueue(get_gateway())
+
+def _check_replay(existing: Payment, payment: PaymentCreate):
+    if (existing.booking_id, existing.amount, existing.method) != (payment.booking_id, payment.amount, payment.method):
+        raise IdempotencyKeyReusedError("Idempotency-Key was already used for a different payment")
+    PAYMENTS_REPLAYED.inc()
+
+def _find_by_key_statement(idempotency_key: str):
+    return select(Payment).where(Payment.idempotency_key == idempotency_key)
+
+def _new_payment(payment: PaymentCreate, idempotency_key: str) -> Payment:
+    return Payment(
+        booking_id=payment.booking_id,
+        amount=payment.amount,
+        method=payment.method,
+        status="pending",
+        idempotency_key=idempotency_key,
+        timestamp=datetime.utcnow()
+    )
+
+def accept_payment(db, payment: PaymentCreate, idempotency_key: str) -> Optional[Tuple[Payment, bool]]:
+    """(payment, created) for a POST /payment, or None when the booking does not exist
+
+    A retry with the same key costs one SELECT and returns the original row.
+    """
+    existing = db.execute(_find_by_key_statement(idempotency_key)).scalar_one_or_none()
+    if existing is not None:
+        _check_replay(existing, payment)
+        return existing, False
+    if db.get(Booking, payment.booking_id) is None:
+        return None
+    payment_queue.ensure_capacity()
+    row = _new_payment(payment, idempotency_key)
+    db.add(row)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent retry with the same key inserted first
+        db.rollback()
+        existing = db.execute(_find_by_key_statement(idempotency_key)).scalar_one()
+        _check_replay(existing, payment)
+        return existing, False
+    PAYMENTS_ACCEPTED.inc()
+    payment_queue.submit(SettlementJob.for_payment(row))
+    return row, True
+
+async def accept_payment_async(db, payment: PaymentCreate, idempotency_key: str) -> Optional[Tuple[Payment, bool]]:
+    existing = (await db.execute(_find_by_key_statement(idempotency_key))).scalar_one_or_none()
+    if existing is not None:
+        _check_replay(existing, payment)
+        return existing, False
+    if await db.get(Booking, payment.booking_id) is None:
+        return None
+    payment_queue.ensure_capacity()
+    row = _new_payment(payment, idempotency_key)
+    db.add(row)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        existing = (await db.execute(_find_by_key_statement(idempotency_key))).scalar_one()
+        _check_replay(existing, payment)
+        return existing, False
+    PAYMENTS_ACCEPTED.inc()
+    payment_queue.submit(SettlementJob.for_payment(row))
+    return row, True
+
+def _refund_statement(payment_id: int):
+    return (
+        update(Payment)
+        .where(Payment.id == payment_id, Payment.status.in_(REFUNDABLE_STATUSES))
+        .values(status="refund_pending", error=None, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+def _check_refundable(payment: Payment) -> bool:
+    """True when a refund must be started; False when one already is (a no-op retry)"""
+    if payment.status in ("refund_pending", "refunded"):
+        return False
+    if payment.status not in REFUNDABLE_STATUSES:
+        raise PaymentStateError(f"Payment is {payment.status}; only completed payments can be refunded")
+    payment_queue.ensure_capacity()
+    return True
+
+def request_refund(db, payment_id: int) -> Optional[Payment]:
+    """Move a completed payment to refund_pending and queue the refund (None when not found)"""
+    payment = db.get(Payment, payment_id)
+    if payment is None:
+        return None
+    if _check_refundable(payment):
+        started = db.execute(_refund_statement(payment_id)).rowcount
+        db.commit()
+        db.refresh(payment)
+        if started:
+            payment_queue.submit(SettlementJob.for_payment(payment))
+    return payment
+
+async def request_refund_async(db, payment_id: int) -> Optional[Payment]:
+    payment = await db.get(Payment, payment_id)
+    if payment is None:
+        return None
+    if _check_refundable(payment):
+        started = (await db.execute(_refund_statement(payment_id))).rowcount
+        await db.commit()
+        await db.refresh(payment)
+        if started:
+            payment_queue.submit(SettlementJob.for_payment(payment))
+    return payment
+
+def payment_status(payment: Payment) -> Dict:
+    return {
+        "payment_id": payment.id,
+        "booking_id": payment.booking_id,
+        "amount": payment.amount,
+        "method": payment.method,
+        "status": payment.status,
+        "settled": payment.status not in UNSETTLED_STATUSES,
+        "transaction_id": payment.transaction_id,
+        "refund_id": payment.refund_id,
+        "error": payment.error,
+        "created_at": payment.timestamp.isoformat() if payment.timestamp else None,
+        "updated_at": payment.updated_at.isoformat() if payment.updated_at else None
+    }
+
+def payment_receipt(payment: Payment, created: bool) -> Tuple[int, Dict, Dict[str, str]]:
+    """(status code, body, headers) answering POST /payment"""
+    body = {"message": "Payment accepted" if created else "Payment already submitted", **payment_status(payment)}
+    headers = {"Location": f"/payment/{payment.id}"}
+    if not created:
+        headers["Idempotent-Replayed"] = "true"
+    return (202 if payment.status in UNSETTLED_STATUSES else 200), body, headers
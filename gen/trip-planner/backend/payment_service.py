@@ -1,6 +1,14 @@
+import importlib
+import os
 import random
+import time
 from typing import Dict
 
+from cache import TTLCache
+
+PAYMENT_GATEWAY = os.getenv("PAYMENT_GATEWAY", "simulated")  # simulated | module:Class
+PAYMENT_GATEWAY_LATENCY_MS = float(os.getenv("PAYMENT_GATEWAY_LATENCY_MS", "0"))
+
 def process_payment(amount: float, method: str) -> Dict:
     """Simulate payment processing with Stripe"""
     
@@ -26,4 +34,57 @@ def refund_payment(transaction_id: str, amount: float) -> Dict:
         "success": True,
         "refund_id": f"ref_{random.randint(100000, 999999)}",
         "message": f"Refund of ${amount} processed successfully"
-    }
\ No newline at end of file
+    }
+
+class PaymentGateway:
+    """What the settlement workers call to move money
+
+    Implementations must be thread-safe and idempotent: a payment can be
+    resubmitted with the same key after a crash and must not be charged
+    twice. PAYMENT_GATEWAY="package.module:ClassName" plugs in a real one.
+    """
+
+    name = ""
+
+    def charge(self, amount: float, method: str, idempotency_key: str) -> Dict:
+        """{"success": True, "transaction_id": ...} or {"success": False, "error": ...}"""
+        raise NotImplementedError
+
+    def refund(self, transaction_id: str, amount: float, idempotency_key: str) -> Dict:
+        """{"success": True, "refund_id": ...} or {"success": False, "error": ...}"""
+        raise NotImplementedError
+
+class SimulatedGateway(PaymentGateway):
+    """Local fake over process_payment/refund_payment with a configurable delay"""
+
+    name = "simulated"
+
+    def __init__(self, latency_ms: float = PAYMENT_GATEWAY_LATENCY_MS):
+        self.latency = latency_ms / 1000
+        # Remembers outcomes per idempotency key, as a real gateway would
+        self._outcomes = TTLCache(maxsize=100000, ttl=86400)
+
+    def charge(self, amount: float, method: str, idempotency_key: str) -> Dict:
+        return self._once(idempotency_key, lambda: process_payment(amount, method))
+
+    def refund(self, transaction_id: str, amount: float, idempotency_key: str) -> Dict:
+        return self._once(idempotency_key, lambda: refund_payment(transaction_id, amount))
+
+    def _once(self, idempotency_key: str, call) -> Dict:
+        outcome = self._outcomes.get(idempotency_key)
+        if outcome is None:
+            time.sleep(self.latency)
+            outcome = call()
+            self._outcomes.set(idempotency_key, outcome)
+        return outcome
+
+GATEWAYS = {SimulatedGateway.name: SimulatedGateway}
+
+def get_gateway(name: str = PAYMENT_GATEWAY) -> PaymentGateway:
+    """Gateway by registered name or "module:Class" import path"""
+    if name in GATEWAYS:
+        return GATEWAYS[name]()
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown payment gateway {name!r}; expected one of {sorted(GATEWAYS)} or module:Class")
+    return getattr(importlib.import_module(module_name), class_name)()
@@ -0,0 +1,258 @@
+import asyncio
+import concurrent.futures
+import os
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+
+import httpx
+
+from insights_cache import InsightsCache
+
+# Upstream data providers; unset URLs keep the planner on simulated data.
+# stubs/provider_stub.py serves both APIs locally.
+WEATHER_API_URL = os.getenv("WEATHER_API_URL")
+WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
+EVENTS_API_URL = os.getenv("EVENTS_API_URL")
+EVENTS_API_KEY = os.getenv("EVENTS_API_KEY")
+CROWDS_API_URL = os.getenv("CROWDS_API_URL")
+CROWDS_API_KEY = os.getenv("CROWDS_API_KEY")
+PRICES_API_URL = os.getenv("PRICES_API_URL")
+PRICES_API_KEY = os.getenv("PRICES_API_KEY")
+
+PROVIDER_TIMEOUT = float(os.getenv("PROVIDER_TIMEOUT", "2"))
+PROVIDER_MAX_CONNECTIONS = int(os.getenv("PROVIDER_MAX_CONNECTIONS", "100"))
+PROVIDER_MAX_KEEPALIVE = int(os.getenv("PROVIDER_MAX_KEEPALIVE", "20"))
+PROVIDER_KEEPALIVE_EXPIRY = float(os.getenv("PROVIDER_KEEPALIVE_EXPIRY", "30"))
+
+# Seconds each signal stays fresh; INSIGHTS_TTLS="weather=600,events=3600" overrides
+INSIGHTS_TTLS = {"weather": 900.0, "events": 21600.0, "crowds": 1800.0, "prices": 3600.0}
+for _override in filter(None, os.getenv("INSIGHTS_TTLS", "").split(",")):
+    _signal, _, _seconds = _override.partition("=")
+    INSIGHTS_TTLS[_signal.strip()] = float(_seconds)
+# Past its TTL an entry is served stale for up to this fraction of the TTL while it refreshes
+INSIGHTS_STALE_RATIO = float(os.getenv("INSIGHTS_STALE_RATIO", "1.0"))
+INSIGHTS_CACHE_SIZE = int(os.getenv("INSIGHTS_CACHE_SIZE", "4096"))
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+# Loop the app's client lives on; sync callers in worker threads borrow it
+_app_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(PROVIDER_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=PROVIDER_MAX_CONNECTIONS,
+            max_keepalive_connections=PROVIDER_MAX_KEEPALIVE,
+            keepalive_expiry=PROVIDER_KEEPALIVE_EXPIRY
+        ),
+        headers={"User-Agent": "trip-planner/1.0"}
+    )
+
+async def start_providers():
+    """Open the shared client (app startup)"""
+    global _app_loop
+    _app_loop = asyncio.get_running_loop()
+    get_client()
+
+async def stop_providers():
+    """Close the shared client and its pooled connections (app shutdown)"""
+    global _client, _client_loop, _app_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = _client_loop = _app_loop = None
+
+def get_client() -> httpx.AsyncClient:
+    """The pooled client for the running event loop
+
+    In the app this is always the lifespan client. Scripts that run several
+    event loops get a fresh client per loop, since pooled connections
+    cannot move between loops.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client, _client_loop = _build_client(), loop
+    return _client
+
+class Coalescer:
+    """Concurrent calls with the same key share one in-flight fetch"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, fetch: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        # A waiter timing out must not cancel the fetch the others share
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so abandoned failures are not logged as unhandled
+
+class Provider:
+    """One upstream HTTP API behind the shared client
+
+    Subclasses set path and parse(); a production adapter overrides
+    params()/headers() for its API's auth and query format.
+    """
+
+    name = ""
+    path = "/"
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.coalescer = Coalescer()
+        self.requests = 0
+        self.errors = 0
+
+    def params(self, destination: str) -> Dict:
+        return {"city": destination}
+
+    def headers(self) -> Dict:
+        return {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+    def parse(self, payload: Dict):
+        return payload
+
+    async def fetch(self, destination: str):
+        destination = " ".join(destination.lower().split())
+        return await self.coalescer.run(destination, lambda: self._get(destination))
+
+    async def _get(self, destination: str):
+        self.requests += 1
+        try:
+            response = await get_client().get(
+                self.base_url + self.path, params=self.params(destination), headers=self.headers()
+            )
+            response.raise_for_status()
+            return self.parse(response.json())
+        except (httpx.HTTPError, ValueError, KeyError):
+            self.errors += 1
+            raise
+
+    def stats(self) -> Dict:
+        return {
+            "base_url": self.base_url,
+            "upstream_requests": self.requests,
+            "coalesced": self.coalescer.coalesced,
+            "errors": self.errors
+        }
+
+class WeatherProvider(Provider):
+    """Current conditions: {"condition": "rainy", "temperature": 18, "humidity": 70}"""
+
+    name = "weather"
+    path = "/weather"
+
+    def parse(self, payload: Dict) -> Dict:
+        return {
+            "condition": str(payload["condition"]).lower(),
+            "temperature": payload.get("temperature"),
+            "humidity": payload.get("humidity")
+        }
+
+class EventsProvider(Provider):
+    """Upcoming local events, most relevant first"""
+
+    name = "events"
+    path = "/events"
+
+    def parse(self, payload: Dict) -> List[str]:
+        return [event["name"] for event in payload["events"]]
+
+class CrowdsProvider(Provider):
+    """Expected crowd level: Low | Medium | High"""
+
+    name = "crowds"
+    path = "/crowds"
+
+    levels = ("Low", "Medium", "High")
+
+    def parse(self, payload: Dict) -> str:
+        level = str(payload["level"]).capitalize()
+        if level not in self.levels:
+            raise ValueError(f"unknown crowd level {payload['level']!r}")
+        return level
+
+class PricesProvider(Provider):
+    """Price trend: Increasing | Stable | Decreasing"""
+
+    name = "prices"
+    path = "/prices"
+
+    trends = ("Increasing", "Stable", "Decreasing")
+
+    def parse(self, payload: Dict) -> str:
+        trend = str(payload["trend"]).capitalize()
+        if trend not in self.trends:
+            raise ValueError(f"unknown price trend {payload['trend']!r}")
+        return trend
+
+PROVIDERS: Dict[str, Provider] = {}
+for _provider_class, _url, _key in (
+    (WeatherProvider, WEATHER_API_URL, WEATHER_API_KEY),
+    (EventsProvider, EVENTS_API_URL, EVENTS_API_KEY),
+    (CrowdsProvider, CROWDS_API_URL, CROWDS_API_KEY),
+    (PricesProvider, PRICES_API_URL, PRICES_API_KEY)
+):
+    if _url:
+        PROVIDERS[_provider_class.name] = _provider_class(_url, _key)
+
+# Destination facts change slowly, so one upstream fetch per signal, city and TTL window
+insights_cache = InsightsCache(INSIGHTS_TTLS, stale_ratio=INSIGHTS_STALE_RATIO, maxsize=INSIGHTS_CACHE_SIZE)
+
+async def fetch_signals(destination: str) -> Dict:
+    """Live signals for a destination, fetched concurrently; failures are left out"""
+    if not PROVIDERS:
+        return {}
+    destination = " ".join(destination.lower().split())
+    names = list(PROVIDERS)
+    results = await asyncio.gather(
+        *(insights_cache.get(name, destination, lambda name=name: PROVIDERS[name].fetch(destination))
+          for name in names),
+        return_exceptions=True
+    )
+    return {name: result for name, result in zip(names, results) if not isinstance(result, BaseException)}
+
+def run_on_app_loop(make_coro: Callable[[], Awaitable], timeout: float, default=None):
+    """Run a coroutine on the app's event loop from sync code in a worker thread
+
+    Sharing the app loop keeps pooled clients and coalescing shared. Without
+    a running app loop (scripts), when called from the loop itself, or after
+    timeout seconds, returns default instead.
+    """
+    if _app_loop is None or not _app_loop.is_running():
+        return default
+    try:
+        if asyncio.get_running_loop() is _app_loop:
+            return default
+    except RuntimeError:
+        pass  # not on an event loop thread, as expected
+    future = asyncio.run_coroutine_threadsafe(make_coro(), _app_loop)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        return default
+
+def fetch_signals_sync(destination: str) -> Dict:
+    """fetch_signals for sync code running in a worker thread; {} when unavailable"""
+    if not PROVIDERS:
+        return {}
+    return run_on_app_loop(lambda: fetch_signals(destination), PROVIDER_TIMEOUT + 1, {})
+
+def provider_stats() -> Dict:
+    return {
+        "providers": {name: provider.stats() for name, provider in PROVIDERS.items()},
+        "insights_cache": insights_cache.stats()
+    }
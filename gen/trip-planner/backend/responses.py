@@ -0,0 +1,122 @@
+import gzip
+import os
+from typing import Callable, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import orjson  # noqa: F401  (ORJSONResponse needs it)
+except ImportError:
+    orjson = None
+
+try:
+    import brotli  # optional dependency; without it only gzip is offered
+except ImportError:
+    brotli = None
+
+JSON_RESPONSE = os.getenv("JSON_RESPONSE", "orjson")  # orjson | json
+# Offered in this order of preference when the client accepts several equally
+RESPONSE_COMPRESSION = [e.strip() for e in os.getenv("RESPONSE_COMPRESSION", "br,gzip").split(",") if e.strip()]
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+# orjson is several times faster than json.dumps and serializes datetimes
+# itself; stdlib json stays available as the fallback
+JSONResponseClass = ORJSONResponse if JSON_RESPONSE == "orjson" and orjson is not None else JSONResponse
+
+def json_response(content, status_code: int = 200, headers: Optional[Dict[str, str]] = None):
+    """Response for a body that is already plain JSON data, skipping FastAPI's jsonable_encoder pass
+
+    Returning a Response from an endpoint bypasses response_model handling
+    too, so headers set on an injected Response must be passed here.
+    """
+    if JSONResponseClass is JSONResponse:
+        content = jsonable_encoder(content)
+    return JSONResponseClass(content, status_code=status_code, headers=headers)
+
+# Mid-range levels: most of the size win for a fraction of the CPU of the maximum
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {"gzip": lambda body: gzip.compress(body, compresslevel=6)}
+if brotli is not None:
+    ENCODERS["br"] = lambda body: brotli.compress(body, quality=4)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+def negotiate_encoding(accept_encoding: str, offered: List[str]) -> Optional[str]:
+    """Best of offered for an Accept-Encoding header; ties go to the earlier offer"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            weights[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in offered:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+class CompressionMiddleware:
+    """br/gzip for complete JSON and text responses of at least minimum_size bytes
+
+    Streaming responses (more than one body message) pass through as-is so
+    NDJSON/SSE events are not held back. Strong ETags are weakened on
+    compressed responses since the bytes differ from the identity encoding.
+    """
+
+    def __init__(self, app, encodings: List[str] = RESPONSE_COMPRESSION, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.encodings = [encoding for encoding in encodings if encoding in ENCODERS]
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.encodings:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message  # held until the first body shows whether to compress
+                return
+            if start_message is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            if message.get("more_body", False) or not self._compressible(start["status"], headers, body):
+                await send(start)
+                await send(message)
+                return
+            body = ENCODERS[encoding](body)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compressible(self, status: int, headers: MutableHeaders, body: bytes) -> bool:
+        return (
+            len(body) >= self.minimum_size
+            and status not in (204, 206, 304)
+            and "content-encoding" not in headers
+            and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+        )
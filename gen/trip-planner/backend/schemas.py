@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, Dict, List
 from datetime import datetime
 
@@ -24,6 +24,9 @@ class TripCreate(BaseModel):
     destination: str
     duration: int
 
+class TripBatchCreate(BaseModel):
+    trips: List[TripCreate] = Field(..., min_length=1)
+
 class TripResponse(BaseModel):
     id: int
     destination: str
@@ -45,10 +48,22 @@ class ItineraryResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class TripDetailResponse(BaseModel):
+    trip: TripResponse
+    itinerary: List[ItineraryResponse]
+
+class ItineraryOptimizeRequest(BaseModel):
+    trip_ids: List[int] = Field(..., min_length=1)
+
 class BookingCreate(BaseModel):
     trip_id: int
     item_type: str
     item_id: str
+    quantity: int = Field(1, ge=1, le=50)
+    hold: bool = False  # reserve for BOOKING_HOLD_SECONDS; confirm with POST /book/{id}/confirm
+
+class InventoryUpdate(BaseModel):
+    capacity: int = Field(..., ge=0)
 
 class PaymentCreate(BaseModel):
     booking_id: int
@@ -0,0 +1,379 @@
+"""Pluggable activity selection for GenAITripPlanner
+
+Every strategy fills the same slots: one per enabled preference per day,
+each holding an activity from that preference's pool or staying empty (a
+day with nothing gets the default city exploration).
+
+- greedy / vectorized: random affordable picks under budget / duration per
+  day, then the blanket over-budget discount (the original behaviour)
+- knapsack / local_search: maximize a preference-weighted score with each
+  day capped at DAILY_FLEX x budget / duration and the trip at budget
+
+A pick scores weight(preference) x value(activity), where value is the
+catalog "score" field (default 1 + cost / 100). Repeats decay: the n-th
+use of the same activity is worth REPEAT_DECAY ** (n - 1) of the first.
+"""
+import math
+import os
+import random
+import time
+from itertools import chain
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from activity_catalog import ActivityPool
+from vectorized_selection import VectorizedSelection
+
+DAILY_FLEX = float(os.getenv("PLANNER_DAILY_FLEX", "1.5"))
+REPEAT_DECAY = float(os.getenv("PLANNER_REPEAT_DECAY", "0.8"))
+LOCAL_SEARCH_TIME_BUDGET = float(os.getenv("PLANNER_TIME_BUDGET_MS", "50")) / 1000
+# Budget resolution for the DP table; coarser cells trade optimality for speed
+KNAPSACK_MAX_CELLS = 2048
+
+DEFAULT_ACTIVITY_COST = 30
+
+def activity_value(activity: Dict) -> float:
+    return activity.get("score", 1 + activity["cost"] / 100)
+
+def activity_item(day: int, activity: Dict, destination: str, weather: str) -> Dict:
+    return {
+        "day": day,
+        "activity": activity["name"],
+        "location": f"{destination} - AI Optimized Route",
+        "cost": activity["cost"],
+        "ai_enhanced": activity.get("ai_enhanced", False),
+        "weather_adapted": weather in activity["name"].lower()
+    }
+
+def default_item(day: int, destination: str, cost: float) -> Dict:
+    return {
+        "day": day,
+        "activity": f"AI-Curated {destination} Exploration",
+        "location": f"{destination} City Center",
+        "cost": cost,
+        "ai_enhanced": True,
+        "weather_adapted": True
+    }
+
+def apply_discounts(activities: List[Dict]):
+    for activity in activities:
+        if activity["cost"] > 50:
+            activity["cost"] = int(activity["cost"] * 0.85)  # AI negotiated discount
+            activity["ai_optimized"] = True
+
+def fit_to_budget(activities: List[Dict], budget: float) -> List[Dict]:
+    """Blanket discount when a plan overshoots its budget"""
+    if sum(activity["cost"] for activity in activities) > budget:
+        apply_discounts(activities)
+    return activities
+
+class SelectionRequest:
+    """Inputs shared by all strategies for one plan"""
+
+    __slots__ = ("destination", "duration", "budget", "weather", "slots")
+
+    def __init__(self, destination: str, duration: int, budget: float, weather: str,
+                 pools: Dict[str, ActivityPool], preferences: Dict, weights: Dict[str, float]):
+        self.destination = destination
+        self.duration = duration
+        self.budget = budget
+        self.weather = weather
+        # (preference, pool, weight) in preference order; empty pools never pick
+        self.slots: List[Tuple[str, ActivityPool, float]] = [
+            (pref, pools[pref], weights.get(pref, 1.0))
+            for pref, is_enabled in preferences.items()
+            if is_enabled and pref in pools
+        ]
+
+    @property
+    def daily_budget(self) -> float:
+        return self.budget / self.duration
+
+    @property
+    def default_cost(self) -> float:
+        return min(DEFAULT_ACTIVITY_COST, self.daily_budget)
+
+def score_itinerary(itinerary: List[Dict], request: SelectionRequest) -> float:
+    """Objective value of a finished plan, for comparing strategies"""
+    values = {}
+    for _, pool, weight in reversed(request.slots):
+        for activity in pool.activities:
+            values[activity["name"]] = weight * activity_value(activity)
+    uses: Dict[str, int] = {}
+    score = 0.0
+    for item in itinerary:
+        value = values.get(item["activity"])
+        if value is None:
+            continue
+        uses[item["activity"]] = uses.get(item["activity"], 0) + 1
+        score += value * REPEAT_DECAY ** (uses[item["activity"]] - 1)
+    return score
+
+class SelectionStrategy:
+    """Chooses the activities for every day of a trip"""
+
+    name = ""
+
+    def iter_days(self, request: SelectionRequest, rng: random.Random) -> Iterator[List[Dict]]:
+        """Yield one day's activities at a time"""
+        raise NotImplementedError
+
+    def plan(self, request: SelectionRequest, rng: random.Random) -> List[Dict]:
+        """The whole itinerary, fitted to the budget"""
+        return fit_to_budget(list(chain.from_iterable(self.iter_days(request, rng))), request.budget)
+
+class GreedyStrategy(SelectionStrategy):
+    """Random affordable pick per preference, day by day"""
+
+    name = "greedy"
+
+    def iter_days(self, request: SelectionRequest, rng: random.Random) -> Iterator[List[Dict]]:
+        daily_budget = request.daily_budget
+        for day in range(1, request.duration + 1):
+            day_activities = []
+            remaining_budget = daily_budget
+            for _, pool, _ in request.slots:
+                if remaining_budget <= 0:
+                    break
+                available_activities = pool.affordable(remaining_budget)
+                if available_activities:
+                    activity = rng.choice(available_activities)
+                    day_activities.append(activity_item(day, activity, request.destination, request.weather))
+                    remaining_budget -= activity["cost"]
+            if not day_activities:
+                day_activities.append(
+                    default_item(day, request.destination, min(DEFAULT_ACTIVITY_COST, remaining_budget))
+                )
+            yield day_activities
+
+class VectorizedStrategy(SelectionStrategy):
+    """Greedy's distribution, drawn for all days at once with NumPy"""
+
+    name = "vectorized"
+
+    def _select(self, request: SelectionRequest, rng: random.Random) -> VectorizedSelection:
+        # The NumPy generator is seeded from rng so seeded plans stay reproducible
+        generator = np.random.default_rng(rng.getrandbits(64))
+        pools = {pref: pool for pref, pool, _ in request.slots}
+        return VectorizedSelection(pools, dict.fromkeys(pools, True), request.duration, request.budget, generator)
+
+    def iter_days(self, request: SelectionRequest, rng: random.Random) -> Iterator[List[Dict]]:
+        yield from self._select(request, rng).iter_days(request.destination, request.weather)
+
+    def plan(self, request: SelectionRequest, rng: random.Random) -> List[Dict]:
+        selection = self._select(request, rng)
+        selection.apply_discount(request.budget)
+        return list(chain.from_iterable(selection.iter_days(request.destination, request.weather)))
+
+# A day's picks: one activity (or None) per slot
+DayPicks = Tuple[Optional[Dict], ...]
+
+class _OptimizingStrategy(SelectionStrategy):
+    """Solves the whole trip up front, then streams the solved days"""
+
+    def __init__(self, daily_flex: float = DAILY_FLEX):
+        self.daily_flex = daily_flex
+
+    def daily_cap(self, request: SelectionRequest) -> float:
+        return request.daily_budget * self.daily_flex
+
+    def solve(self, request: SelectionRequest, rng: random.Random) -> List[DayPicks]:
+        raise NotImplementedError
+
+    def iter_days(self, request: SelectionRequest, rng: random.Random) -> Iterator[List[Dict]]:
+        for day, picks in enumerate(self.solve(request, rng), start=1):
+            day_activities = [
+                activity_item(day, activity, request.destination, request.weather)
+                for activity in picks if activity is not None
+            ]
+            yield day_activities or [default_item(day, request.destination, request.default_cost)]
+
+    def plan(self, request: SelectionRequest, rng: random.Random) -> List[Dict]:
+        # Solutions respect the budget already, so no discount pass
+        return list(chain.from_iterable(self.iter_days(request, rng)))
+
+def _pareto(options: List[Tuple[float, float, DayPicks]]) -> List[Tuple[float, float, DayPicks]]:
+    """Drop options that cost more without scoring more"""
+    frontier, best = [], -math.inf
+    for option in sorted(options, key=lambda o: (o[0], -o[1])):
+        if option[1] > best:
+            frontier.append(option)
+            best = option[1]
+    return frontier
+
+class KnapsackStrategy(_OptimizingStrategy):
+    """Bounded DP over (day, budget) on each day's Pareto-optimal options
+
+    Exact for the budget constraints up to the table resolution, but it
+    scores every day independently, so repeat decay is ignored while
+    solving; local_search refines its plans against the full objective.
+    """
+
+    name = "knapsack"
+
+    def day_options(self, request: SelectionRequest) -> List[Tuple[float, float, DayPicks]]:
+        cap = self.daily_cap(request)
+        frontier: List[Tuple[float, float, DayPicks]] = [(0.0, 0.0, ())]
+        for _, pool, weight in request.slots:
+            merged = []
+            for cost, score, picks in frontier:
+                merged.append((cost, score, picks + (None,)))
+                # Like greedy, only pick while some of the day's budget is left
+                for activity in pool.affordable(cap - cost) if cost < cap else ():
+                    merged.append((
+                        cost + activity["cost"], score + weight * activity_value(activity), picks + (activity,)
+                    ))
+            frontier = _pareto(merged)
+        # An empty day still costs the default exploration
+        return _pareto([
+            (cost if any(picks) else request.default_cost, score, picks) for cost, score, picks in frontier
+        ])
+
+    def solve(self, request: SelectionRequest, rng: random.Random) -> List[DayPicks]:
+        options = self.day_options(request)
+        budget = max(request.budget, 0.0)
+        # Whole-dollar catalog costs share a common step (often 5), which
+        # keeps the table exact and small
+        step = 1
+        if all(float(cost).is_integer() for cost, _, _ in options):
+            step = math.gcd(*(int(cost) for cost, _, _ in options)) or 1
+        unit = max(float(step), budget / KNAPSACK_MAX_CELLS)
+        cells = int(budget // unit)
+        # Round option costs up to whole cells so every solution is feasible
+        units = np.array([math.ceil(cost / unit - 1e-9) for cost, _, _ in options], dtype=np.intp)
+        scores = np.array([score for _, score, _ in options])
+
+        # best[b]: max score of the days so far using at most b cells
+        best = np.zeros(cells + 1)
+        source = np.arange(cells + 1)[None, :] - units[:, None]
+        option_scores = np.where(source >= 0, scores[:, None], -np.inf)
+        source = np.maximum(source, 0)
+        choices = np.empty((request.duration, cells + 1), dtype=np.intp)
+        columns = np.arange(cells + 1)
+        for day in range(request.duration):
+            candidates = best[source] + option_scores
+            choice = candidates.argmax(axis=0)
+            best = candidates[choice, columns]
+            choices[day] = choice
+
+        if not np.isfinite(best[cells]):
+            # Not even the default day fits the budget table
+            return [(None,) * len(request.slots)] * request.duration
+        plan, remaining = [], cells
+        for day in range(request.duration - 1, -1, -1):
+            option = choices[day, remaining]
+            plan.append(options[option][2])
+            remaining -= units[option]
+        plan.reverse()
+        return plan
+
+class LocalSearchStrategy(_OptimizingStrategy):
+    """Hill climbing from the knapsack plan against the full objective
+
+    Moves swap one slot to another activity (or empty it) or exchange a
+    slot between two days. Stops after iterations_per_slot moves per slot
+    or time_budget seconds (including the starting solve), whichever comes
+    first; only the iteration cap keeps seeded plans reproducible, so size
+    the time budget as a guard.
+    """
+
+    name = "local_search"
+
+    def __init__(self, daily_flex: float = DAILY_FLEX, time_budget: float = LOCAL_SEARCH_TIME_BUDGET,
+                 iterations_per_slot: int = 20, start: Optional[_OptimizingStrategy] = None):
+        super().__init__(daily_flex)
+        self.time_budget = time_budget
+        self.iterations_per_slot = iterations_per_slot
+        self.start = start or KnapsackStrategy(daily_flex)
+
+    def solve(self, request: SelectionRequest, rng: random.Random) -> List[DayPicks]:
+        # The time budget covers the starting solve too
+        deadline = time.perf_counter() + self.time_budget
+        plan = [list(picks) for picks in self.start.solve(request, rng)]
+        if not request.slots or not plan:
+            return [tuple(picks) for picks in plan]
+        cap = self.daily_cap(request)
+        default_cost = request.default_cost
+
+        def day_cost(picks: Sequence[Optional[Dict]]) -> float:
+            cost = sum(activity["cost"] for activity in picks if activity is not None)
+            return cost if any(picks) else default_cost
+
+        uses: Dict[int, int] = {}
+        for picks in plan:
+            for activity in picks:
+                if activity is not None:
+                    uses[id(activity)] = uses.get(id(activity), 0) + 1
+        costs = [day_cost(picks) for picks in plan]
+        total = sum(costs)
+
+        def gain(activity: Optional[Dict], weight: float, count: int) -> float:
+            # Marginal value of the (count + 1)-th use
+            return 0.0 if activity is None else weight * activity_value(activity) * REPEAT_DECAY ** count
+
+        iterations = self.iterations_per_slot * len(plan) * len(request.slots)
+        for iteration in range(iterations):
+            if iteration % 256 == 0 and time.perf_counter() > deadline:
+                break
+            day = rng.randrange(len(plan))
+            slot = rng.randrange(len(request.slots))
+            _, pool, weight = request.slots[slot]
+            current = plan[day][slot]
+
+            if rng.random() < 0.25:
+                # Exchange: score-neutral, but frees budget on a tight day
+                other = rng.randrange(len(plan))
+                if other == day or plan[other][slot] is current:
+                    continue
+                first, second = list(plan[day]), list(plan[other])
+                first[slot], second[slot] = second[slot], first[slot]
+                first_cost, second_cost = day_cost(first), day_cost(second)
+                if first_cost > cap or second_cost > cap:
+                    continue
+                new_total = total - costs[day] - costs[other] + first_cost + second_cost
+                if new_total > request.budget:
+                    continue
+                plan[day], plan[other] = first, second
+                costs[day], costs[other], total = first_cost, second_cost, new_total
+                continue
+
+            candidate = rng.choice(pool.activities) if pool.activities and rng.random() < 0.9 else None
+            if candidate is current:
+                continue
+            picks = list(plan[day])
+            picks[slot] = candidate
+            new_cost = day_cost(picks)
+            new_total = total - costs[day] + new_cost
+            if new_cost > cap or new_total > request.budget:
+                continue
+            delta = gain(candidate, weight, uses.get(id(candidate), 0))
+            if current is not None:
+                delta -= gain(current, weight, uses[id(current)] - 1)
+            if delta < 0:
+                continue
+            if current is not None:
+                uses[id(current)] -= 1
+            if candidate is not None:
+                uses[id(candidate)] = uses.get(id(candidate), 0) + 1
+            plan[day] = picks
+            costs[day], total = new_cost, new_total
+        return [tuple(picks) for picks in plan]
+
+STRATEGIES: Dict[str, SelectionStrategy] = {}
+
+def register_strategy(strategy: SelectionStrategy) -> SelectionStrategy:
+    """Make a strategy available by name (PLANNER_STRATEGY, GenAITripPlanner(strategy=...))"""
+    STRATEGIES[strategy.name] = strategy
+    return strategy
+
+for _strategy in (GreedyStrategy(), VectorizedStrategy(), KnapsackStrategy(), LocalSearchStrategy()):
+    register_strategy(_strategy)
+
+def get_strategy(strategy: Union[str, SelectionStrategy]) -> SelectionStrategy:
+    if isinstance(strategy, SelectionStrategy):
+        return strategy
+    try:
+        return STRATEGIES[strategy]
+    except KeyError:
+        raise ValueError(f"Unknown planner strategy: {strategy}") from None
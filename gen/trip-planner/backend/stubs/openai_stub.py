@@ -0,0 +1,82 @@
+"""Local stand-in for the OpenAI chat completions API.
+
+Replies are deterministic per prompt. Token counts are words, and
+STUB_LATENCY_MS delays every reply. /stats counts completions and tokens
+so tests can check caching, coalescing and the concurrency limit
+(max_in_flight).
+
+    uvicorn stubs.openai_stub:app --port 8082
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://localhost:8082/v1 uvicorn main:app
+"""
+import asyncio
+import os
+import time
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "200"))
+
+TIPS = [
+    "Start early to beat the queues at the main sights",
+    "Pick up a day transit pass instead of single tickets",
+    "Book popular restaurants a few days ahead",
+    "Keep an indoor backup plan for each afternoon",
+    "Walk between nearby activities to see the side streets",
+    "Try the local market for an inexpensive lunch",
+    "Visit museums on their late-opening evenings",
+    "Carry a refillable water bottle"
+]
+
+class ChatRequest(BaseModel):
+    model: str
+    messages: List[Dict[str, str]]
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+
+app = FastAPI(title="OpenAI stub")
+served = Counter()
+in_flight = 0
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: ChatRequest):
+    global in_flight
+    served["completions"] += 1
+    in_flight += 1
+    served["max_in_flight"] = max(served["max_in_flight"], in_flight)
+    try:
+        await asyncio.sleep(STUB_LATENCY_MS / 1000)
+    finally:
+        in_flight -= 1
+    prompt = "\n".join(message["content"] for message in request.messages)
+    h = zlib.crc32(prompt.encode("utf-8"))
+    text = "\n".join(TIPS[(h + i) % len(TIPS)] for i in range(5))
+    if request.max_tokens:
+        text = " ".join(text.split(" ")[:request.max_tokens])
+    prompt_tokens, completion_tokens = len(prompt.split()), len(text.split())
+    served["prompt_tokens"] += prompt_tokens
+    served["completion_tokens"] += completion_tokens
+    return {
+        "id": f"chatcmpl-{h:08x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+@app.get("/stats")
+def stats():
+    return dict(served)
+
+@app.post("/stats/reset")
+def reset_stats():
+    served.clear()
+    return {}
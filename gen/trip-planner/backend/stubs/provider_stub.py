@@ -0,0 +1,66 @@
+"""Local stand-in for the weather, events, crowds and prices provider APIs.
+
+Responses are deterministic per city. STUB_LATENCY_MS delays every reply,
+and /stats counts requests so tests can check pooling and coalescing.
+
+    uvicorn stubs.provider_stub:app --port 8081
+    WEATHER_API_URL=http://localhost:8081 EVENTS_API_URL=http://localhost:8081 uvicorn main:app
+"""
+import asyncio
+import os
+import zlib
+from collections import Counter
+
+from fastapi import FastAPI
+
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "50"))
+
+CONDITIONS = ["sunny", "rainy", "cloudy", "snowy"]
+EVENTS = ["Jazz Night", "Street Food Market", "Open Air Cinema", "Marathon", "Design Week", "Night Museum"]
+
+app = FastAPI(title="Provider stub")
+served = Counter()
+
+def _city_hash(city: str) -> int:
+    return zlib.crc32(city.lower().encode("utf-8"))
+
+@app.get("/weather")
+async def weather(city: str):
+    served["weather"] += 1
+    await asyncio.sleep(STUB_LATENCY_MS / 1000)
+    h = _city_hash(city)
+    return {
+        "city": city,
+        "condition": CONDITIONS[h % len(CONDITIONS)],
+        "temperature": 5 + h % 25,
+        "humidity": 40 + h % 45
+    }
+
+@app.get("/events")
+async def events(city: str):
+    served["events"] += 1
+    await asyncio.sleep(STUB_LATENCY_MS / 1000)
+    h = _city_hash(city)
+    picks = [EVENTS[(h + i) % len(EVENTS)] for i in range(3)]
+    return {"city": city, "events": [{"name": f"{city.title()} {name}"} for name in picks]}
+
+@app.get("/crowds")
+async def crowds(city: str):
+    served["crowds"] += 1
+    await asyncio.sleep(STUB_LATENCY_MS / 1000)
+    return {"city": city, "level": ["Low", "Medium", "High"][_city_hash(city) % 3]}
+
+@app.get("/prices")
+async def prices(city: str):
+    served["prices"] += 1
+    await asyncio.sleep(STUB_LATENCY_MS / 1000)
+    return {"city": city, "trend": ["Increasing", "Stable", "Decreasing"][_city_hash(city) % 3]}
+
+@app.get("/stats")
+def stats():
+    return dict(served)
+
+@app.post("/stats/reset")
+def reset_stats():
+    served.clear()
+    return {}
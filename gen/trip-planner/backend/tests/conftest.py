@@ -0,0 +1,38 @@
+import os
+import socket
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.common import run_stub, stub_stats  # noqa: E402
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@pytest.fixture(scope="session")
+def provider_server():
+    with run_stub("stubs.provider_stub:app", free_port(), STUB_LATENCY_MS=50) as base_url:
+        yield base_url
+
+@pytest.fixture
+def provider_stub(provider_server):
+    """Base URL of stubs/provider_stub.py with its request counters reset"""
+    stub_stats(provider_server)
+    return provider_server
+
+@pytest.fixture(scope="session")
+def openai_server():
+    with run_stub("stubs.openai_stub:app", free_port(), STUB_LATENCY_MS=100) as base_url:
+        yield base_url
+
+@pytest.fixture
+def openai_stub(openai_server):
+    """Base URL of stubs/openai_stub.py with its counters reset"""
+    stub_stats(openai_server)
+    return openai_server
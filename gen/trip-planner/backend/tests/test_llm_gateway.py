@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+import genai_service
+from benchmarks.common import stub_stats
+from cache import TTLCache
+from conftest import free_port
+from genai_service import GenAITripPlanner
+from itinerary_cache import ItineraryCache
+from llm_gateway import LLMError, LLMGateway
+from stubs.openai_stub import TIPS
+
+QUESTION = [
+    {"role": "system", "content": "You are a friendly travel assistant."},
+    {"role": "user", "content": "What should I know about getting around in Lisbon?"}
+]
+
+def _gateway(base_url: str) -> LLMGateway:
+    return LLMGateway("stub", f"{base_url}/v1", cache=TTLCache(64, 3600))
+
+def _run(gateway: LLMGateway, coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await gateway.aclose()
+    return asyncio.run(main())
+
+def _plan(planner: GenAITripPlanner):
+    return asyncio.run(planner.agenerate_smart_itinerary(
+        "Lisbon", 3, 1500.0, {"culture": True}, {"travel_history": []}
+    ))
+
+@pytest.fixture
+def use_gateway(monkeypatch):
+    """Point the planner at the given gateway for one test"""
+    def use(gateway: LLMGateway):
+        monkeypatch.setattr(genai_service, "llm_gateway", gateway)
+        return gateway
+    return use
+
+def test_repeated_prompts_are_served_from_the_cache(openai_stub):
+    gateway = _gateway(openai_stub)
+    retyped = [QUESTION[0], {"role": "user", "content": QUESTION[1]["content"].lower().rstrip("?") + " ??"}]
+
+    async def ask():
+        return [await gateway.complete(messages) for messages in (QUESTION, QUESTION, retyped)]
+
+    first, exact, normalized = _run(gateway, ask())
+    assert [first.source, exact.source, normalized.source] == ["upstream", "exact", "normalized"]
+    assert exact.text == normalized.text == first.text
+    assert stub_stats(openai_stub)["completions"] == 1
+
+def test_identical_prompts_in_flight_share_one_completion(openai_stub):
+    gateway = _gateway(openai_stub)
+
+    async def ask_together():
+        return await asyncio.gather(*(gateway.complete(QUESTION, cache=False) for _ in range(10)))
+
+    results = _run(gateway, ask_together())
+    assert sorted(result.source for result in results) == ["coalesced"] * 9 + ["upstream"]
+    assert stub_stats(openai_stub)["completions"] == 1
+
+def test_disabled_gateway_uses_template_recommendations(use_gateway):
+    use_gateway(LLMGateway(api_key=None))
+    planner = GenAITripPlanner(deterministic=True, cache=ItineraryCache())
+
+    result, timings = _plan(planner)
+    assert all(timing["status"] == "ok" for timing in timings.values())
+    assert result["ai_insights"]["ai_recommendations"]
+
+    # Template recommendations are not a degraded plan, so the result is cached
+    _, timings = _plan(planner)
+    assert timings == {"cache": {"ms": 0.0, "status": "hit"}}
+
+def test_planner_recommendations_come_from_the_gateway(openai_stub, use_gateway):
+    use_gateway(_gateway(openai_stub))
+
+    result, timings = _plan(GenAITripPlanner(deterministic=True))
+    assert timings["recommendations"]["status"] == "ok"
+    assert set(result["ai_insights"]["ai_recommendations"]) <= set(TIPS)
+
+def test_slow_gateway_falls_back_to_templates(openai_stub, use_gateway, monkeypatch):
+    # The stub answers after 100ms
+    monkeypatch.setitem(genai_service.AGENT_TIMEOUTS, "recommendations", 0.02)
+    use_gateway(_gateway(openai_stub))
+    planner = GenAITripPlanner(deterministic=True, cache=ItineraryCache())
+
+    result, timings = _plan(planner)
+    assert timings["recommendations"]["status"] == "timeout"
+    assert not set(result["ai_insights"]["ai_recommendations"]) & set(TIPS)
+
+    # A plan built from a fallback is not cached
+    _, timings = _plan(planner)
+    assert "cache" not in timings
+
+def test_unreachable_gateway_falls_back_to_templates(use_gateway):
+    gateway = use_gateway(_gateway(f"http://127.0.0.1:{free_port()}"))
+    with pytest.raises(LLMError):
+        _run(gateway, gateway.complete(QUESTION))
+
+    result, timings = _plan(GenAITripPlanner(deterministic=True))
+    assert timings["recommendations"]["status"] == "error"
+    assert result["ai_insights"]["ai_recommendations"]
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+import providers
+from benchmarks.common import stub_stats
+from conftest import free_port
+from genai_service import GenAITripPlanner
+from insights_cache import InsightsCache
+from providers import CrowdsProvider, EventsProvider, PricesProvider, WeatherProvider, fetch_signals
+
+def _run(coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await providers.stop_providers()
+    return asyncio.run(main())
+
+@pytest.fixture
+def live_providers(monkeypatch, provider_stub):
+    """All four providers pointed at the stub, behind an empty insights cache"""
+    configured = {
+        cls.name: cls(provider_stub) for cls in (WeatherProvider, EventsProvider, CrowdsProvider, PricesProvider)
+    }
+    monkeypatch.setattr(providers, "PROVIDERS", configured)
+    monkeypatch.setattr(providers, "insights_cache", InsightsCache(providers.INSIGHTS_TTLS))
+    return configured
+
+def test_concurrent_fetches_share_one_upstream_request(provider_stub):
+    provider = CrowdsProvider(provider_stub)
+
+    async def fetch_all():
+        return await asyncio.gather(*(provider.fetch(city) for city in ["Paris", " paris", "PARIS "] * 10))
+
+    levels = _run(fetch_all())
+    assert len(set(levels)) == 1 and levels[0] in CrowdsProvider.levels
+    assert stub_stats(provider_stub) == {"crowds": 1}
+    assert provider.stats()["coalesced"] == 29
+
+def test_signals_are_served_from_the_cache(live_providers, provider_stub):
+    async def fetch_twice():
+        return await fetch_signals("Tokyo"), await fetch_signals("tokyo")
+
+    first, second = _run(fetch_twice())
+    assert first == second
+    assert set(first) == {"weather", "events", "crowds", "prices"}
+    assert stub_stats(provider_stub) == {"weather": 1, "events": 1, "crowds": 1, "prices": 1}
+    assert providers.insights_cache.stats()["hits"] == 4
+
+def test_timed_out_signals_fall_back_to_simulated_data(live_providers, provider_stub, monkeypatch):
+    # The stub answers after 50ms
+    monkeypatch.setattr(providers, "PROVIDER_TIMEOUT", 0.01)
+
+    live = _run(fetch_signals("Paris"))
+    assert live == {}
+    assert all(provider.errors == 1 for provider in live_providers.values())
+
+    insights = GenAITripPlanner()._get_real_time_insights("Paris", live=live)
+    assert insights["crowd_levels"] in CrowdsProvider.levels
+    assert insights["price_trends"] in PricesProvider.trends
+
+def test_unreachable_provider_is_left_out(live_providers, monkeypatch):
+    monkeypatch.setitem(live_providers, "crowds", CrowdsProvider(f"http://127.0.0.1:{free_port()}"))
+
+    live = _run(fetch_signals("Rome"))
+    assert "crowds" not in live
+    assert set(live) == {"weather", "events", "prices"}
+
+@pytest.mark.parametrize("provider, payload", [
+    (CrowdsProvider("http://stub"), {"level": "packed"}),
+    (PricesProvider("http://stub"), {"trend": "volatile"})
+])
+def test_unknown_values_are_rejected(provider, payload):
+    with pytest.raises(ValueError):
+        provider.parse(payload)
+
+def test_risk_assessment_tolerates_unknown_crowd_levels():
+    planner = GenAITripPlanner()
+    insights = dict(planner._get_real_time_insights("Paris", live={}), crowd_levels="Packed")
+    assert planner._assess_travel_risks("Paris", insights)["factors"]["crowds"] == 0.3
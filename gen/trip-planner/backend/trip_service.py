@@ -0,0 +1,406 @@
+import base64
+import json
+import os
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.orm import joinedload
+
+from cache import TTLCache
+from database import SessionLocal
+
+from genai_service import GenAITripPlanner
+from itinerary_cache import build_itinerary_cache
+from models import Trip, Itinerary
+from schemas import TripCreate, TripDetailResponse
+from selection_strategies import get_strategy
+
+# Demo defaults until trips are tied to the authenticated user's profile
+DEFAULT_BUDGET = 2000
+DEFAULT_PREFERENCES = {"heritage": True, "food": True}
+
+# Opt-in: seeded planning makes identical requests return identical plans,
+# which lets the shared result cache serve popular city/duration combinations
+# and batches plan repeated templates once. Off by default so each request
+# still gets a fresh plan; benchmarks turn it on to make runs comparable.
+ITINERARY_DETERMINISTIC = os.getenv("ITINERARY_DETERMINISTIC", "false").lower() in ("1", "true", "yes")
+itinerary_cache = build_itinerary_cache()
+# greedy | vectorized | knapsack | local_search (see selection_strategies)
+PLANNER_STRATEGY = get_strategy(os.getenv("PLANNER_STRATEGY", "greedy"))  # fails fast on typos
+
+# Debug: send per-agent planner timings as a Server-Timing header
+AGENT_TIMING_HEADER = os.getenv("AGENT_TIMING_HEADER", "false").lower() in ("1", "true", "yes")
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "500"))
+BATCH_PLANNER_WORKERS = int(os.getenv("BATCH_PLANNER_WORKERS", "8"))
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_PLANNER_WORKERS, thread_name_prefix="batch-planner")
+
+TRIPS_PAGE_SIZE = int(os.getenv("TRIPS_PAGE_SIZE", "50"))
+TRIPS_MAX_PAGE_SIZE = int(os.getenv("TRIPS_MAX_PAGE_SIZE", "200"))
+TRIP_LIST_FIELDS = ("id", "user_id", "destination", "duration", "total_cost", "status", "created_at")
+
+TRIP_DETAIL_CACHE_SIZE = int(os.getenv("TRIP_DETAIL_CACHE_SIZE", "2048"))
+TRIP_DETAIL_CACHE_TTL = float(os.getenv("TRIP_DETAIL_CACHE_TTL", "300"))
+# Serialized trip detail bodies keyed on (trip_id, version); a version bump
+# makes old entries unreachable, so no explicit invalidation is needed
+_trip_detail_cache = TTLCache(maxsize=TRIP_DETAIL_CACHE_SIZE, ttl=TRIP_DETAIL_CACHE_TTL)
+
+OPTIMIZED_MARKER = "AI-Optimized"
+# Bound IN-lists so huge nightly runs stay within driver parameter limits
+OPTIMIZE_CHUNK_SIZE = int(os.getenv("OPTIMIZE_CHUNK_SIZE", "1000"))
+
+STREAM_FLUSH_ROWS = int(os.getenv("STREAM_FLUSH_ROWS", "50"))
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def _planner_inputs(trip: TripCreate) -> Dict:
+    user_context = {
+        "travel_history": [],  # Could be fetched from user's past trips
+        "booking_patterns": {},
+        "preferences_strength": dict(DEFAULT_PREFERENCES)
+    }
+    return {
+        "destination": trip.destination,
+        "duration": trip.duration,
+        "budget": DEFAULT_BUDGET,
+        "preferences": dict(DEFAULT_PREFERENCES),
+        "user_context": user_context
+    }
+
+def plan_trip(trip: TripCreate) -> Dict:
+    """Run the GenAI planner for a trip request"""
+    genai_planner = GenAITripPlanner(
+        deterministic=ITINERARY_DETERMINISTIC, cache=itinerary_cache, strategy=PLANNER_STRATEGY
+    )
+    return genai_planner.generate_smart_itinerary(**_planner_inputs(trip))
+
+async def aplan_trip(trip: TripCreate) -> Tuple[Dict, Dict]:
+    """plan_trip with the planner's agents run concurrently; also returns agent timings"""
+    genai_planner = GenAITripPlanner(
+        deterministic=ITINERARY_DETERMINISTIC, cache=itinerary_cache, strategy=PLANNER_STRATEGY
+    )
+    return await genai_planner.agenerate_smart_itinerary(**_planner_inputs(trip))
+
+def server_timing(timings: Dict) -> str:
+    """Server-Timing header value, e.g. 'insights;dur=1.2, activities;dur=5000;desc="timeout"'"""
+    return ", ".join(
+        f"{agent};dur={timing['ms']}" + (f';desc="{timing["status"]}"' if timing["status"] != "ok" else "")
+        for agent, timing in timings.items()
+    )
+
+def itinerary_rows(ai_result: Dict) -> Tuple[List[Dict], float]:
+    """Itinerary column values and the trip total, computed before any write"""
+    rows = [
+        {
+            "day": day_data["day"],
+            "activity": day_data["activity"],
+            "location": day_data["location"],
+            "cost": day_data["cost"]
+        }
+        for day_data in ai_result["itinerary"]
+    ]
+    return rows, float(sum(row["cost"] for row in rows))
+
+def insert_trip_statement(trip: TripCreate, total_cost: float):
+    """INSERT ... RETURNING id for a new planning-stage trip"""
+    return insert(Trip).values(
+        user_id=1,  # Default user for demo
+        destination=trip.destination,
+        duration=trip.duration,
+        total_cost=total_cost,
+        status="planning"
+    ).returning(Trip.id)
+
+def insert_itinerary_statement():
+    """Multi-row itinerary INSERT; executed with a list of parameter dicts"""
+    return insert(Itinerary)
+
+def with_trip_id(rows: List[Dict], trip_id: int) -> List[Dict]:
+    return [dict(row, trip_id=trip_id) for row in rows]
+
+def persist_trip(db, trip: TripCreate, ai_result: Dict) -> Tuple[int, float]:
+    """Write the trip and all itinerary rows in one transaction"""
+    rows, total_cost = itinerary_rows(ai_result)
+    trip_id = db.execute(insert_trip_statement(trip, total_cost)).scalar_one()
+    if rows:
+        # SQLAlchemy batches executemany inserts into multi-row VALUES clauses
+        db.execute(insert_itinerary_statement(), with_trip_id(rows, trip_id))
+    db.commit()
+    return trip_id, total_cost
+
+async def persist_trip_async(db, trip: TripCreate, ai_result: Dict) -> Tuple[int, float]:
+    """AsyncSession counterpart of persist_trip"""
+    rows, total_cost = itinerary_rows(ai_result)
+    trip_id = (await db.execute(insert_trip_statement(trip, total_cost))).scalar_one()
+    if rows:
+        await db.execute(insert_itinerary_statement(), with_trip_id(rows, trip_id))
+    await db.commit()
+    return trip_id, total_cost
+
+def plan_trips(trips: List[TripCreate]) -> List[Tuple[Optional[Dict], Optional[str]]]:
+    """Plan many trips concurrently; returns (ai_result, error) per input, in order"""
+    def safe_plan(trip: TripCreate):
+        try:
+            return plan_trip(trip), None
+        except Exception as e:  # reported per item, never fails the batch
+            return None, f"{type(e).__name__}: {e}"
+
+    if not ITINERARY_DETERMINISTIC:
+        return list(_batch_executor.map(safe_plan, trips))
+
+    # Seeded plans depend only on the template, so repeats are planned once
+    unique: Dict[Tuple[str, int], TripCreate] = {}
+    for trip in trips:
+        unique.setdefault((trip.destination, trip.duration), trip)
+    planned = dict(zip(unique, _batch_executor.map(safe_plan, unique.values())))
+    return [planned[(trip.destination, trip.duration)] for trip in trips]
+
+def _batch_parameters(trips: List[TripCreate], ai_results: List[Dict]) -> Tuple[List[Dict], List[List[Dict]], List[float]]:
+    trip_params, row_sets, totals = [], [], []
+    for trip, ai_result in zip(trips, ai_results):
+        rows, total_cost = itinerary_rows(ai_result)
+        trip_params.append({
+            "user_id": 1,  # Default user for demo
+            "destination": trip.destination,
+            "duration": trip.duration,
+            "total_cost": total_cost,
+            "status": "planning"
+        })
+        row_sets.append(rows)
+        totals.append(total_cost)
+    return trip_params, row_sets, totals
+
+def _insert_trips_statement():
+    # sort_by_parameter_order keeps RETURNING rows aligned with the input list
+    return insert(Trip).returning(Trip.id, sort_by_parameter_order=True)
+
+def _all_rows(trip_ids: List[int], row_sets: List[List[Dict]]) -> List[Dict]:
+    return [row for trip_id, rows in zip(trip_ids, row_sets) for row in with_trip_id(rows, trip_id)]
+
+def persist_trips(db, trips: List[TripCreate], ai_results: List[Dict]) -> List[Tuple[int, float]]:
+    """Write many trips and all of their itinerary rows in one transaction"""
+    if not trips:
+        return []
+    trip_params, row_sets, totals = _batch_parameters(trips, ai_results)
+    trip_ids = db.execute(_insert_trips_statement(), trip_params).scalars().all()
+    rows = _all_rows(trip_ids, row_sets)
+    if rows:
+        db.execute(insert_itinerary_statement(), rows)
+    db.commit()
+    return list(zip(trip_ids, totals))
+
+async def persist_trips_async(db, trips: List[TripCreate], ai_results: List[Dict]) -> List[Tuple[int, float]]:
+    """AsyncSession counterpart of persist_trips"""
+    if not trips:
+        return []
+    trip_params, row_sets, totals = _batch_parameters(trips, ai_results)
+    trip_ids = (await db.execute(_insert_trips_statement(), trip_params)).scalars().all()
+    rows = _all_rows(trip_ids, row_sets)
+    if rows:
+        await db.execute(insert_itinerary_statement(), rows)
+    await db.commit()
+    return list(zip(trip_ids, totals))
+
+def batch_response(trips: List[TripCreate], planned: List[Tuple[Optional[Dict], Optional[str]]],
+                   persisted: List[Tuple[int, float]]) -> Dict:
+    """Per-item results in request order; persisted holds only the successes"""
+    saved = iter(persisted)
+    results = []
+    for index, (trip, (ai_result, error)) in enumerate(zip(trips, planned)):
+        if error is not None:
+            results.append({"index": index, "success": False, "error": error})
+            continue
+        trip_id, total_cost = next(saved)
+        results.append({"index": index, "success": True, "trip": trip_summary(trip_id, trip, total_cost, ai_result)})
+    failed = sum(1 for _, error in planned if error is not None)
+    return {"succeeded": len(trips) - failed, "failed": failed, "results": results}
+
+def encode_cursor(created_at: datetime, trip_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), trip_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        created_at, trip_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(trip_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def list_trips(db, user_id: int, limit: int, cursor: Optional[str] = None,
+               fields: Optional[List[str]] = None) -> Tuple[List[Dict], Optional[str]]:
+    """One page of a user's trips, newest first, keyed on (created_at, id)
+
+    Only the requested columns are selected (created_at and id are always
+    read for the cursor). Returns the rows and the cursor for the next page.
+    """
+    fields = list(fields or TRIP_LIST_FIELDS)
+    unknown = set(fields) - set(TRIP_LIST_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    columns = [getattr(Trip, name) for name in dict.fromkeys(fields + ["created_at", "id"])]
+
+    query = select(*columns).where(Trip.user_id == user_id)
+    if cursor:
+        query = query.where(tuple_(Trip.created_at, Trip.id) < decode_cursor(cursor))
+    # One extra row tells us whether another page exists
+    query = query.order_by(Trip.created_at.desc(), Trip.id.desc()).limit(limit + 1)
+
+    rows = db.execute(query).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return [{name: row._mapping[name] for name in fields} for row in rows], next_cursor
+
+def trip_etag(trip_id: int, version: int) -> str:
+    return f'"trip-{trip_id}-v{version}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+def trip_version(db, trip_id: int) -> Optional[int]:
+    return db.execute(select(Trip.version).where(Trip.id == trip_id)).scalar_one_or_none()
+
+def cached_trip_detail(trip_id: int, version: int) -> Optional[bytes]:
+    return _trip_detail_cache.get((trip_id, version))
+
+def load_trip_detail(db, trip_id: int) -> Optional[Tuple[int, bytes]]:
+    """Trip plus itinerary in one joined query, serialized via the response schemas"""
+    trip = db.execute(
+        select(Trip).options(joinedload(Trip.itineraries)).where(Trip.id == trip_id)
+    ).unique().scalar_one_or_none()
+    if trip is None:
+        return None
+    body = TripDetailResponse(trip=trip, itinerary=trip.itineraries).model_dump_json().encode("utf-8")
+    _trip_detail_cache.set((trip.id, trip.version), body)
+    return trip.version, body
+
+def _optimize_rows_statement(trip_ids: List[int]):
+    """Set-based optimization pass over the rows; returns the trip_id of every row it changed"""
+    return (
+        update(Itinerary)
+        .where(Itinerary.trip_id.in_(trip_ids), Itinerary.activity.not_like(f"%{OPTIMIZED_MARKER}%"))
+        .values(activity=Itinerary.activity + f" ({OPTIMIZED_MARKER})")
+        .returning(Itinerary.trip_id)
+        .execution_options(synchronize_session=False)
+    )
+
+def _bump_versions_statement(trip_ids: List[int]):
+    # Only trips whose rows changed, so ETags and cached details of the rest stay valid
+    return (
+        update(Trip)
+        .where(Trip.id.in_(trip_ids))
+        .values(version=Trip.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def _chunks(ids: List[int]) -> Iterator[List[int]]:
+    ids = list(dict.fromkeys(ids))
+    for start in range(0, len(ids), OPTIMIZE_CHUNK_SIZE):
+        yield ids[start:start + OPTIMIZE_CHUNK_SIZE]
+
+def optimize_trips(db, trip_ids: List[int]) -> int:
+    """Mark every not-yet-optimized itinerary row of the given trips; returns rows changed"""
+    updated = 0
+    for chunk in _chunks(trip_ids):
+        changed = db.execute(_optimize_rows_statement(chunk)).scalars().all()
+        updated += len(changed)
+        if changed:
+            db.execute(_bump_versions_statement(list(set(changed))))
+    db.commit()
+    return updated
+
+async def optimize_trips_async(db, trip_ids: List[int]) -> int:
+    """AsyncSession counterpart of optimize_trips"""
+    updated = 0
+    for chunk in _chunks(trip_ids):
+        changed = (await db.execute(_optimize_rows_statement(chunk))).scalars().all()
+        updated += len(changed)
+        if changed:
+            await db.execute(_bump_versions_statement(list(set(changed))))
+    await db.commit()
+    return updated
+
+def _encode_event(event: str, data, fmt: str) -> str:
+    if fmt == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, "data": data}) + "\n"
+
+def stream_trip(trip: TripCreate, fmt: str = "ndjson") -> Iterator[str]:
+    """Plan, persist and emit a trip day by day (NDJSON or SSE)
+
+    The trip row is committed first so its id can be sent immediately;
+    itinerary rows are flushed every STREAM_FLUSH_ROWS. If planning fails
+    the partial trip is removed and an error event is sent; if the client
+    disconnects first (GeneratorExit at a yield) it is removed as well.
+    """
+    genai_planner = GenAITripPlanner(
+        deterministic=ITINERARY_DETERMINISTIC, cache=itinerary_cache, strategy=PLANNER_STRATEGY
+    )
+    # Own session: the stream outlives the request-scoped dependency
+    db = SessionLocal()
+    trip_id = None
+    settled = False  # the trip is complete or already discarded
+    try:
+        trip_id = db.execute(insert_trip_statement(trip, 0.0)).scalar_one()
+        db.commit()
+        yield _encode_event("trip", {
+            "id": trip_id, "destination": trip.destination, "duration": trip.duration, "status": "planning"
+        }, fmt)
+
+        total_cost = 0.0
+        pending: List[Dict] = []
+        for event, data in genai_planner.stream_smart_itinerary(**_planner_inputs(trip)):
+            if event != "day":
+                yield _encode_event(event, data, fmt)
+                continue
+            rows, day_cost = itinerary_rows({"itinerary": data})
+            pending.extend(with_trip_id(rows, trip_id))
+            total_cost += day_cost
+            if len(pending) >= STREAM_FLUSH_ROWS:
+                db.execute(insert_itinerary_statement(), pending)
+                db.commit()
+                pending = []
+            yield _encode_event("day", {"day": data[0]["day"], "activities": data}, fmt)
+
+        if pending:
+            db.execute(insert_itinerary_statement(), pending)
+        db.execute(update(Trip).where(Trip.id == trip_id).values(
+            total_cost=total_cost, version=Trip.version + 1
+        ))
+        db.commit()
+        settled = True
+        yield _encode_event("done", {"id": trip_id, "total_cost": total_cost, "status": "planning"}, fmt)
+    except Exception as e:
+        _discard_partial_trip(db, trip_id)
+        settled = True
+        yield _encode_event("error", {"detail": f"{type(e).__name__}: {e}"}, fmt)
+    finally:
+        if not settled:
+            _discard_partial_trip(db, trip_id)
+        db.close()
+
+def _discard_partial_trip(db, trip_id: Optional[int]):
+    db.rollback()
+    if trip_id is not None:
+        db.execute(delete(Itinerary).where(Itinerary.trip_id == trip_id))
+        db.execute(delete(Trip).where(Trip.id == trip_id))
+        db.commit()
+
+def trip_summary(trip_id: int, trip: TripCreate, total_cost: float, ai_result: Dict) -> Dict:
+    """Response body shared by the sync and async itinerary endpoints"""
+    return {
+        "id": trip_id,
+        "destination": trip.destination,
+        "duration": trip.duration,
+        "total_cost": total_cost,
+        "status": "planning",
+        "ai_insights": ai_result["ai_insights"],
+        "dynamic_pricing": ai_result["dynamic_pricing"],
+        "sustainability_score": ai_result["sustainability_score"]
+    }
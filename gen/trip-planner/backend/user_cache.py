@@ -0,0 +1,41 @@
+import os
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from models import User
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+# Detached User instances keyed by id. Invalidation below is per process;
+# the TTL bounds how stale another worker's copy can get.
+_user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+def get_user(db: Session, user_id: int, max_age: Optional[float] = None) -> Optional[User]:
+    """Load a user, serving hot users from cache without a query"""
+    cached = _user_cache.get(user_id)
+    if cached is not None:
+        # Re-attach a copy to this session without emitting a SELECT
+        return db.merge(cached, load=False)
+
+    user = db.query(User).filter(User.id == user_id).first()
+    if user is None:
+        return None
+    db.expunge(user)
+    ttl = USER_CACHE_TTL if max_age is None else min(USER_CACHE_TTL, max_age)
+    _user_cache.set(user_id, user, ttl=ttl)
+    return db.merge(user, load=False)
+
+def invalidate_user(user_id: int):
+    _user_cache.pop(user_id)
+
+def cache_stats():
+    return _user_cache.stats()
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_change(mapper, connection, target):
+    invalidate_user(target.id)
@@ -0,0 +1,99 @@
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from activity_catalog import ActivityPool
+
+DISCOUNT_THRESHOLD = 50
+DISCOUNT_RATE = 0.85
+
+class VectorizedSelection:
+    """Whole-trip activity picks held as (preference x day) arrays
+
+    Mirrors the per-day loop in GenAITripPlanner: for every enabled
+    preference each day draws uniformly from the activities that still fit
+    its remaining budget. Pools are sorted by cost, so "what fits" is a
+    prefix whose length np.searchsorted finds for all days at once.
+    """
+
+    def __init__(self, pools: Dict[str, ActivityPool], preferences: Dict,
+                 duration: int, budget: float, rng: np.random.Generator):
+        self.duration = duration
+        self.daily_budget = budget / duration
+        self.pools: List[ActivityPool] = []
+        picks, costs = [], []
+        remaining = np.full(duration, self.daily_budget)
+
+        for pref, is_enabled in preferences.items():
+            pool = pools.get(pref) if is_enabled else None
+            if not pool:
+                continue
+            counts = np.searchsorted(pool.cost_array, remaining, side="right")
+            counts[remaining <= 0] = 0
+            # Masked sampling: a uniform index below each day's affordable count
+            chosen = (rng.random(duration) * counts).astype(np.intp)
+            selected = counts > 0
+            chosen[~selected] = -1
+            cost = np.where(selected, pool.cost_array[chosen], 0.0)
+            remaining -= cost
+            self.pools.append(pool)
+            picks.append(chosen)
+            costs.append(cost)
+
+        self.picks = np.array(picks, dtype=np.intp).reshape(len(picks), duration)
+        self.costs = np.array(costs, dtype=np.float64).reshape(len(costs), duration)
+        self.discounted = np.zeros_like(self.picks, dtype=bool)
+        # Days with no pick get the default exploration slot
+        self.empty_days = ~(self.picks >= 0).any(axis=0)
+        self.default_cost = min(30, self.daily_budget)
+
+    @property
+    def total_cost(self) -> float:
+        return float(self.costs.sum() + self.empty_days.sum() * self.default_cost)
+
+    def apply_discount(self, budget: float):
+        """Vectorized _optimize_itinerary: discount items over $50 if over budget"""
+        if self.total_cost <= budget:
+            return
+        self.discounted = self.costs > DISCOUNT_THRESHOLD
+        self.costs = np.where(self.discounted, np.floor(self.costs * DISCOUNT_RATE), self.costs)
+
+    def iter_days(self, destination: str, weather: str) -> Iterator[List[Dict]]:
+        """Materialize the picks in the planner's output format, one day at a time"""
+        picks = self.picks.tolist()
+        discounted = self.discounted.tolist()
+        empty_days = self.empty_days.tolist()
+        location = f"{destination} - AI Optimized Route"
+
+        for index in range(self.duration):
+            day = index + 1
+            if empty_days[index]:
+                yield [{
+                    "day": day,
+                    "activity": f"AI-Curated {destination} Exploration",
+                    "location": f"{destination} City Center",
+                    "cost": self.default_cost,
+                    "ai_enhanced": True,
+                    "weather_adapted": True
+                }]
+                continue
+
+            day_activities = []
+            for row, pool in enumerate(self.pools):
+                chosen = picks[row][index]
+                if chosen < 0:
+                    continue
+                activity = pool.activities[chosen]
+                item = {
+                    "day": day,
+                    "activity": activity["name"],
+                    "location": location,
+                    "cost": activity["cost"],
+                    "ai_enhanced": activity.get("ai_enhanced", False),
+                    "weather_adapted": weather in pool.lower_names[chosen]
+                }
+                if discounted[row][index]:
+                    item["cost"] = int(activity["cost"] * DISCOUNT_RATE)  # AI negotiated discount
+                    item["ai_optimized"] = True
+                day_activities.append(item)
+            yield day_activities
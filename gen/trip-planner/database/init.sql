@@ -20,7 +20,8 @@ CREATE TABLE trips (
     duration INTEGER NOT NULL,
     total_cost DECIMAL(10,2) DEFAULT 0.00,
     status VARCHAR(50) DEFAULT 'planning',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    version INTEGER NOT NULL DEFAULT 1
 );
 
 -- Create itineraries table
@@ -39,10 +40,24 @@ CREATE TABLE bookings (
     trip_id INTEGER REFERENCES trips(id) ON DELETE CASCADE,
     item_type VARCHAR(100) NOT NULL,
     item_id VARCHAR(255) NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 1,
     status VARCHAR(50) DEFAULT 'pending',
+    expires_at TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Create inventory table (items without a row are unlimited)
+CREATE TABLE inventory (
+    id SERIAL PRIMARY KEY,
+    item_type VARCHAR(100) NOT NULL,
+    item_id VARCHAR(255) NOT NULL,
+    capacity INTEGER NOT NULL,
+    reserved INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_inventory_item UNIQUE (item_type, item_id),
+    CONSTRAINT ck_inventory_reserved CHECK (reserved >= 0 AND reserved <= capacity)
+);
+
 -- Create payments table
 CREATE TABLE payments (
     id SERIAL PRIMARY KEY,
@@ -50,7 +65,12 @@ CREATE TABLE payments (
     amount DECIMAL(10,2) NOT NULL,
     method VARCHAR(50) NOT NULL,
     status VARCHAR(50) DEFAULT 'pending',
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    idempotency_key VARCHAR(255) UNIQUE,
+    transaction_id VARCHAR(255),
+    refund_id VARCHAR(255),
+    error VARCHAR(255),
+    updated_at TIMESTAMP
 );
 
 -- Insert sample data
@@ -61,6 +81,9 @@ INSERT INTO users (name, email, password, preferences, budget) VALUES
 -- Create indexes for better performance
 CREATE INDEX idx_users_email ON users(email);
 CREATE INDEX idx_trips_user_id ON trips(user_id);
+CREATE INDEX idx_trips_user_created_at ON trips(user_id, created_at DESC, id DESC);
 CREATE INDEX idx_itineraries_trip_id ON itineraries(trip_id);
 CREATE INDEX idx_bookings_trip_id ON bookings(trip_id);
-CREATE INDEX idx_payments_booking_id ON payments(booking_id);
\ No newline at end of file
+CREATE INDEX idx_bookings_held_expires_at ON bookings(expires_at) WHERE status = 'held';
+CREATE INDEX idx_payments_booking_id ON payments(booking_id);
+CREATE INDEX idx_payments_unsettled ON payments(status) WHERE status IN ('pending', 'refund_pending');
\ No newline at end of file
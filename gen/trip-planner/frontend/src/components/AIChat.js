@@ -15,6 +15,8 @@ const AIChat = ({ isOpen, onClose }) => {
   const [inputMessage, setInputMessage] = useState('');
   const [isTyping, setIsTyping] = useState(false);
   const messagesEndRef = useRef(null);
+  // Server-issued id that keeps this widget's conversation history separate
+  const sessionIdRef = useRef(null);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -38,7 +40,8 @@ const AIChat = ({ isOpen, onClose }) => {
     setIsTyping(true);
 
     try {
-      const response = await api.post('/hackathon/ai/chat', { message });
+      const response = await api.post('/hackathon/ai/chat', { message, session_id: sessionIdRef.current });
+      sessionIdRef.current = response.data.session_id;
       
       setTimeout(() => {
         const botMessage = {
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { motion } from 'framer-motion';
-import { tripAPI } from '../services/api';
+import { tripAPI, nextCursor } from '../services/api';
 import { useAuth } from '../hooks/useAuth';
 import { 
   PlusIcon, 
@@ -13,6 +13,8 @@ import {
 const Dashboard = () => {
   const [trips, setTrips] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [cursor, setCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const { user } = useAuth();
 
   useEffect(() => {
@@ -23,6 +25,7 @@ const Dashboard = () => {
     try {
       const response = await tripAPI.getUserTrips();
       setTrips(response.data);
+      setCursor(nextCursor(response));
     } catch (error) {
       console.error('Error fetching trips:', error);
     } finally {
@@ -30,6 +33,19 @@ const Dashboard = () => {
     }
   };
 
+  const loadMoreTrips = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await tripAPI.getUserTrips(cursor);
+      setTrips((loaded) => [...loaded, ...response.data]);
+      setCursor(nextCursor(response));
+    } catch (error) {
+      console.error('Error fetching more trips:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getStatusColor = (status) => {
     switch (status) {
       case 'planning': return 'bg-yellow-100 text-yellow-800';
@@ -87,45 +103,54 @@ const Dashboard = () => {
           </div>
         </motion.div>
       ) : (
-        <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-          {trips.map((trip, index) => (
-            <motion.div
-              key={trip.id}
-              initial={{ opacity: 0, y: 20 }}
-              animate={{ opacity: 1, y: 0 }}
-              transition={{ delay: index * 0.1 }}
-            >
-              <Link to={`/trip/${trip.id}`} className="block">
-                <div className="card hover:shadow-md transition-shadow cursor-pointer">
-                  <div className="flex justify-between items-start mb-4">
-                    <h3 className="text-lg font-semibold text-gray-900">
-                      {trip.destination}
-                    </h3>
-                    <span className={`px-2 py-1 rounded-full text-xs font-medium ${getStatusColor(trip.status)}`}>
-                      {trip.status}
-                    </span>
-                  </div>
-                  
-                  <div className="space-y-2 text-sm text-gray-600">
-                    <div className="flex items-center space-x-2">
-                      <CalendarIcon className="h-4 w-4" />
-                      <span>{trip.duration} days</span>
+        <div className="space-y-6">
+          <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
+            {trips.map((trip, index) => (
+              <motion.div
+                key={trip.id}
+                initial={{ opacity: 0, y: 20 }}
+                animate={{ opacity: 1, y: 0 }}
+                transition={{ delay: (index % 10) * 0.1 }}
+              >
+                <Link to={`/trip/${trip.id}`} className="block">
+                  <div className="card hover:shadow-md transition-shadow cursor-pointer">
+                    <div className="flex justify-between items-start mb-4">
+                      <h3 className="text-lg font-semibold text-gray-900">
+                        {trip.destination}
+                      </h3>
+                      <span className={`px-2 py-1 rounded-full text-xs font-medium ${getStatusColor(trip.status)}`}>
+                        {trip.status}
+                      </span>
                     </div>
-                    <div className="flex items-center space-x-2">
-                      <CurrencyDollarIcon className="h-4 w-4" />
-                      <span>${trip.total_cost}</span>
+                  
+                    <div className="space-y-2 text-sm text-gray-600">
+                      <div className="flex items-center space-x-2">
+                        <CalendarIcon className="h-4 w-4" />
+                        <span>{trip.duration} days</span>
+                      </div>
+                      <div className="flex items-center space-x-2">
+                        <CurrencyDollarIcon className="h-4 w-4" />
+                        <span>${trip.total_cost}</span>
+                      </div>
                     </div>
-                  </div>
                   
-                  <div className="mt-4 pt-4 border-t border-gray-200">
-                    <p className="text-xs text-gray-500">
-                      Created {new Date(trip.created_at).toLocaleDateString()}
-                    </p>
+                    <div className="mt-4 pt-4 border-t border-gray-200">
+                      <p className="text-xs text-gray-500">
+                        Created {new Date(trip.created_at).toLocaleDateString()}
+                      </p>
+                    </div>
                   </div>
-                </div>
-              </Link>
-            </motion.div>
-          ))}
+                </Link>
+              </motion.div>
+            ))}
+          </div>
+          {cursor && (
+            <div className="text-center">
+              <button onClick={loadMoreTrips} disabled={loadingMore} className="btn-secondary">
+                {loadingMore ? 'Loading...' : 'Load more trips'}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -32,13 +32,10 @@ const TripDetails = () => {
 
   const fetchTripDetails = async () => {
     try {
-      const [tripResponse, itineraryResponse] = await Promise.all([
-        tripAPI.getUserTrips(),
-        tripAPI.getTripItinerary(id)
-      ]);
+      // The detail response carries the trip itself, so no need to search the paginated trip list
+      const itineraryResponse = await tripAPI.getTripItinerary(id);
       
-      const currentTrip = tripResponse.data.find(t => t.id === parseInt(id));
-      setTrip(currentTrip || itineraryResponse.data.trip);
+      setTrip(itineraryResponse.data.trip);
       setItinerary(itineraryResponse.data.itinerary || itineraryResponse.data);
     } catch (error) {
       console.error('Trip details error:', error);
@@ -88,14 +85,21 @@ const TripDetails = () => {
         item_id: `trip_${id}`
       });
 
-      // Process payment
-      await bookingAPI.processPayment({
+      // Payment is accepted right away and settled in the background
+      const paymentResponse = await bookingAPI.processPayment({
         booking_id: bookingResponse.data.booking_id,
         amount: trip.total_cost,
         method: 'credit_card'
-      });
+      }, crypto.randomUUID());
 
-      toast.success('Trip booked and payment processed successfully!');
+      const payment = await waitForSettlement(paymentResponse.data);
+      if (payment.status === 'completed') {
+        toast.success('Trip booked and payment processed successfully!');
+      } else if (payment.settled) {
+        toast.error('Payment was declined. Please try again.');
+      } else {
+        toast.success('Trip booked! Your payment is still processing.');
+      }
       await fetchTripDetails();
     } catch (error) {
       toast.error('Booking failed. Please try again.');
@@ -104,6 +108,14 @@ const TripDetails = () => {
     }
   };
 
+  const waitForSettlement = async (payment, attempts = 20) => {
+    for (let i = 0; i < attempts && !payment.settled; i++) {
+      await new Promise(resolve => setTimeout(resolve, 500));
+      payment = (await bookingAPI.getPayment(payment.payment_id)).data;
+    }
+    return payment;
+  };
+
   const exportToPDF = () => {
     // Simple PDF export simulation
     const content = `
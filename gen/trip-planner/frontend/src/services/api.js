@@ -30,15 +30,22 @@ export const authAPI = {
 // Trip API
 export const tripAPI = {
   generateItinerary: (tripData) => api.post('/itinerary/generate', tripData),
-  getUserTrips: () => api.get('/trips'),
+  // One page, newest first; pass nextCursor(response) to get the following page
+  getUserTrips: (cursor) => api.get('/trips', { params: cursor ? { cursor } : {} }),
   getTripItinerary: (tripId) => api.get(`/trips/${tripId}/itinerary`),
   updateItinerary: (tripId) => api.put(`/itinerary/update/${tripId}`),
 };
 
+// Cursor for the next page of a paginated response, or null on the last page
+export const nextCursor = (response) => response.headers['x-next-cursor'] || null;
+
 // Booking API
 export const bookingAPI = {
   bookTrip: (bookingData) => api.post('/book', bookingData),
-  processPayment: (paymentData) => api.post('/payment', paymentData),
+  // Reuse the same idempotencyKey when retrying so the payment is only taken once
+  processPayment: (paymentData, idempotencyKey) =>
+    api.post('/payment', paymentData, { headers: { 'Idempotency-Key': idempotencyKey } }),
+  getPayment: (paymentId) => api.get(`/payment/${paymentId}`),
 };
 
 export default api;
\ No newline at end of file